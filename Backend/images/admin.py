@@ -1,14 +1,39 @@
 from django.contrib import admin
+from django.db.models import Count, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html_join
 from django.utils.safestring import mark_safe
-from .models import UploadedImage, Assessment
+from .models import UploadedImage, Assessment, ProcessingJob
+from .derivatives import RENDITION_SIZES
+from .jobs import enqueue, enqueue_many
+from .phash import DEFAULT_MAX_DISTANCE, uploader_tree
+from .search import search_filter
 
 @admin.register(Assessment)
 class AssessmentAdmin(admin.ModelAdmin):
-    list_display = ['id', 'patient_id', 'clinician', 'date', 'short_notes']
+    list_display = ['id', 'patient_id', 'related_patient', 'clinician', 'date', 'image_count', 'short_notes']
     list_editable = ['patient_id']
     list_filter = ['date', 'clinician', 'patient_id']
+    list_select_related = ['clinician', 'related_patient']
     search_fields = ['patient_id', 'notes']
     # filter_horizontal = ['images'] # Not supported with 'through' model
+
+    def get_queryset(self, request):
+        # One grouped query for the image counts instead of one per row
+        return super().get_queryset(request).annotate(image_total=Count('images'))
+
+    def get_search_results(self, request, queryset, search_term):
+        # Notes go through the full-text index instead of an icontains scan;
+        # the MRN in patient_id is still matched exactly
+        if not search_term:
+            return queryset, False
+        term = search_term.strip()
+        return queryset.filter(search_filter(Assessment, term) | Q(patient_id__iexact=term)), False
+
+    @admin.display(description='Images', ordering='image_total')
+    def image_count(self, obj):
+        return obj.image_total
     
     def short_notes(self, obj):
         return obj.notes[:50] + '...' if obj.notes else ''
@@ -19,18 +44,31 @@ class UploadedImageAdmin(admin.ModelAdmin):
     """
     Admin interface for uploaded images.
     """
-    list_display = ['id', 'uploaded_by', 'uploaded_at', 'description', 'image_preview_list']
+    list_display = ['id', 'uploaded_by', 'uploaded_at', 'description', 'dimensions', 'image_preview_list']
     list_editable = ['description']
-    list_filter = ['uploaded_at', 'uploaded_by']
-    search_fields = ['uploaded_by__username', 'description']
-    readonly_fields = ['uploaded_at', 'image_preview']
-    actions = ['update_selected_metadata']
+    list_filter = ['uploaded_at', 'uploaded_by', 'image_format', 'processing_status']
+    search_fields = ['uploaded_by__username', 'description', 'content_hash']
+    readonly_fields = [
+        'uploaded_at', 'image_preview', 'width', 'height', 'image_format', 'byte_size', 'content_hash',
+        'processing_status', 'near_duplicates'
+    ]
+    actions = ['update_selected_metadata', 'regenerate_renditions']
 
     @admin.action(description="Update selected images metadata")
     def update_selected_metadata(self, request, queryset):
-        # Placeholder for custom logic
-        updated = queryset.count()
-        self.message_user(request, f"Successfully updated {updated} images.")
+        # Hashing reads every byte, so the job workers do it, not the request
+        image_ids = queryset.exclude(image='').values_list('pk', flat=True)
+        jobs = enqueue_many('update_image_metadata', [{'image_id': pk} for pk in image_ids])
+        self.message_user(request, f"Queued metadata updates for {len(jobs)} images.")
+
+    @admin.action(description="Regenerate renditions for selected images")
+    def regenerate_renditions(self, request, queryset):
+        image_ids = list(queryset.exclude(image='').values_list('pk', flat=True))
+        UploadedImage.objects.filter(pk__in=image_ids).update(
+            processing_status=UploadedImage.PROCESSING_PENDING, updated_at=timezone.now()
+        )
+        jobs = enqueue_many('process_upload', [{'image_id': pk, 'regenerate': True} for pk in image_ids])
+        self.message_user(request, f"Queued rendition regeneration for {len(jobs)} images.")
     
     fieldsets = (
         (None, {
@@ -39,12 +77,53 @@ class UploadedImageAdmin(admin.ModelAdmin):
         ('Info', {
             'fields': ('uploaded_at', 'image_preview')
         }),
+        ('File', {
+            'fields': ('width', 'height', 'image_format', 'byte_size', 'content_hash', 'processing_status')
+        }),
+        ('Similar images', {
+            'fields': ('near_duplicates',)
+        }),
     )
 
+    def near_duplicates(self, obj):
+        """Links to the uploader's other images with a near-identical perceptual hash."""
+        if obj.perceptual_hash is None:
+            return 'Not computed yet'
+        matches = [
+            (distance, image_id)
+            for distance, image_id in uploader_tree(obj.uploaded_by).search(obj.perceptual_hash, DEFAULT_MAX_DISTANCE)
+            if image_id != obj.pk
+        ]
+        if not matches:
+            return 'None'
+        return format_html_join(
+            ', ', '<a href="{}">#{}</a> ({} bits)',
+            ((reverse('admin:images_uploadedimage_change', args=[image_id]), image_id, distance)
+             for distance, image_id in matches)
+        )
+    near_duplicates.short_description = 'Near duplicates'
+
+    def dimensions(self, obj):
+        if obj.width and obj.height:
+            return f'{obj.width}x{obj.height}'
+        return '-'
+    dimensions.short_description = 'Size'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('derivatives')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            enqueue('process_upload', image_id=obj.pk)
+
     def image_preview_list(self, obj):
         """Image preview for the list view."""
         if obj.image:
-            return mark_safe(f'<img src="{obj.image.url}" style="max-height: 50px; max-width: 50px; border-radius: 4px;" />')
+            # Use the 64px rendition so the changelist does not pull full-size originals
+            thumbnail = obj.get_derivative(RENDITION_SIZES[0])
+            src = thumbnail.image.url if thumbnail else obj.image.url
+            return mark_safe(f'<img src="{src}" style="max-height: 50px; max-width: 50px; border-radius: 4px;" />')
         return 'No image'
     image_preview_list.short_description = 'Preview'
 
@@ -58,3 +137,20 @@ class UploadedImageAdmin(admin.ModelAdmin):
 
     class Media:
         js = ('images/js/admin_image_preview.js',)
+
+@admin.register(ProcessingJob)
+class ProcessingJobAdmin(admin.ModelAdmin):
+    """
+    Admin interface for inspecting and retrying background jobs.
+    """
+    list_display = ['id', 'task', 'status', 'attempts', 'max_attempts', 'run_after', 'locked_by', 'updated_at']
+    list_filter = ['status', 'task']
+    readonly_fields = ['created_at', 'updated_at']
+    actions = ['retry_jobs']
+
+    @admin.action(description="Retry selected jobs")
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status=ProcessingJob.STATUS_RUNNING).update(
+            status=ProcessingJob.STATUS_QUEUED, attempts=0, run_after=timezone.now(), last_error=None
+        )
+        self.message_user(request, f"Queued {updated} jobs for retry.")
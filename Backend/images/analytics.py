@@ -0,0 +1,149 @@
+"""
+Healing-trajectory analytics over assessment measurements.
+
+A wound is identified by its patient and where it is (body part, location).
+The area series of every wound in scope is loaded with one query and the
+metrics are computed for all wounds at once with NumPy: a least-squares
+line of area over time gives the healing rate and the date the trend reaches
+zero (projected closure).
+
+Results are cached in the shared cache (CACHES). Any assessment or patient
+change replaces the cache generation token, which invalidates every cached
+result at once, in every process.
+"""
+import hashlib
+import uuid
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Assessment
+
+CACHE_GENERATION_KEY = 'healing:generation'
+DEFAULT_CACHE_TIMEOUT = 60 * 60
+
+
+def invalidate_healing_cache():
+    """
+    Drop all cached healing results. Connected to Assessment / Patient
+    save and delete; call it after bulk_create() or update().
+    """
+    cache.set(CACHE_GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def _cache_key(scope):
+    generation = cache.get_or_set(CACHE_GENERATION_KEY, lambda: uuid.uuid4().hex, None)
+    return f'healing:{generation}:{scope}'
+
+
+def _cached(scope, compute):
+    key = _cache_key(scope)
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, getattr(settings, 'HEALING_ANALYTICS_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT))
+    return result
+
+
+def healing_metrics(rows):
+    """
+    Compute per-wound metrics from `(patient_id, body_part, location, date,
+    area_cm2)` rows in any order. Returns a list of dicts, one per wound.
+    """
+    if not rows:
+        return []
+    patients, body_parts, locations, dates, areas = zip(*rows)
+    wound_keys = list(zip(patients, (part or '' for part in body_parts), (loc or '' for loc in locations)))
+
+    # Map each row to a wound index, then sort by wound and date
+    unique_keys = sorted(set(wound_keys))
+    index_of = {key: i for i, key in enumerate(unique_keys)}
+    wound = np.fromiter((index_of[key] for key in wound_keys), dtype=np.intp, count=len(rows))
+    stamps = np.array(dates, dtype='datetime64[s]')
+    origin = stamps.min()
+    days = (stamps - origin) / np.timedelta64(1, 'D')
+    area = np.array(areas, dtype=np.float64)
+
+    order = np.lexsort((days, wound))
+    wound, days, area = wound[order], days[order], area[order]
+    first = np.flatnonzero(np.r_[True, wound[1:] != wound[:-1]])
+    last = np.r_[first[1:], len(wound)] - 1
+
+    # Least-squares slope / intercept of area over days, for every wound at once
+    count = np.bincount(wound).astype(np.float64)
+    sum_t = np.bincount(wound, weights=days)
+    sum_a = np.bincount(wound, weights=area)
+    sum_tt = np.bincount(wound, weights=days * days)
+    sum_ta = np.bincount(wound, weights=days * area)
+    denominator = count * sum_tt - sum_t * sum_t
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(denominator > 0, (count * sum_ta - sum_t * sum_a) / denominator, np.nan)
+        intercept = (sum_a - slope * sum_t) / count
+        zero_crossing = -intercept / slope
+        initial, latest = area[first], area[last]
+        reduction = np.where(initial > 0, (initial - latest) / initial * 100, np.nan)
+
+    results = []
+    for i, (patient_id, body_part, location) in enumerate(unique_keys):
+        closure = None
+        if latest[i] == 0:
+            closure = days[last[i]]
+        elif slope[i] < 0:
+            # Already past the trend line's zero: closure is due now
+            closure = max(zero_crossing[i], days[last[i]])
+        results.append({
+            'patient': patient_id,
+            'body_part': body_part,
+            'location': location,
+            'assessments': int(count[i]),
+            'first_date': _to_datetime(origin, days[first[i]]),
+            'last_date': _to_datetime(origin, days[last[i]]),
+            'initial_area_cm2': round(float(initial[i]), 2),
+            'latest_area_cm2': round(float(latest[i]), 2),
+            'area_reduction_percent': _rounded(reduction[i]),
+            # Positive while the wound is shrinking
+            'healing_rate_cm2_per_week': _rounded(-slope[i] * 7),
+            'projected_closure': _to_datetime(origin, closure).date() if closure is not None else None,
+        })
+    return results
+
+
+def _rounded(value):
+    # + 0.0 turns a -0.0 from a flat trend into 0.0
+    return None if np.isnan(value) else round(float(value), 2) + 0.0
+
+
+def _to_datetime(origin, days):
+    return origin.astype('datetime64[s]').item() + timedelta(days=float(days))
+
+
+def _series(assessments):
+    return list(
+        assessments.filter(area_cm2__isnull=False).values_list(
+            'related_patient_id', 'body_part', 'location', 'date', 'area_cm2'
+        )
+    )
+
+
+def patient_healing(patient):
+    """
+    Metrics for each wound of one patient, including assessments linked only
+    through the MRN in patient_id.
+    """
+    def compute():
+        assessments = Assessment.objects.filter(Q(related_patient=patient) | Q(patient_id=patient.mrn))
+        rows = [(patient.pk, *row[1:]) for row in _series(assessments)]
+        return healing_metrics(rows)
+    return _cached(f'patient:{patient.pk}', compute)
+
+
+def ward_healing(ward):
+    """
+    Metrics for each wound of every patient currently in `ward`.
+    """
+    def compute():
+        return healing_metrics(_series(Assessment.objects.filter(related_patient__ward=ward)))
+    return _cached(f'ward:{hashlib.sha1(ward.encode()).hexdigest()}', compute)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ImagesConfig(AppConfig):
     name = 'images'
+
+    def ready(self):
+        from . import signals  # noqa: F401
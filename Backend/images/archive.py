@@ -0,0 +1,116 @@
+"""
+Streaming ZIP export of a patient's full record, for transfers between
+facilities.
+
+zipfile writes into a sink that is drained after every chunk, so the
+archive goes out as it is built: nothing is buffered beyond one chunk of
+one file, and nothing touches a temporary file. The sink can't seek, so
+zipfile puts each entry's sizes and CRC in a data descriptor after its
+data instead of going back to patch the header.
+"""
+import json
+import os
+import zipfile
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .export import csv_lines, export_rows
+from .media import STREAM_CHUNK_SIZE
+
+
+class _Sink:
+    """
+    Write-only, unseekable file object collecting what zipfile writes until
+    the next drain().
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def _date_time(value):
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    # ZIP timestamps can't go before 1980
+    return max(value, datetime(1980, 1, 1)).timetuple()[:6]
+
+
+def _entry(name, date_time, compress_type=zipfile.ZIP_DEFLATED):
+    info = zipfile.ZipInfo(name, date_time)
+    info.compress_type = compress_type
+    return info
+
+
+def archive_path(image):
+    return f'images/{image.pk}-{os.path.basename(image.image.name)}'
+
+
+def _write_archive(archive, patient_data, assessments):
+    """
+    Write the archive entries, yielding whenever enough output has built up
+    to be sent.
+    """
+    images = {}
+
+    def image_path(image):
+        if image.image:
+            images.setdefault(image.pk, image)
+            return archive_path(image)
+        return image.image_full_url
+
+    now = _date_time(timezone.now())
+    with archive.open(_entry('patient.json', now), 'w') as entry:
+        entry.write(json.dumps(patient_data, cls=DjangoJSONEncoder, indent=2).encode())
+
+    with archive.open(_entry('assessments.csv', now), 'w') as entry:
+        for line in csv_lines(export_rows(assessments, image_path)):
+            entry.write(line.encode())
+            yield
+
+    for image in images.values():
+        storage, name = image.image.storage, image.image.name
+        try:
+            file = storage.open(name, 'rb')
+        except FileNotFoundError:
+            continue
+        with file:
+            # Photos are already compressed; deflating them again only costs CPU
+            info = _entry(archive_path(image), _date_time(image.uploaded_at), zipfile.ZIP_STORED)
+            # The size isn't known to zipfile up front, so entries at its ZIP64
+            # limit need ZIP64 headers requested explicitly
+            with archive.open(info, 'w', force_zip64=storage.size(name) >= zipfile.ZIP64_LIMIT) as entry:
+                while chunk := file.read(STREAM_CHUNK_SIZE):
+                    entry.write(chunk)
+                    yield
+
+
+def patient_archive(patient_data, assessments):
+    """
+    Yield the bytes of a ZIP holding `patient.json` (`patient_data`),
+    `assessments.csv` (`assessments`, with image_urls pointing into the
+    archive) and every image file those assessments reference.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for _ in _write_archive(archive, patient_data, assessments):
+            if sink.size >= STREAM_CHUNK_SIZE:
+                yield sink.drain()
+    # The rest, including the central directory written on close
+    yield sink.drain()
@@ -0,0 +1,140 @@
+"""
+Change feed for clients that keep a local copy of their data.
+
+Each feed (assessments, images, patients, assignments) is read in
+`(updated_at, id)` order from where the client's cursor left off, and
+deletions come from DeletedRecord tombstones the same way. The cursor holds
+one position per feed, so a client that syncs regularly only ever receives
+what changed since its last sync.
+
+Rows updated within the last CHANGE_FEED_SETTLE_SECONDS are held back until
+the next sync: their timestamps are set before the transaction commits, and
+without the delay a slow transaction could land behind a cursor that has
+already moved past it.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from .models import Assessment, DeletedRecord, UploadedImage
+from .pagination import InvalidCursor, decode_token, encode_token, keyset_filter, parse_position, position_payload
+from .serializers import AssessmentSerializer, UploadedImageSerializer
+
+DEFAULT_SETTLE_SECONDS = 5
+DEFAULT_TOMBSTONE_DAYS = 90
+
+
+class CursorExpired(Exception):
+    """
+    The cursor is older than the tombstone retention, so deletions may have
+    been pruned; the client has to fetch everything again.
+    """
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'CHANGE_FEED_TOMBSTONE_DAYS', DEFAULT_TOMBSTONE_DAYS))
+
+
+def _feeds(user):
+    """
+    `name -> (queryset, serializer class)` for what `user` can see.
+    """
+    from patient.models import Patient, PatientAssignment
+    from patient.serializers import PatientAssignmentSerializer, PatientSerializer
+    from patient.views import is_doctor, is_nurse
+
+    patients = Patient.objects.with_wound_counts()
+    assignments = PatientAssignment.objects.select_related('nurse', 'assigned_by').prefetch_related(
+        Prefetch('patient', queryset=Patient.objects.with_wound_counts())
+    )
+    if is_nurse(user) and not is_doctor(user):
+        patients = patients.filter(
+            id__in=PatientAssignment.objects.filter(nurse=user, active=True).values('patient_id')
+        )
+        assignments = assignments.filter(nurse=user)
+    elif not is_doctor(user):
+        patients = patients.none()
+        assignments = assignments.none()
+
+    return {
+        'assessments': (Assessment.objects.filter(clinician=user).with_details(), AssessmentSerializer),
+        'images': (UploadedImage.objects.filter(uploaded_by=user).prefetch_related('derivatives'), UploadedImageSerializer),
+        'patients': (patients, PatientSerializer),
+        'assignments': (assignments, PatientAssignmentSerializer),
+    }
+
+
+def _tombstones(user):
+    from patient.views import is_doctor
+
+    visible = Q(owner_id=user.pk) | Q(owner_id__isnull=True)
+    if is_doctor(user):
+        visible |= Q(model='assignment')
+    return DeletedRecord.objects.filter(visible)
+
+
+def _page(queryset, field, position, horizon, size):
+    queryset = queryset.filter(**{f'{field}__lte': horizon}).order_by(field, 'id')
+    if position is not None:
+        queryset = keyset_filter(queryset, field, *position, descending=False)
+    rows = list(queryset[:size + 1])
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if rows:
+        position = (getattr(rows[-1], field), rows[-1].pk)
+    return rows, position, has_more
+
+
+def changes_since(user, cursor, size, context=None):
+    """
+    Everything `user` can see that changed after `cursor` (None for a full
+    snapshot), at most `size` rows per feed. Raises InvalidCursor and
+    CursorExpired.
+    """
+    positions = {}
+    if cursor:
+        payload = decode_token(cursor)
+        try:
+            synced, _ = parse_position([payload['synced'], 0])
+            positions = {name: parse_position(value) for name, value in payload['positions'].items()}
+        except (KeyError, TypeError, AttributeError):
+            raise InvalidCursor('Invalid cursor')
+        if synced < timezone.now() - tombstone_retention():
+            raise CursorExpired()
+
+    # Hold back rows whose transaction may still be in flight
+    horizon = timezone.now() - timedelta(
+        seconds=getattr(settings, 'CHANGE_FEED_SETTLE_SECONDS', DEFAULT_SETTLE_SECONDS)
+    )
+    data = {}
+    next_positions = {}
+    has_more = False
+    for name, (queryset, serializer_class) in _feeds(user).items():
+        rows, next_positions[name], more = _page(queryset, 'updated_at', positions.get(name), horizon, size)
+        data[name] = serializer_class(rows, many=True, context=context or {}).data
+        has_more |= more
+
+    if cursor:
+        rows, next_positions['deleted'], more = _page(
+            _tombstones(user), 'deleted_at', positions.get('deleted'), horizon, size
+        )
+        data['deleted'] = [
+            {'model': row.model, 'id': row.object_id, 'deleted_at': row.deleted_at} for row in rows
+        ]
+        has_more |= more
+    else:
+        # A snapshot has nothing to delete; start the tombstones from now
+        latest = DeletedRecord.objects.filter(deleted_at__lte=horizon).order_by('deleted_at', 'id').last()
+        next_positions['deleted'] = (latest.deleted_at, latest.pk) if latest else (horizon, 0)
+        data['deleted'] = []
+
+    data['next_cursor'] = encode_token({
+        'synced': horizon.isoformat(),
+        'positions': {
+            name: position_payload(*position) for name, position in next_positions.items() if position is not None
+        },
+    })
+    data['has_more'] = has_more
+    return data
@@ -0,0 +1,148 @@
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .storage import sharded_path
+
+# Longest-edge sizes (in pixels) of the renditions kept for every upload.
+# 64px feeds the admin/list previews, 320px the assessment history cards and
+# 1280px the full-screen viewer on tablets.
+RENDITION_SIZES = (64, 320, 1280)
+
+RENDITION_FORMAT = 'JPEG'
+RENDITION_QUALITY = 82
+
+
+def derivative_upload_to(instance, filename):
+    """
+    Store renditions grouped by size, sharded by the source's content hash.
+    The encoder quality is part of the name, so changing it never serves
+    renditions cached under the old settings.
+    """
+    source_hash = instance.source.content_hash
+    if source_hash:
+        return sharded_path(f'wounds/derivatives/{instance.size}', source_hash, f'-q{RENDITION_QUALITY}.jpg')
+    return f'wounds/derivatives/{instance.size}/{filename}'
+
+
+def expected_sizes(width, height, sizes=RENDITION_SIZES):
+    """
+    The sizes render_renditions() produces for a `width` x `height` original:
+    the smallest always, the others only when they don't upscale.
+    """
+    return [size for size in sizes if max(width, height) > size or size == min(sizes)]
+
+
+def render_renditions(source, sizes=RENDITION_SIZES):
+    """
+    Decode an image once and encode a JPEG rendition for every requested size.
+
+    `source` is anything Pillow can open (a path or a file object). Sizes that
+    would upscale the original are skipped, clients fall back to the original.
+    Returns a dict of size -> (jpeg_bytes, width, height).
+    """
+    renditions = {}
+    with Image.open(source) as original:
+        # Apply the EXIF orientation so phone photos are not rendered sideways
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        # Resize from largest to smallest, reusing the previous result so each
+        # step only has to work on an already reduced bitmap.
+        for size in sorted(expected_sizes(*image.size, sizes), reverse=True):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, RENDITION_FORMAT, quality=RENDITION_QUALITY, optimize=True)
+            renditions[size] = (buffer.getvalue(), image.width, image.height)
+    return renditions
+
+
+def _touch(uploaded_image):
+    # New renditions change the image as clients see it, so it goes back into
+    # the change feed (see changes.py)
+    type(uploaded_image).objects.filter(pk=uploaded_image.pk).update(updated_at=timezone.now())
+
+
+def save_renditions(uploaded_image, renditions):
+    """
+    Persist already encoded renditions as ImageDerivative rows for an image.
+    """
+    from .models import ImageDerivative
+
+    stem = os.path.splitext(os.path.basename(uploaded_image.image.name))[0]
+    derivatives = []
+    for size, (data, width, height) in sorted(renditions.items()):
+        derivative, _ = ImageDerivative.objects.get_or_create(
+            source=uploaded_image,
+            size=size,
+            defaults={'width': width, 'height': height},
+        )
+        derivative.width = width
+        derivative.height = height
+        previous = derivative.image.name
+        # Written even when the name exists: regenerating has to replace a
+        # damaged file, which saving through the storage would keep
+        name = derivative.image.field.generate_filename(derivative, f'{stem}_{size}.jpg')
+        derivative.image.name = derivative.image.storage.replace(name, ContentFile(data))
+        derivative.save()
+        # Rendition files are shared by every upload of the same bytes, so a
+        # replaced file only goes once no row points at it any more
+        if previous and previous != derivative.image.name and not ImageDerivative.objects.filter(image=previous).exists():
+            derivative.image.storage.delete(previous)
+        derivatives.append(derivative)
+    _touch(uploaded_image)
+    return derivatives
+
+
+def generate_derivatives(uploaded_image, sizes=RENDITION_SIZES, renditions=None, copy_siblings=True):
+    """
+    Generate and store every rendition for an UploadedImage. `renditions`
+    already encoded elsewhere (e.g. in a process pool) by render_renditions()
+    are saved instead of decoding the original here. With `copy_siblings`
+    off, every size is rendered again even when another upload of the same
+    bytes has it.
+    """
+    from .models import ImageDerivative
+
+    if not uploaded_image.image:
+        return []
+    if renditions is not None:
+        return save_renditions(uploaded_image, renditions)
+
+    # Identical bytes uploaded by someone else already have renditions on
+    # disk; copy the rows for those and only render the sizes still missing.
+    copied = {}
+    if copy_siblings and uploaded_image.content_hash:
+        siblings = ImageDerivative.objects.filter(
+            source__content_hash=uploaded_image.content_hash, size__in=sizes
+        ).exclude(source=uploaded_image)
+        for derivative in siblings:
+            copied.setdefault(derivative.size, derivative)
+    derivatives = [
+        ImageDerivative.objects.update_or_create(
+            source=uploaded_image,
+            size=derivative.size,
+            defaults={'image': derivative.image.name, 'width': derivative.width, 'height': derivative.height},
+        )[0]
+        for derivative in copied.values()
+    ]
+
+    if uploaded_image.width and uploaded_image.height:
+        missing = [size for size in expected_sizes(uploaded_image.width, uploaded_image.height, sizes) if size not in copied]
+        render_sizes = missing
+    else:
+        # Unknown dimensions: render_renditions() decides what fits
+        missing = [size for size in sizes if size not in copied]
+        render_sizes = sizes
+    if not missing:
+        _touch(uploaded_image)
+        return derivatives
+
+    with uploaded_image.image.open('rb') as source:
+        rendered = render_renditions(source, render_sizes)
+    rendered = {size: rendition for size, rendition in rendered.items() if size in missing}
+    return derivatives + save_renditions(uploaded_image, rendered)
@@ -0,0 +1,100 @@
+"""
+Streaming export of assessments as CSV or NDJSON.
+
+Rows are read with QuerySet.iterator(chunk_size=...) and encoded one at a
+time, so an export of any size holds only one chunk in memory and the first
+bytes go out before the last row has been read.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import UploadedImage
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_COLUMNS = [
+    'id', 'date', 'patient_id', 'patient', 'patient_name', 'clinician', 'stage', 'wound_type',
+    'exudate', 'pain_level', 'length', 'width', 'depth', 'length_cm', 'width_cm', 'depth_cm',
+    'area_cm2', 'volume_cm3', 'location', 'body_part', 'notes', 'image_urls',
+]
+
+
+def export_queryset(assessments):
+    """
+    Add the joins and prefetches the export reads, so each chunk of rows
+    costs a fixed number of queries.
+    """
+    return assessments.select_related('related_patient', 'clinician').prefetch_related(
+        Prefetch('images', queryset=UploadedImage.objects.only('id', 'image', 'image_full_url', 'uploaded_at'))
+    ).order_by('pk')
+
+
+def export_rows(assessments, image_url, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield one dict per assessment, keyed by EXPORT_COLUMNS. `image_url` maps
+    an UploadedImage to the URL to export for it.
+    """
+    for assessment in export_queryset(assessments).iterator(chunk_size=chunk_size):
+        patient = assessment.related_patient
+        yield {
+            'id': assessment.id,
+            'date': assessment.date,
+            'patient_id': assessment.patient_id,
+            'patient': patient.pk if patient else None,
+            'patient_name': patient.name if patient else None,
+            'clinician': assessment.clinician.username,
+            'stage': assessment.stage,
+            'wound_type': assessment.wound_type,
+            'exudate': assessment.exudate,
+            'pain_level': assessment.pain_level,
+            'length': assessment.length,
+            'width': assessment.width,
+            'depth': assessment.depth,
+            'length_cm': assessment.length_cm,
+            'width_cm': assessment.width_cm,
+            'depth_cm': assessment.depth_cm,
+            'area_cm2': assessment.area_cm2,
+            'volume_cm3': assessment.volume_cm3,
+            'location': assessment.location,
+            'body_part': assessment.body_part,
+            'notes': assessment.notes,
+            'image_urls': [image_url(image) for image in assessment.images.all()],
+        }
+
+
+class _LineBuffer:
+    """
+    File-like object whose write() hands back what was written, so csv.writer
+    can produce one line at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        row['image_urls'] = ' '.join(row['image_urls'])
+        yield writer.writerow(['' if row[column] is None else row[column] for column in EXPORT_COLUMNS])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def export_lines(rows, output):
+    """
+    Encode `rows` as `output` ('csv' or 'ndjson'), one line at a time.
+    """
+    return csv_lines(rows) if output == 'csv' else ndjson_lines(rows)
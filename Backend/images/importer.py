@@ -0,0 +1,191 @@
+"""
+Bulk import of legacy patients and assessments from CSV or NDJSON.
+
+The input is read as a stream and handled in batches: each batch is
+validated with the API serializers, MRNs are resolved to patients through an
+in-memory map, and the valid rows are written with one bulk_create inside a
+transaction. A bad row is reported with its number and skipped; it never
+aborts the rest of the load.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+from rest_framework import serializers
+
+from patient.models import Patient
+from patient.serializers import PatientSerializer
+
+from . import rollups, stats
+from .analytics import invalidate_healing_cache
+from .models import Assessment
+from .serializers import AssessmentSerializer
+
+IMPORT_BATCH_SIZE = 500
+
+# Errors kept for the report; the counts are always complete
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+def import_format(filename, requested=None):
+    """
+    The input format asked for, or the one implied by the file extension.
+    """
+    if requested:
+        return requested if requested in IMPORT_FORMATS else None
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return {'csv': 'csv', 'ndjson': 'ndjson', 'jsonl': 'ndjson'}.get(extension)
+
+
+class PatientImportSerializer(PatientSerializer):
+    class Meta(PatientSerializer.Meta):
+        # MRN uniqueness is checked for the whole batch with one query
+        extra_kwargs = {'mrn': {'validators': []}}
+
+
+class AssessmentImportSerializer(AssessmentSerializer):
+    # The MRN is what links an imported assessment to its patient
+    patient_id = serializers.CharField(max_length=100)
+    # Legacy records keep their original date; new ones default to now
+    date = serializers.DateTimeField(required=False)
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'failed': self.failed, 'errors': self.errors}
+
+
+def read_rows(stream, input_format):
+    """
+    Yield `(row_number, dict or None)` from a text stream. Unparseable NDJSON
+    lines come through as None so they can be reported.
+    """
+    if input_format == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            # Empty cells mean "not given" rather than an empty string
+            yield number, {key: value for key, value in row.items() if key and value != ''}
+        return
+    number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def read_upload(upload, requested_format=None):
+    """
+    Rows of an uploaded file, decoded as it is read. Raises ValueError when
+    the format can't be determined.
+    """
+    input_format = import_format(upload.name, requested_format)
+    if input_format is None:
+        raise ValueError('input must be csv or ndjson')
+    upload.seek(0)
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', errors='replace', newline='')
+    return read_rows(stream, input_format)
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def _valid_rows(batch, serializer_class, report):
+    for number, row in batch:
+        if row is None:
+            report.add_error(number, {'non_field_errors': ['Not a JSON object']})
+            continue
+        serializer = serializer_class(data=row)
+        if serializer.is_valid():
+            yield number, serializer.validated_data
+        else:
+            report.add_error(number, serializer.errors)
+
+
+def _bulk_create(model, numbered, report):
+    if not numbered:
+        return
+    try:
+        with transaction.atomic():
+            created = model.objects.bulk_create([obj for _, obj in numbered])
+            # bulk_create() sends no post_save signals
+            stats.record_created(created)
+            if model is Assessment:
+                rollups.record_created(created)
+    except DatabaseError as exc:
+        for number, _ in numbered:
+            report.add_error(number, {'non_field_errors': [f'Not saved: {exc}']})
+    else:
+        report.created += len(numbered)
+
+
+def import_patients(rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Create patients from `(row_number, row)` pairs; rows whose MRN already
+    exists (in the database or earlier in the input) are reported as errors.
+    """
+    report = ImportReport()
+    for batch in _batches(rows, batch_size):
+        valid = list(_valid_rows(batch, PatientImportSerializer, report))
+        existing = set(
+            Patient.objects.filter(mrn__in=[data['mrn'] for _, data in valid]).values_list('mrn', flat=True)
+        )
+        patients = []
+        for number, data in valid:
+            if data['mrn'] in existing:
+                report.add_error(number, {'mrn': ['Patient with this Medical Record Number already exists.']})
+                continue
+            existing.add(data['mrn'])
+            patients.append((number, Patient(**data)))
+        _bulk_create(Patient, patients, report)
+    return report
+
+
+def import_assessments(rows, clinician, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Create assessments recorded by `clinician` from `(row_number, row)`
+    pairs, linking each to the patient whose MRN is in `patient_id`. Images
+    are not imported.
+    """
+    report = ImportReport()
+    patient_ids = {}  # MRN -> Patient id (or None), filled as batches need it
+    for batch in _batches(rows, batch_size):
+        valid = list(_valid_rows(batch, AssessmentImportSerializer, report))
+        unknown = {data['patient_id'] for _, data in valid} - patient_ids.keys()
+        if unknown:
+            patient_ids.update(dict.fromkeys(unknown))
+            patient_ids.update(Patient.objects.filter(mrn__in=unknown).values_list('mrn', 'id'))
+
+        assessments = []
+        for number, data in valid:
+            assessment = Assessment(
+                clinician=clinician, related_patient_id=patient_ids[data['patient_id']], **data
+            )
+            # bulk_create() doesn't call save(), which fills these
+            assessment.apply_measurements()
+            assessments.append((number, assessment))
+        _bulk_create(Assessment, assessments, report)
+    if report.created:
+        # bulk_create() sends no post_save signals
+        invalidate_healing_cache()
+    return report
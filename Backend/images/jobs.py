@@ -0,0 +1,159 @@
+"""
+Database-backed job queue. Workers (`manage.py process_jobs`) claim jobs with a
+conditional UPDATE and hold them for a visibility timeout; a job whose worker
+died becomes claimable again once that lock expires.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ProcessingJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISIBILITY_TIMEOUT = timedelta(minutes=5)
+RETRY_BACKOFF_SECONDS = 30
+
+_registry = {}
+
+
+def task(name, on_failure=None):
+    """
+    Register a function as a job handler. The handler receives the job payload
+    as keyword arguments. `on_failure(**payload)` runs once the job has used up
+    all of its attempts.
+    """
+    def decorator(func):
+        func.task_name = name
+        func.on_failure = on_failure
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(task_name, max_attempts=3, **payload):
+    """
+    Queue a job. The row is written in the caller's transaction, so a job is
+    never visible to workers before the data it refers to is committed.
+    """
+    return ProcessingJob.objects.create(task=task_name, payload=payload, max_attempts=max_attempts)
+
+
+def enqueue_many(task_name, payloads, max_attempts=3):
+    return ProcessingJob.objects.bulk_create([
+        ProcessingJob(task=task_name, payload=payload, max_attempts=max_attempts) for payload in payloads
+    ])
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_job(worker, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+    """
+    Claim the next runnable job for `worker`, or return None if there is none.
+    """
+    while True:
+        now = timezone.now()
+        runnable = ProcessingJob.objects.filter(
+            Q(status=ProcessingJob.STATUS_QUEUED, run_after__lte=now)
+            | Q(status=ProcessingJob.STATUS_RUNNING, locked_until__lt=now)
+        )
+        with transaction.atomic():
+            # SKIP LOCKED lets concurrent workers on PostgreSQL pass over each
+            # other's candidates instead of queueing on the same row.
+            job = runnable.select_for_update(skip_locked=True).order_by('run_after', 'id').first()
+            if job is None:
+                return None
+
+            # The conditional update is what actually grants the job; it also
+            # makes claiming safe on backends without row locks (SQLite).
+            claimed = ProcessingJob.objects.filter(
+                pk=job.pk, status=job.status, attempts=job.attempts
+            ).update(
+                status=ProcessingJob.STATUS_RUNNING,
+                attempts=F('attempts') + 1,
+                locked_by=worker,
+                locked_until=now + visibility_timeout,
+                updated_at=now,
+            )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """
+    Execute a claimed job and record the outcome (done, retry or failed).
+    """
+    from . import tasks  # noqa: F401 - registers the task handlers
+
+    handler = _registry.get(job.task)
+    try:
+        if job.attempts > job.max_attempts:
+            # Reclaimed after its last attempt timed out
+            raise TimeoutError(f'Job did not finish within {job.max_attempts} attempts')
+        if handler is None:
+            raise LookupError(f'Unknown task "{job.task}"')
+        handler(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s (%s) failed on attempt %s", job.pk, job.task, job.attempts)
+        if job.attempts < job.max_attempts:
+            job.status = ProcessingJob.STATUS_QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+        else:
+            job.status = ProcessingJob.STATUS_FAILED
+            if handler is not None and handler.on_failure is not None:
+                try:
+                    handler.on_failure(**job.payload)
+                except Exception:
+                    logger.exception("on_failure hook of job %s failed", job.pk)
+        job.last_error = error
+    else:
+        job.status = ProcessingJob.STATUS_DONE
+        job.last_error = None
+    # Only record the outcome if the job is still ours: when the visibility
+    # timeout ran out another worker may have claimed it in the meantime.
+    ProcessingJob.objects.filter(pk=job.pk, locked_by=job.locked_by, attempts=job.attempts).update(
+        status=job.status,
+        run_after=job.run_after,
+        last_error=job.last_error,
+        locked_by=None,
+        locked_until=None,
+        updated_at=timezone.now(),
+    )
+    return job
+
+
+def run_worker(visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT, poll_interval=1.0, burst=False, stop=None):
+    """
+    Process jobs until `stop` is set (a multiprocessing/threading Event), or
+    until the queue is empty when `burst` is True.
+    """
+    worker = worker_name()
+    processed = 0
+    while stop is None or not stop.is_set():
+        close_old_connections()
+        try:
+            job = claim_job(worker, visibility_timeout)
+        except DatabaseError:
+            # Lock contention or a dropped connection; back off and try again
+            logger.warning("Worker %s could not claim a job", worker, exc_info=True)
+            time.sleep(poll_interval)
+            continue
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        processed += 1
+    return processed
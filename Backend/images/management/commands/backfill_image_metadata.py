@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from images.models import UploadedImage
+from images.processing import ImageProcessingPool, file_metadata
+from images.storage import content_addressed_storage
+
+METADATA_FIELDS = ['content_hash', 'width', 'height', 'image_format', 'byte_size', 'updated_at']
+
+
+class Command(BaseCommand):
+    help = "Fill hash, dimensions, format and byte size for images uploaded before they were recorded."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows read and updated per chunk.")
+        parser.add_argument('--workers', type=int, default=None, help="Worker processes (defaults to one per CPU).")
+
+    def handle(self, *args, **options):
+        missing = UploadedImage.objects.exclude(image='').filter(
+            Q(content_hash__isnull=True) | Q(width__isnull=True) | Q(byte_size__isnull=True)
+        ).order_by('pk')
+        with ImageProcessingPool(workers=options['workers']) as pool:
+            self._backfill(missing, pool, options['batch_size'])
+
+    def _backfill(self, missing, pool, batch_size):
+        # Walk the table by primary key so each chunk is a cheap indexed range
+        # scan and rows that can't be read don't get picked up again.
+        last_pk = 0
+        updated = failed = 0
+        while True:
+            batch = {image.pk: image for image in missing.filter(pk__gt=last_pk)[:batch_size]}
+            if not batch:
+                break
+            last_pk = max(batch)
+
+            # Hashing reads every byte, so spread the files over the pool
+            tasks = ((pk, (content_addressed_storage.path(image.image.name),)) for pk, image in batch.items())
+            read = []
+            for result in pool.imap(file_metadata, tasks):
+                if result.error is not None:
+                    failed += 1
+                    self.stderr.write(f"Image {result.key}: {result.error}")
+                    continue
+                image = batch[result.key]
+                image.content_hash, header, image.byte_size = result.value
+                image.width = header.width
+                image.height = header.height
+                image.image_format = header.format
+                image.updated_at = timezone.now()
+                read.append(image)
+
+            # Unreadable rows are left as they are, so a rerun still lists them
+            with transaction.atomic():
+                UploadedImage.objects.bulk_update(read, METADATA_FIELDS)
+            updated += len(read)
+            self.stdout.write(f"Updated {updated} images, {failed} failed...")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {updated} updated, {failed} could not be read."))
+        if failed:
+            self.stdout.write(f"{missing.count()} images still lack metadata; fix or remove their files and rerun.")
+        self.stdout.write(pool.stats.summary())
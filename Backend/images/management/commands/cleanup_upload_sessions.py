@@ -0,0 +1,44 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from images.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = "Delete resumable upload sessions (and their partial files) that have been idle too long."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=float, default=None,
+            help="Idle time after which a session is abandoned (defaults to CHUNKED_UPLOAD_EXPIRY)."
+        )
+
+    def handle(self, *args, **options):
+        if options['hours'] is not None:
+            expiry = timezone.timedelta(hours=options['hours'])
+        else:
+            expiry = settings.CHUNKED_UPLOAD_EXPIRY
+        cutoff = timezone.now() - expiry
+
+        removed = 0
+        for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+            session.discard()
+            removed += 1
+
+        # Partial files whose session row is already gone (e.g. a crash between
+        # deleting the row and the file)
+        orphans = 0
+        upload_dir = settings.CHUNKED_UPLOAD_DIR
+        if os.path.isdir(upload_dir):
+            live = {f'{pk}.part' for pk in UploadSession.objects.values_list('id', flat=True)}
+            oldest_allowed = time.time() - expiry.total_seconds()
+            for entry in os.scandir(upload_dir):
+                if entry.name.endswith('.part') and entry.name not in live and entry.stat().st_mtime < oldest_allowed:
+                    os.remove(entry.path)
+                    orphans += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} abandoned sessions and {orphans} orphaned files."))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from images.models import UploadedImage
+from images.phash import dhash_file
+from images.processing import ImageProcessingPool
+from images.storage import content_addressed_storage
+
+
+class Command(BaseCommand):
+    help = "Compute perceptual hashes for images that don't have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Worker processes (defaults to one per CPU).")
+        parser.add_argument('--force', action='store_true', help="Recompute existing hashes too.")
+
+    def handle(self, *args, **options):
+        images = UploadedImage.objects.exclude(image='')
+        if not options['force']:
+            images = images.filter(perceptual_hash__isnull=True)
+
+        pool = ImageProcessingPool(workers=options['workers'])
+        tasks = (
+            (image_id, (content_addressed_storage.path(name),))
+            for image_id, name in images.values_list('id', 'image').iterator()
+        )
+        for result in pool.imap(dhash_file, tasks):
+            if result.error is not None:
+                self.stderr.write(f"Image {result.key}: {result.error}")
+                continue
+            UploadedImage.objects.filter(pk=result.key).update(
+                perceptual_hash=result.value, updated_at=timezone.now()
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {pool.stats.summary()}"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from images.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_lines, export_rows
+from images.models import Assessment
+
+
+class Command(BaseCommand):
+    help = "Export all assessments with patient details and image URLs as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', choices=sorted(EXPORT_FORMATS), default='csv', help="Export format.")
+        parser.add_argument('--file', default=None, help="Write to this path instead of stdout.")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help="Rows fetched per query.")
+
+    def handle(self, *args, **options):
+        rows = export_rows(
+            Assessment.objects.all(),
+            lambda image: image.image_full_url or image.image.url,
+            chunk_size=options['chunk_size'],
+        )
+        if not options['file']:
+            for line in export_lines(rows, options['output']):
+                self.stdout.write(line, ending='')
+            return
+
+        count = 0
+        # newline='' lets the csv module's \r\n line endings through unchanged
+        with open(options['file'], 'w', newline='', encoding='utf-8') as out:
+            for line in export_lines(rows, options['output']):
+                out.write(line)
+                count += 1
+        if options['output'] == 'csv':
+            count -= 1  # header
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} assessments to {options['file']}."))
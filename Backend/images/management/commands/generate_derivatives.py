@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from images.derivatives import RENDITION_SIZES, expected_sizes, generate_derivatives, render_renditions
+from images.models import UploadedImage
+from images.processing import ImageProcessingPool
+from images.storage import content_addressed_storage
+
+
+def missing_renditions(image):
+    """
+    True when `image` lacks a rendition it should have. Small originals only
+    get the sizes that don't upscale them; without known dimensions any
+    rendition counts.
+    """
+    stored = {derivative.size for derivative in image.derivatives.all()}
+    if image.width is None or image.height is None:
+        return not stored
+    return not stored.issuperset(expected_sizes(image.width, image.height))
+
+
+class Command(BaseCommand):
+    help = "Backfill thumbnail renditions for existing uploaded images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Worker processes (defaults to one per CPU).")
+        parser.add_argument('--max-in-flight', type=int, default=None, help="Upper bound on queued tasks.")
+        parser.add_argument('--force', action='store_true', help="Regenerate renditions that already exist.")
+
+    def handle(self, *args, **options):
+        images = UploadedImage.objects.exclude(image='').only(
+            'id', 'image', 'content_hash', 'width', 'height'
+        ).prefetch_related('derivatives')
+        pending = (
+            image for image in images.iterator(chunk_size=500)
+            if options['force'] or missing_renditions(image)
+        )
+
+        pool = ImageProcessingPool(workers=options['workers'], max_in_flight=options['max_in_flight'])
+        self.stdout.write(f"Generating renditions with {pool.workers} worker processes...")
+
+        # Decoding and resizing happen in the pool; storage and DB writes stay here
+        selected = {}
+
+        def tasks():
+            for image in pending:
+                selected[image.pk] = image
+                yield image.pk, (content_addressed_storage.path(image.image.name), RENDITION_SIZES)
+
+        for result in pool.imap(render_renditions, tasks()):
+            image = selected.pop(result.key)
+            if result.error is not None:
+                self.stderr.write(f"Image {result.key}: {result.error}")
+                continue
+            generate_derivatives(image, renditions=result.value)
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Image {result.key}: {result.seconds * 1000:.0f}ms")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {pool.stats.summary()}"))
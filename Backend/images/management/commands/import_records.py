@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from images.importer import IMPORT_BATCH_SIZE, IMPORT_FORMATS, import_assessments, import_format, import_patients, read_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk import legacy patients or assessments from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['patients', 'assessments'], help="What the file contains.")
+        parser.add_argument('path', help="CSV or NDJSON file; columns/keys are the API field names.")
+        parser.add_argument('--input', choices=IMPORT_FORMATS, default=None, help="Defaults to the file extension.")
+        parser.add_argument('--clinician', default=None, help="Username recorded as clinician (assessments only).")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help="Rows validated and inserted per transaction.")
+
+    def handle(self, *args, **options):
+        input_format = import_format(options['path'], options['input'])
+        if input_format is None:
+            raise CommandError("Can't tell the format from the file name; pass --input.")
+
+        clinician = None
+        if options['kind'] == 'assessments':
+            if not options['clinician']:
+                raise CommandError("--clinician is required when importing assessments.")
+            try:
+                clinician = User.objects.get(username=options['clinician'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['clinician']!r}.")
+
+        with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+            rows = read_rows(stream, input_format)
+            if clinician is None:
+                report = import_patients(rows, options['batch_size'])
+            else:
+                report = import_assessments(rows, clinician, options['batch_size'])
+
+        for error in report.errors:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(f"Created {report.created} {options['kind']}, {report.failed} rows failed."))
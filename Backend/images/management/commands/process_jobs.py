@@ -0,0 +1,63 @@
+import multiprocessing
+import signal
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from images.jobs import run_worker
+
+
+def _worker_main(options, stop):
+    # Let the parent decide when to stop; Ctrl+C is handled there
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(
+        visibility_timeout=timedelta(seconds=options['visibility_timeout']),
+        poll_interval=options['poll_interval'],
+        burst=options['burst'],
+        stop=stop,
+    )
+
+
+class Command(BaseCommand):
+    help = "Run background job workers for image processing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Number of worker processes.")
+        parser.add_argument(
+            '--visibility-timeout', type=int, default=300,
+            help="Seconds a claimed job stays invisible to other workers before it is retried."
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--burst', action='store_true', help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            processed = run_worker(
+                visibility_timeout=timedelta(seconds=options['visibility_timeout']),
+                poll_interval=options['poll_interval'],
+                burst=options['burst'],
+            )
+            self.stdout.write(self.style.SUCCESS(f"Worker stopped after {processed} jobs."))
+            return
+
+        # Forked children must not share the parent's database connections
+        connections.close_all()
+        stop = multiprocessing.Event()
+        workers = [
+            multiprocessing.Process(target=_worker_main, args=(options, stop), daemon=True)
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} worker processes.")
+
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers after their current job...")
+            stop.set()
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from images.changes import tombstone_retention
+from images.models import DeletedRecord
+
+
+class Command(BaseCommand):
+    help = "Delete change-feed tombstones older than CHANGE_FEED_TOMBSTONE_DAYS."
+
+    def handle(self, *args, **options):
+        # Clients whose cursor is older than this get a 410 and resync in full
+        cutoff = timezone.now() - tombstone_retention()
+        deleted, _ = DeletedRecord.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} tombstones."))
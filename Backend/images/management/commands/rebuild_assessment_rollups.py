@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from images.rollups import ROLLUP_BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily and weekly stage, pain and exudate rollups from the assessments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ROLLUP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        written = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup rows."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from images.search import install_search
+
+
+class Command(BaseCommand):
+    help = "Recreate the full-text search triggers and index every assessment and patient again."
+
+    def handle(self, *args, **options):
+        with connection.schema_editor() as schema_editor:
+            install_search(schema_editor)
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt ({connection.vendor})."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from images.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount the dashboard statistics from the tables and correct any drift."
+
+    def handle(self, *args, **options):
+        drifted = reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Corrected {drifted} dashboard counters."))
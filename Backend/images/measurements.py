@@ -0,0 +1,99 @@
+"""
+Wound measurements as numbers.
+
+Assessments store length / width / depth as the text the clinician typed
+("2.5", "25 mm", "1in"). The parsed values are kept alongside in centimetres,
+together with the derived area (length x width) and volume (x depth), so they
+can be indexed, range-filtered and aggregated by the database.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+CM = Decimal('0.01')
+
+MAX_LENGTH_CM = Decimal('99999.99')
+
+UNIT_TO_CM = {
+    '': Decimal('1'),
+    'cm': Decimal('1'),
+    'mm': Decimal('0.1'),
+    'm': Decimal('100'),
+    'in': Decimal('2.54'),
+    'inch': Decimal('2.54'),
+    'inches': Decimal('2.54'),
+    '"': Decimal('2.54'),
+}
+
+MEASUREMENT_RE = re.compile(r'^\s*(\d+(?:[.,]\d+)?|[.,]\d+)\s*([a-z"]*)\s*$', re.IGNORECASE)
+
+# Query parameter prefix -> column, e.g. ?min_area=4&max_depth=0.5
+MEASUREMENT_FILTERS = {
+    'length': 'length_cm',
+    'width': 'width_cm',
+    'depth': 'depth_cm',
+    'area': 'area_cm2',
+    'volume': 'volume_cm3',
+}
+
+
+def parse_measurement(value):
+    """
+    Parse free-text like "2.5", "2,5 cm" or "25mm" into centimetres, or
+    return None when the text isn't a measurement.
+    """
+    if value is None:
+        return None
+    match = MEASUREMENT_RE.match(str(value))
+    if not match:
+        return None
+    number, unit = match.groups()
+    factor = UNIT_TO_CM.get(unit.lower())
+    if factor is None:
+        return None
+    try:
+        centimetres = (Decimal(number.replace(',', '.')) * factor).quantize(CM)
+    except InvalidOperation:
+        return None
+    return centimetres if centimetres <= MAX_LENGTH_CM else None
+
+
+def measurement_values(length, width, depth):
+    """
+    Numeric columns for the given measurement strings.
+    """
+    length_cm = parse_measurement(length)
+    width_cm = parse_measurement(width)
+    depth_cm = parse_measurement(depth)
+    area = volume = None
+    if length_cm is not None and width_cm is not None:
+        area = (length_cm * width_cm).quantize(CM)
+        if depth_cm is not None:
+            volume = (length_cm * width_cm * depth_cm).quantize(CM)
+    return {
+        'length_cm': length_cm,
+        'width_cm': width_cm,
+        'depth_cm': depth_cm,
+        'area_cm2': area,
+        'volume_cm3': volume,
+    }
+
+
+def filter_measurements(queryset, params):
+    """
+    Apply `min_<name>` / `max_<name>` range filters from `params` for each
+    measurement. Raises ValueError naming the offending parameter.
+    """
+    for name, column in MEASUREMENT_FILTERS.items():
+        for bound, lookup in (('min', 'gte'), ('max', 'lte')):
+            param = f'{bound}_{name}'
+            value = params.get(param)
+            if value is None:
+                continue
+            try:
+                value = Decimal(value)
+            except InvalidOperation:
+                raise ValueError(f'{param} must be a number')
+            if not value.is_finite():
+                raise ValueError(f'{param} must be a number')
+            queryset = queryset.filter(**{f'{column}__{lookup}': value})
+    return queryset
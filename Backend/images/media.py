@@ -0,0 +1,130 @@
+"""
+Serving stored media files from Django views.
+
+Handles conditional requests (ETag / Last-Modified -> 304), single byte
+ranges (206) and, when MEDIA_ACCEL_REDIRECT is configured, hands the actual
+transfer to the front web server (nginx X-Accel-Redirect, Apache/lighttpd
+X-Sendfile) so the worker is released immediately.
+"""
+import mimetypes
+import re
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parse_range(header, size):
+    """
+    Return (start, end) inclusive for a single-range header, None when the
+    header should be ignored (absent, malformed, multi-range) and False when
+    it is unsatisfiable.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _iter_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def _accel_response(storage, name):
+    header = settings.MEDIA_ACCEL_REDIRECT
+    response = HttpResponse()
+    if header == 'X-Accel-Redirect':
+        # nginx maps this internal location onto MEDIA_ROOT
+        response[header] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + name
+    else:
+        response[header] = storage.path(name)
+    # Let the web server fill in the type from the file
+    del response['Content-Type']
+    return response
+
+
+def _range_applies(request, etag, last_modified):
+    # If-Range: only send a partial response if the client's copy is current
+    if_range = request.headers.get('If-Range')
+    if if_range is None:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _stream_response(request, storage, name, etag, last_modified):
+    size = storage.size(name)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    byte_range = None
+    if request.method == 'GET' and _range_applies(request, etag, last_modified):
+        byte_range = _parse_range(request.headers.get('Range'), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    else:
+        response = StreamingHttpResponse(
+            _iter_range(storage.open(name, 'rb'), start, length), content_type=content_type
+        )
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_stored_file(request, storage, name, etag, last_modified, max_age=3600):
+    """
+    Respond with the file `name` of `storage`.
+
+    `etag` is an unquoted validator that changes whenever the bytes change and
+    `last_modified` a POSIX timestamp.
+    """
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if getattr(settings, 'MEDIA_ACCEL_REDIRECT', None):
+            response = _accel_response(storage, name)
+        else:
+            response = _stream_response(request, storage, name, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, max_age=max_age)
+    return response
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 14:06
+
+import images.derivatives
+import images.storage
+import images.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0008_imagederivative'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='imagederivative',
+            name='image',
+            field=models.ImageField(storage=images.storage.ContentAddressedStorage(), upload_to=images.derivatives.derivative_upload_to),
+        ),
+        migrations.AlterField(
+            model_name='uploadedimage',
+            name='image',
+            field=models.ImageField(storage=images.storage.ContentAddressedStorage(), upload_to=images.storage.hashed_upload_to, validators=[images.validators.validate_image_format, images.validators.validate_image_size]),
+        ),
+    ]
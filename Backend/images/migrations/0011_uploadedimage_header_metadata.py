@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 14:09
+
+import images.storage
+import images.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0010_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='image_format',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='uploadedimage',
+            name='image',
+            field=models.ImageField(storage=images.storage.ContentAddressedStorage(), upload_to=images.storage.hashed_upload_to, validators=[images.validators.validate_image_format, images.validators.validate_image_size, images.validators.validate_image_content]),
+        ),
+    ]
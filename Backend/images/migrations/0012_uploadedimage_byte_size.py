@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0011_uploadedimage_header_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='byte_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='uploadedimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='uploadedimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
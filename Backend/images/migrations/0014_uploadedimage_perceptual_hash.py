@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0013_processing_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='perceptual_hash',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 14:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0014_uploadedimage_perceptual_hash'),
+        ('patient', '0004_patient_address_patient_contact_number_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['clinician', '-date', '-id'], name='images_asse_clinici_286199_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedimage',
+            index=models.Index(fields=['uploaded_by', '-uploaded_at', '-id'], name='images_uplo_uploade_203329_idx'),
+        ),
+    ]
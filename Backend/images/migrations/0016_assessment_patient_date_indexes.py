@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 14:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0015_keyset_pagination_indexes'),
+        ('patient', '0004_patient_address_patient_contact_number_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['related_patient', 'date'], name='images_asse_related_0111bd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['patient_id', 'date'], name='images_asse_patient_7fffe7_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 14:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0016_assessment_patient_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessment',
+            name='area_cm2',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='depth_cm',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='length_cm',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='volume_cm3',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=17, null=True),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='width_cm',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 14:19
+
+from django.db import migrations
+
+from images.measurements import measurement_values
+
+MEASUREMENT_FIELDS = ['length_cm', 'width_cm', 'depth_cm', 'area_cm2', 'volume_cm3']
+BATCH_SIZE = 1000
+
+
+def parse_existing_measurements(apps, schema_editor):
+    # Walk the table by primary key in chunks so memory and transaction size
+    # stay bounded however many assessments there are
+    Assessment = apps.get_model('images', 'Assessment')
+    rows = Assessment.objects.exclude(length__isnull=True, width__isnull=True, depth__isnull=True).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk).only('pk', 'length', 'width', 'depth')[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for assessment in batch:
+            for field, value in measurement_values(assessment.length, assessment.width, assessment.depth).items():
+                setattr(assessment, field, value)
+        Assessment.objects.bulk_update(batch, MEASUREMENT_FIELDS)
+
+
+class Migration(migrations.Migration):
+    # Each chunk commits on its own instead of one long transaction
+    atomic = False
+
+    dependencies = [
+        ('images', '0017_assessment_numeric_measurements'),
+    ]
+
+    operations = [
+        migrations.RunPython(parse_existing_measurements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 14:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0018_parse_assessment_measurements'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='assessment',
+            name='date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 14:30
+
+from django.db import migrations
+
+from images.search import install_search, uninstall_search
+
+
+def forwards(apps, schema_editor):
+    install_search(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    uninstall_search(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0020_change_feed'),
+        ('patient', '0005_change_feed_indexes'),
+    ]
+
+    operations = [
+        # Vendor-specific: tsvector column + GIN index + trigger on PostgreSQL,
+        # FTS5 tables + triggers on SQLite, nothing elsewhere
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 14:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0021_full_text_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('ward', 'Ward'), ('clinician', 'Clinician')], max_length=20)),
+                ('key', models.CharField(max_length=100)),
+                ('metric', models.CharField(max_length=50)),
+                ('bucket', models.CharField(blank=True, default='', max_length=10)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope', 'key', 'metric', 'bucket'), name='unique_dashboard_counter')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0022_dashboard_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssessmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('ward', models.CharField(blank=True, default='', max_length=50)),
+                ('dimension', models.CharField(max_length=20)),
+                ('value', models.CharField(blank=True, default='', max_length=50)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'period_start'], name='images_asse_period_e02c8d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'ward', 'period_start', 'dimension', 'value'), name='unique_assessment_rollup')],
+            },
+        ),
+    ]
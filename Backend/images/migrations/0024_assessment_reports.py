@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 14:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0023_assessment_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssessmentReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('file', models.FileField(blank=True, upload_to='reports/')),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('generated_at', models.DateTimeField(blank=True, null=True)),
+                ('assessment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='report', to='images.assessment')),
+            ],
+        ),
+    ]
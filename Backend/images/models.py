@@ -1,15 +1,51 @@
+import os
+import uuid
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
-from .validators import validate_image_format, validate_image_size
+from django.utils import timezone
+from django.core.exceptions import ValidationError
+from .validators import validate_image_content, validate_image_format, validate_image_size, upload_image_header
+from .derivatives import derivative_upload_to
+from .measurements import measurement_values
+from .storage import content_addressed_storage, hashed_upload_to, upload_content_hash
 
 class UploadedImage(models.Model):
     """
     Model for storing uploaded images with validation.
     Only PNG and JPG files up to 10MB are allowed.
+    Files are stored content-addressed (see images.storage), so identical
+    uploads share one blob on disk.
     """
+
+    PROCESSING_PENDING = 'pending'
+    PROCESSING_RUNNING = 'processing'
+    PROCESSING_READY = 'ready'
+    PROCESSING_FAILED = 'failed'
+    PROCESSING_STATUS_CHOICES = (
+        (PROCESSING_PENDING, 'Pending'),
+        (PROCESSING_RUNNING, 'Processing'),
+        (PROCESSING_READY, 'Ready'),
+        (PROCESSING_FAILED, 'Failed'),
+    )
+
     image = models.ImageField(
-        upload_to='wounds/%Y/%m/%d/',
-        validators=[validate_image_format, validate_image_size]
+        upload_to=hashed_upload_to,
+        storage=content_addressed_storage,
+        validators=[validate_image_format, validate_image_size, validate_image_content]
+    )
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    # Parsed from the file header at upload time (see validators.read_image_header)
+    width = models.PositiveIntegerField(blank=True, null=True, db_index=True)
+    height = models.PositiveIntegerField(blank=True, null=True, db_index=True)
+    image_format = models.CharField(max_length=10, blank=True, null=True)
+    byte_size = models.PositiveBigIntegerField(blank=True, null=True)
+    # 64-bit dHash (stored signed), see images.phash
+    perceptual_hash = models.BigIntegerField(blank=True, null=True, db_index=True)
+    # Post-upload work (renditions, ...) runs in the job queue, see images.jobs
+    processing_status = models.CharField(
+        max_length=20, choices=PROCESSING_STATUS_CHOICES, default=PROCESSING_PENDING
     )
     uploaded_by = models.ForeignKey(
         User,
@@ -19,15 +55,146 @@ class UploadedImage(models.Model):
         blank=True
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     description = models.TextField(blank=True, null=True)
     image_full_url = models.CharField(max_length=500, blank=True, null=True)
     
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Keyset pagination of a user's images (see pagination.py)
+            models.Index(fields=['uploaded_by', '-uploaded_at', '-id']),
+            # Change feed (see changes.py)
+            models.Index(fields=['uploaded_by', 'updated_at', 'id']),
+        ]
     
     def __str__(self):
         return f"Image uploaded on {self.uploaded_at.strftime('%Y-%m-%d %H:%M')}"
 
+    def save(self, *args, **kwargs):
+        # New files (admin uploads included) are hashed before the storage
+        # layer picks their path.
+        if self.image and not self.image._committed:
+            self.apply_upload_metadata(self.image.file)
+        super().save(*args, **kwargs)
+
+    def apply_upload_metadata(self, upload):
+        """
+        Fill the hash and header-derived columns from an incoming file. Both are
+        cached on the file by validation, so this normally reads nothing again.
+        Also used by bulk inserts, which bypass save().
+        """
+        self.content_hash = upload_content_hash(upload)
+        self.byte_size = upload.size
+        try:
+            header = upload_image_header(upload)
+        except ValidationError:
+            return
+        self.width = header.width
+        self.height = header.height
+        self.image_format = header.format
+
+    def get_derivative(self, size):
+        """
+        Return the stored rendition for `size`, using prefetched rows when available.
+        """
+        for derivative in self.derivatives.all():
+            if derivative.size == size:
+                return derivative
+        return None
+
+class ImageDerivative(models.Model):
+    """
+    Downscaled rendition of an UploadedImage (see images.derivatives.RENDITION_SIZES).
+    """
+    source = models.ForeignKey(UploadedImage, on_delete=models.CASCADE, related_name='derivatives')
+    size = models.PositiveSmallIntegerField()
+    image = models.ImageField(upload_to=derivative_upload_to, storage=content_addressed_storage)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['size']
+        unique_together = ('source', 'size')
+
+    def __str__(self):
+        return f"{self.size}px rendition of image {self.source_id}"
+
+class UploadSession(models.Model):
+    """
+    Resumable chunked upload in progress. Chunks are appended to a temporary
+    file on disk; an UploadedImage is only created when the session is finalized.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    description = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.received}/{self.total_size} bytes)"
+
+    @property
+    def temp_path(self):
+        return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{self.id}.part')
+
+    @property
+    def is_complete(self):
+        return self.received == self.total_size
+
+    def discard(self):
+        """
+        Remove the partial file and the session row.
+        """
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+        self.delete()
+
+class ProcessingJob(models.Model):
+    """
+    Unit of background work in the database-backed job queue (see images.jobs).
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # Not picked up before this time (used for retry backoff)
+    run_after = models.DateTimeField(default=timezone.now)
+    # A running job whose lock expired is considered lost and is picked up again
+    locked_until = models.DateTimeField(blank=True, null=True)
+    locked_by = models.CharField(max_length=100, blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['status', 'locked_until']),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.id} ({self.status})"
+
 class AssessmentImage(models.Model):
     assessment = models.ForeignKey('Assessment', on_delete=models.CASCADE)
     uploaded_image = models.ForeignKey(UploadedImage, on_delete=models.CASCADE, db_column='uploadedimage_id')
@@ -37,6 +204,19 @@ class AssessmentImage(models.Model):
         db_table = 'images_assessment_images' # Attempt to keep the table name similar if desired, or let Django default.
                                              # Using specific name to match user expectation if possible.
 
+class AssessmentQuerySet(models.QuerySet):
+    def with_details(self):
+        """
+        Load everything AssessmentSerializer renders up front: the patient
+        with its wound count and each image with its renditions. Serializing
+        any number of assessments then takes a fixed number of queries.
+        """
+        from patient.models import Patient
+        return self.prefetch_related(
+            models.Prefetch('related_patient', queryset=Patient.objects.with_wound_counts()),
+            'images__derivatives',
+        )
+
 class Assessment(models.Model):
     """
     Clinical assessment model linking images and notes.
@@ -44,7 +224,9 @@ class Assessment(models.Model):
     patient_id = models.CharField(max_length=100, default="Unknown")
     related_patient = models.ForeignKey('patient.Patient', on_delete=models.SET_NULL, related_name='assessments', null=True, blank=True)
     clinician = models.ForeignKey(User, on_delete=models.CASCADE, related_name='assessments')
-    date = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add so imported records keep their date
+    date = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
     notes = models.TextField(blank=True)
     stage = models.CharField(max_length=50, default="Stage 1")
     wound_type = models.CharField(max_length=100, blank=True, null=True)
@@ -53,13 +235,152 @@ class Assessment(models.Model):
     length = models.CharField(max_length=20, blank=True, null=True)
     width = models.CharField(max_length=20, blank=True, null=True)
     depth = models.CharField(max_length=20, blank=True, null=True)
+    # Parsed from the fields above in save(), normalized to centimetres
+    length_cm = models.DecimalField(max_digits=7, decimal_places=2, blank=True, null=True)
+    width_cm = models.DecimalField(max_digits=7, decimal_places=2, blank=True, null=True)
+    depth_cm = models.DecimalField(max_digits=7, decimal_places=2, blank=True, null=True)
+    area_cm2 = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True, db_index=True)
+    volume_cm3 = models.DecimalField(max_digits=17, decimal_places=2, blank=True, null=True)
     location = models.CharField(max_length=100, blank=True, null=True)
     body_part = models.CharField(max_length=100, blank=True, null=True)
     # Use through model for custom fields on the relationship
     images = models.ManyToManyField(UploadedImage, related_name='assessments', blank=True, through='AssessmentImage')
+
+    objects = AssessmentQuerySet.as_manager()
     
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Keyset pagination of a clinician's assessments (see pagination.py)
+            models.Index(fields=['clinician', '-date', '-id']),
+            # Per-patient history, by FK or by the MRN stored in patient_id
+            models.Index(fields=['related_patient', 'date']),
+            models.Index(fields=['patient_id', 'date']),
+            # Change feed (see changes.py)
+            models.Index(fields=['clinician', 'updated_at', 'id']),
+        ]
         
+    def save(self, *args, **kwargs):
+        self.apply_measurements()
+        super().save(*args, **kwargs)
+
+    def apply_measurements(self):
+        """
+        Fill the numeric measurement columns from length / width / depth.
+        bulk_create() and update() skip save(), so call this before them.
+        """
+        for field, value in measurement_values(self.length, self.width, self.depth).items():
+            setattr(self, field, value)
+
     def __str__(self):
         return f"Assessment {self.id} - {self.patient_id} ({self.date.strftime('%Y-%m-%d')})"
+
+class DeletedRecord(models.Model):
+    """
+    Tombstone for a deleted assessment, image, patient or assignment, so the
+    change feed can tell clients to drop their copy.
+    """
+    model = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    # The user whose feed the deletion belongs to (None: everyone's). A plain
+    # id, not a FK, so deleting that user can't be blocked by its tombstones.
+    owner_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id']),
+            models.Index(fields=['owner_id', 'deleted_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+class DashboardCounter(models.Model):
+    """
+    Materialized dashboard count, kept current by signals (see stats.py).
+    """
+    SCOPE_WARD = 'ward'
+    SCOPE_CLINICIAN = 'clinician'
+    SCOPE_CHOICES = (
+        (SCOPE_WARD, 'Ward'),
+        (SCOPE_CLINICIAN, 'Clinician'),
+    )
+
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES)
+    # Ward name or user id
+    key = models.CharField(max_length=100)
+    metric = models.CharField(max_length=50)
+    # '' for running totals, an ISO date for daily counts
+    bucket = models.CharField(max_length=10, blank=True, default='')
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key', 'metric', 'bucket'], name='unique_dashboard_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} {self.metric}{' ' + self.bucket if self.bucket else ''} = {self.value}"
+
+
+class AssessmentRollup(models.Model):
+    """
+    Number of assessments per ward and day or week with a given stage, pain
+    level or exudate, kept current by signals (see rollups.py).
+    """
+    PERIOD_DAY = 'day'
+    PERIOD_WEEK = 'week'
+    PERIOD_CHOICES = (
+        (PERIOD_DAY, 'Day'),
+        (PERIOD_WEEK, 'Week'),
+    )
+
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    # The day, or the Monday of the week
+    period_start = models.DateField()
+    ward = models.CharField(max_length=50, blank=True, default='')
+    # 'stage', 'pain_level' or 'exudate'
+    dimension = models.CharField(max_length=20)
+    value = models.CharField(max_length=50, blank=True, default='')
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'ward', 'period_start', 'dimension', 'value'], name='unique_assessment_rollup'
+            ),
+        ]
+        indexes = [
+            # Chart queries across all wards
+            models.Index(fields=['period', 'period_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.ward or '-'} {self.period} {self.period_start} {self.dimension}={self.value}: {self.count}"
+
+
+class AssessmentReport(models.Model):
+    """
+    Rendered PDF report of an assessment (see reports.py). `version` changes
+    whenever anything shown in the report does, so a stored file with the
+    current version can be served as is.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    assessment = models.OneToOneField(Assessment, on_delete=models.CASCADE, related_name='report')
+    version = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    file = models.FileField(upload_to='reports/', blank=True)
+    requested_at = models.DateTimeField(default=timezone.now)
+    generated_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Report for assessment {self.assessment_id} ({self.status})"
@@ -0,0 +1,119 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Rows are ordered newest first on `(timestamp, id)` (or oldest first). The
+cursor encodes the last row of the page, and the next page is selected with
+`(timestamp, id) < (cursor timestamp, cursor id)`. That predicate walks a
+composite index, so page 100 costs the same as page 1 and rows inserted
+while a client is paging do not shift or repeat items the way OFFSET does.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_token(payload):
+    """
+    Opaque URL-safe encoding of a JSON-serializable cursor payload.
+    """
+    data = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def position_payload(timestamp, pk):
+    return [timestamp.isoformat(), pk]
+
+
+def parse_position(payload):
+    """
+    Return the `(timestamp, pk)` of a position made by position_payload().
+    """
+    try:
+        timestamp, pk = payload
+        timestamp = parse_datetime(timestamp)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if timestamp is None:
+        raise InvalidCursor('Invalid cursor')
+    return timestamp, pk
+
+
+def encode_cursor(timestamp, pk):
+    return encode_token(position_payload(timestamp, pk))
+
+
+def decode_cursor(cursor):
+    """
+    Return the `(timestamp, pk)` position encoded in `cursor`.
+    """
+    return parse_position(decode_token(cursor))
+
+
+def keyset_filter(queryset, field, timestamp, pk, descending=True):
+    """
+    Rows of `queryset` that come after `(timestamp, pk)` in `(field, id)` order.
+    """
+    after = 'lt' if descending else 'gt'
+    return queryset.filter(Q(**{f'{field}__{after}': timestamp}) | Q(**{field: timestamp, f'id__{after}': pk}))
+
+
+def page_size_from(request):
+    default = getattr(settings, 'CURSOR_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    maximum = getattr(settings, 'CURSOR_MAX_PAGE_SIZE', MAX_PAGE_SIZE)
+    value = request.query_params.get('page_size')
+    if value is None:
+        return default
+    try:
+        size = int(value)
+    except ValueError:
+        raise InvalidCursor('page_size must be an integer')
+    if size < 1:
+        raise InvalidCursor('page_size must be positive')
+    return min(size, maximum)
+
+
+def paginate_keyset(queryset, request, field, descending=True):
+    """
+    Return `(rows, next_cursor)` for the page of `queryset` selected by the
+    request's `cursor` and `page_size` parameters, ordered by `-field, -id`
+    (or `field, id` when not `descending`). `next_cursor` is None on the last
+    page. Raises InvalidCursor.
+    """
+    size = page_size_from(request)
+    if descending:
+        queryset = queryset.order_by(f'-{field}', '-id')
+    else:
+        queryset = queryset.order_by(field, 'id')
+
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        queryset = keyset_filter(queryset, field, timestamp, pk, descending)
+
+    # One extra row tells us whether there is another page without a COUNT
+    rows = list(queryset[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return rows, next_cursor
@@ -0,0 +1,159 @@
+"""
+Minimal PDF writer for the assessment reports.
+
+Supports what a report needs and nothing more: pages of text in the
+standard Helvetica fonts (nothing embedded), lines and JPEG images. JPEG
+data goes into the file unchanged (DCTDecode), so an existing rendition is
+embedded without decoding or re-encoding it.
+"""
+import io
+import zlib
+
+from PIL import Image
+
+# A4 in points
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+
+FONTS = {'regular': 'Helvetica', 'bold': 'Helvetica-Bold'}
+
+# Average Helvetica glyph width as a fraction of the font size, for wrapping
+AVERAGE_CHAR_WIDTH = 0.5
+
+
+def _escape(text):
+    data = str(text).encode('cp1252', errors='replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'').replace(b'\n', b' ')
+
+
+def _number(value):
+    return f'{value:.2f}'.rstrip('0').rstrip('.').encode()
+
+
+class PDFDocument:
+    """
+    Build a PDF page by page. Coordinates are in points from the top-left
+    corner of the page (PDF itself counts from the bottom-left).
+    """
+
+    def __init__(self, width=PAGE_WIDTH, height=PAGE_HEIGHT):
+        self.width = width
+        self.height = height
+        self.pages = []
+        self.images = []
+
+    def add_page(self):
+        self.pages.append({'content': [], 'images': set()})
+
+    @property
+    def _page(self):
+        if not self.pages:
+            self.add_page()
+        return self.pages[-1]
+
+    def text(self, x, y, text, size=10, font='regular'):
+        """
+        Draw one line of text with its baseline at `y`.
+        """
+        self._page['content'].append(
+            b'BT /%s %s Tf %s %s Td (%s) Tj ET' % (
+                font.encode(), _number(size), _number(x), _number(self.height - y), _escape(text)
+            )
+        )
+
+    def line(self, x1, y1, x2, y2, width=0.5, gray=0.8):
+        self._page['content'].append(
+            b'q %s G %s w %s %s m %s %s l S Q' % (
+                _number(gray), _number(width),
+                _number(x1), _number(self.height - y1), _number(x2), _number(self.height - y2),
+            )
+        )
+
+    def add_jpeg(self, data):
+        """
+        Register JPEG bytes; returns an index for image(). Register once and
+        draw as often as needed.
+        """
+        with Image.open(io.BytesIO(data)) as image:
+            # Only the header is read here
+            if image.format != 'JPEG' or image.mode not in ('RGB', 'L'):
+                raise ValueError('Only RGB or grayscale JPEG images are supported')
+            self.images.append((data, image.width, image.height, image.mode))
+        return len(self.images) - 1
+
+    def image(self, index, x, y, width, height):
+        """
+        Draw a registered image with its top-left corner at `(x, y)`.
+        """
+        self._page['images'].add(index)
+        self._page['content'].append(
+            b'q %s 0 0 %s %s %s cm /Im%d Do Q' % (
+                _number(width), _number(height), _number(x), _number(self.height - y - height), index
+            )
+        )
+
+    def render(self):
+        """
+        The document as PDF bytes.
+        """
+        if not self.pages:
+            self.add_page()
+        objects = []
+
+        def reserve():
+            objects.append(None)
+            return len(objects)
+
+        catalog, pages_root = reserve(), reserve()
+        fonts = {}
+        for name, base_font in FONTS.items():
+            fonts[name] = reserve()
+            objects[fonts[name] - 1] = (
+                b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % base_font.encode()
+            )
+        font_resources = b' '.join(b'/%s %d 0 R' % (name.encode(), number) for name, number in fonts.items())
+
+        image_objects = []
+        for data, width, height, mode in self.images:
+            number = reserve()
+            color_space = b'/DeviceRGB' if mode == 'RGB' else b'/DeviceGray'
+            objects[number - 1] = b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s ' \
+                b'/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>\nstream\n%s\nendstream' % (
+                    width, height, color_space, len(data), data
+                )
+            image_objects.append(number)
+
+        page_numbers = []
+        for page in self.pages:
+            content = zlib.compress(b'\n'.join(page['content']))
+            content_number = reserve()
+            objects[content_number - 1] = b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (
+                len(content), content
+            )
+            xobjects = b' '.join(b'/Im%d %d 0 R' % (index, image_objects[index]) for index in sorted(page['images']))
+            page_number = reserve()
+            objects[page_number - 1] = (
+                b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Contents %d 0 R '
+                b'/Resources << /Font << %s >> /XObject << %s >> >> >>' % (
+                    pages_root, _number(self.width), _number(self.height), content_number, font_resources, xobjects
+                )
+            )
+            page_numbers.append(page_number)
+
+        objects[catalog - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % pages_root
+        objects[pages_root - 1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % number for number in page_numbers), len(page_numbers)
+        )
+
+        output = io.BytesIO()
+        output.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(output.tell())
+            output.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+        xref = output.tell()
+        output.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+        for offset in offsets:
+            output.write(b'%010d 00000 n \n' % offset)
+        output.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, catalog, xref))
+        return output.getvalue()
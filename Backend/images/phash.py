@@ -0,0 +1,174 @@
+"""
+Perceptual hashes for near-duplicate detection.
+
+A dHash compares each pixel of a tiny grayscale thumbnail with its right-hand
+neighbour, giving a 64-bit fingerprint that survives re-encoding, resizing and
+small exposure changes. Two photos are near-duplicates when the Hamming
+distance between their hashes is small (roughly <= 10 of 64 bits).
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageOps
+
+HASH_SIZE = 8
+HASH_MASK = (1 << 64) - 1
+DEFAULT_MAX_DISTANCE = 8
+
+# Uploaders whose BK-trees are kept in memory, see uploader_tree()
+TREE_CACHE_SIZE = 64
+
+_trees = OrderedDict()
+_trees_lock = threading.Lock()
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def _grayscale(image, size):
+    # JPEG draft mode lets the decoder downscale by up to 8x while decoding
+    image.draft('L', (size[0] * 8, size[1] * 8))
+    image = ImageOps.exif_transpose(image).convert('L')
+    return np.asarray(image.resize(size, Image.Resampling.LANCZOS), dtype=np.int16)
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """
+    Difference hash of a PIL image as an unsigned 64-bit int.
+    """
+    pixels = _grayscale(image, (hash_size + 1, hash_size))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def ahash(image, hash_size=HASH_SIZE):
+    """
+    Average hash of a PIL image as an unsigned 64-bit int.
+    """
+    pixels = _grayscale(image, (hash_size, hash_size))
+    return _bits_to_int(pixels > pixels.mean())
+
+
+def dhash_file(path):
+    """
+    Pool task: dHash of an image file, in the signed form stored in the database.
+    """
+    with Image.open(path) as image:
+        return to_signed(dhash(image))
+
+
+def to_signed(value):
+    """
+    Map an unsigned 64-bit hash onto a signed BIGINT column.
+    """
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming(a, b):
+    return ((a ^ b) & HASH_MASK).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance.
+
+    Searching for hashes within distance d only descends into children whose
+    edge distance lies in [dist - d, dist + d] (triangle inequality), so a
+    lookup touches a small part of the tree instead of every stored hash.
+    """
+
+    def __init__(self, items=()):
+        self.root = None
+        for hash_value, key in items:
+            self.add(hash_value, key)
+
+    def add(self, hash_value, key):
+        if self.root is None:
+            self.root = (hash_value, [key], {})
+            return
+        node = self.root
+        while True:
+            distance = hamming(hash_value, node[0])
+            if distance == 0:
+                node[1].append(key)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (hash_value, [key], {})
+                return
+            node = child
+
+    def search(self, hash_value, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Return `(distance, key)` pairs within `max_distance`, closest first.
+        """
+        if self.root is None:
+            return []
+        matches = []
+        stack = [self.root]
+        while stack:
+            node_hash, keys, children = stack.pop()
+            distance = hamming(hash_value, node_hash)
+            if distance <= max_distance:
+                matches.extend((distance, key) for key in keys)
+            for edge, child in children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return sorted(matches)
+
+
+def uploader_tree(user):
+    """
+    BK-tree over the hashes of every image `user` uploaded, keyed by image id.
+
+    The tree is built once per process and reused until the user's images
+    change: a new, updated or re-hashed image moves their latest updated_at
+    and a deleted one their image count, both read in one indexed query.
+    """
+    from django.db.models import Count, Max
+
+    from .models import UploadedImage
+
+    images = UploadedImage.objects.filter(uploaded_by=user)
+    state = images.aggregate(count=Count('id'), changed=Max('updated_at'))
+    version = (state['count'], state['changed'])
+    key = user.pk if user is not None else None
+    with _trees_lock:
+        cached = _trees.get(key)
+        if cached is not None and cached[0] == version:
+            _trees.move_to_end(key)
+            return cached[1]
+
+    tree = BKTree(images.filter(perceptual_hash__isnull=False).values_list('perceptual_hash', 'id'))
+    with _trees_lock:
+        _trees[key] = (version, tree)
+        _trees.move_to_end(key)
+        while len(_trees) > TREE_CACHE_SIZE:
+            _trees.popitem(last=False)
+    return tree
+
+
+def near_duplicate_groups(items, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Cluster `(hash, key)` pairs whose hashes are within `max_distance` of each
+    other (transitively). Returns only groups with more than one member.
+    """
+    items = list(items)
+    tree = BKTree(items)
+    parent = {key: key for _, key in items}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for hash_value, key in items:
+        for _, other in tree.search(hash_value, max_distance):
+            parent[find(other)] = find(key)
+
+    groups = {}
+    for _, key in items:
+        groups.setdefault(find(key), []).append(key)
+    return [sorted(group) for group in groups.values() if len(group) > 1]
@@ -0,0 +1,134 @@
+"""
+Process pool for CPU-bound image work (decode, resize, re-encode).
+
+Tasks are plain top-level functions taking picklable arguments (file paths,
+sizes) and returning picklable results, so they can run in worker processes
+without touching the database. Results are handed back to the parent, which
+does the storage and ORM work.
+"""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.base import File
+
+from .storage import compute_content_hash
+from .validators import read_image_header
+
+TaskResult = namedtuple('TaskResult', ['key', 'value', 'error', 'seconds'])
+
+
+def _timed_call(func, args):
+    # Runs in the worker process: never raise, so one bad file can't take the
+    # whole batch down, and report how long the task itself took.
+    started = time.perf_counter()
+    try:
+        return func(*args), None, time.perf_counter() - started
+    except Exception as exc:
+        return None, f'{type(exc).__name__}: {exc}', time.perf_counter() - started
+
+
+def file_metadata(path):
+    """
+    Task: content hash, parsed header and byte size of a stored file.
+    """
+    with open(path, 'rb') as file:
+        content_hash = compute_content_hash(File(file))
+        header = read_image_header(file)
+    return content_hash, header, os.path.getsize(path)
+
+
+class PoolStats:
+    """
+    Running totals for a pool run, to see whether the cores are saturated.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.completed = 0
+        self.failed = 0
+        self.task_seconds = 0.0
+        self.slowest = 0.0
+        self.started = time.perf_counter()
+
+    def add(self, result):
+        self.completed += 1
+        if result.error is not None:
+            self.failed += 1
+        self.task_seconds += result.seconds
+        self.slowest = max(self.slowest, result.seconds)
+
+    @property
+    def wall_seconds(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        wall = self.wall_seconds
+        average = self.task_seconds / self.completed if self.completed else 0.0
+        # Share of the available worker time spent inside tasks
+        utilization = self.task_seconds / (wall * self.workers) if wall else 0.0
+        return (
+            f"{self.completed} tasks ({self.failed} failed) in {wall:.1f}s on {self.workers} workers, "
+            f"avg {average * 1000:.0f}ms, slowest {self.slowest * 1000:.0f}ms, "
+            f"utilization {utilization:.0%}"
+        )
+
+
+class ImageProcessingPool:
+    """
+    Run image transformations across processes.
+
+    At most `max_in_flight` tasks are submitted at any time, which bounds the
+    memory held by pending arguments and finished-but-unconsumed results no
+    matter how many items the input iterable produces.
+    """
+
+    def __init__(self, workers=None, max_in_flight=None):
+        self.workers = workers or getattr(settings, 'IMAGE_PROCESSING_WORKERS', None) or os.cpu_count() or 1
+        self.max_in_flight = (
+            max_in_flight or getattr(settings, 'IMAGE_PROCESSING_MAX_IN_FLIGHT', None) or self.workers * 2
+        )
+        self.stats = PoolStats(self.workers)
+        self._executor = None
+
+    def __enter__(self):
+        # Keep the worker processes alive across several imap() calls
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._executor.shutdown()
+        self._executor = None
+
+    def imap(self, func, tasks):
+        """
+        Apply `func` to every `(key, args)` pair of `tasks`, yielding a
+        TaskResult per task in completion order. `tasks` is consumed lazily.
+        """
+        if self._executor is None:
+            with self:
+                yield from self.imap(func, tasks)
+            return
+
+        tasks = iter(tasks)
+        pending = {}
+
+        def submit_next():
+            for key, args in tasks:
+                pending[self._executor.submit(_timed_call, func, args)] = key
+                return
+
+        for _ in range(self.max_in_flight):
+            submit_next()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                value, error, seconds = future.result()
+                result = TaskResult(key, value, error, seconds)
+                self.stats.add(result)
+                submit_next()
+                yield result
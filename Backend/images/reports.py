@@ -0,0 +1,244 @@
+"""
+PDF reports of single assessments.
+
+A report is rendered by a background job (`render_assessment_report`) and
+stored as an AssessmentReport file. Its version is a hash of everything the
+report shows, so repeat downloads are served from the stored file until the
+assessment, its patient or its images change. Images are embedded from
+their stored renditions, never from the full-size originals.
+"""
+import hashlib
+import textwrap
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from .derivatives import render_renditions
+from .jobs import enqueue
+from .models import AssessmentReport
+from .pdf import AVERAGE_CHAR_WIDTH, PAGE_HEIGHT, PAGE_WIDTH, PDFDocument
+
+# Longest edge of the rendition embedded for each image
+REPORT_IMAGE_SIZE = 1280
+
+MARGIN = 50
+IMAGE_GAP = 20
+MAX_IMAGE_HEIGHT = 260
+
+
+def report_version(assessment):
+    """
+    Changes whenever anything shown in the report of `assessment` changes.
+    Reads the images prefetched by with_details().
+    """
+    patient = assessment.related_patient
+    parts = [
+        assessment.pk,
+        assessment.updated_at.isoformat(),
+        patient.pk if patient else None,
+        patient.updated_at.isoformat() if patient else None,
+    ]
+    for image in sorted(assessment.images.all(), key=lambda image: image.pk):
+        parts.append((image.pk, sorted(derivative.size for derivative in image.derivatives.all())))
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def _jpeg(image):
+    """
+    JPEG bytes of the rendition to embed for `image`, made from the
+    original only when it has no suitable rendition yet.
+    """
+    derivatives = [d for d in image.derivatives.all() if d.size <= REPORT_IMAGE_SIZE]
+    if derivatives:
+        derivative = max(derivatives, key=lambda d: d.size)
+        with derivative.image.open('rb') as file:
+            return file.read()
+    with image.image.open('rb') as file:
+        data, _, _ = render_renditions(file, sizes=(REPORT_IMAGE_SIZE,))[REPORT_IMAGE_SIZE]
+    return data
+
+
+class _Layout:
+    """
+    Places blocks top to bottom, starting a new page when one doesn't fit.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.y = MARGIN
+        document.add_page()
+
+    def ensure(self, height):
+        if self.y + height > PAGE_HEIGHT - MARGIN:
+            self.document.add_page()
+            self.y = MARGIN
+
+    def heading(self, text):
+        self.ensure(40)
+        self.y += 24
+        self.document.text(MARGIN, self.y, text, size=12, font='bold')
+        self.y += 6
+        self.document.line(MARGIN, self.y, PAGE_WIDTH - MARGIN, self.y)
+        self.y += 6
+
+    def fields(self, pairs):
+        """
+        Label / value pairs in two columns.
+        """
+        column = (PAGE_WIDTH - 2 * MARGIN) / 2
+        for start in range(0, len(pairs), 2):
+            self.ensure(16)
+            self.y += 14
+            for offset, (label, value) in enumerate(pairs[start:start + 2]):
+                x = MARGIN + offset * column
+                self.document.text(x, self.y, label, size=9, font='bold')
+                self.document.text(x + 95, self.y, '-' if value in (None, '') else value, size=9)
+
+    def paragraph(self, text, size=9):
+        width = int((PAGE_WIDTH - 2 * MARGIN) / (size * AVERAGE_CHAR_WIDTH))
+        for line in textwrap.wrap(text, width) or ['-']:
+            self.ensure(size + 4)
+            self.y += size + 4
+            self.document.text(MARGIN, self.y, line, size=size)
+
+    def images(self, jpegs):
+        """
+        Two images per row, scaled to the column width.
+        """
+        column = (PAGE_WIDTH - 2 * MARGIN - IMAGE_GAP) / 2
+        for start in range(0, len(jpegs), 2):
+            row = []
+            for data in jpegs[start:start + 2]:
+                index = self.document.add_jpeg(data)
+                _, width, height, _ = self.document.images[index]
+                scale = min(column / width, MAX_IMAGE_HEIGHT / height)
+                row.append((index, width * scale, height * scale))
+            row_height = max(height for _, _, height in row)
+            self.ensure(row_height + IMAGE_GAP)
+            self.y += IMAGE_GAP / 2
+            for offset, (index, width, height) in enumerate(row):
+                self.document.image(index, MARGIN + offset * (column + IMAGE_GAP), self.y, width, height)
+            self.y += row_height
+
+
+def _measurement(raw, cm):
+    if cm is None:
+        return raw
+    return f'{raw} ({cm} cm)' if raw else f'{cm} cm'
+
+
+def render_report(assessment):
+    """
+    The PDF report of `assessment` (loaded with with_details() and its
+    clinician) as bytes.
+    """
+    document = PDFDocument()
+    layout = _Layout(document)
+    layout.y += 18
+    document.text(MARGIN, layout.y, 'Wound Assessment Report', size=18, font='bold')
+    layout.y += 16
+    generated = timezone.now()
+    if timezone.is_aware(generated):
+        generated = timezone.localtime(generated)
+    document.text(
+        MARGIN, layout.y,
+        f'Assessment #{assessment.pk} - generated {generated:%Y-%m-%d %H:%M}', size=9,
+    )
+
+    patient = assessment.related_patient
+    layout.heading('Patient')
+    if patient:
+        layout.fields([
+            ('Name', patient.name),
+            ('MRN', patient.mrn),
+            ('Date of birth', patient.dob),
+            ('Gender', patient.gender),
+            ('Ward', patient.ward),
+            ('Bed', patient.bed_number),
+            ('Risk level', patient.risk_level),
+            ('Physician', patient.assigning_physician),
+        ])
+        if patient.diagnosis:
+            layout.y += 6
+            layout.paragraph(f'Diagnosis: {patient.diagnosis}')
+    else:
+        layout.fields([('Patient ID', assessment.patient_id)])
+
+    layout.heading('Assessment')
+    layout.fields([
+        ('Date', f'{assessment.date:%Y-%m-%d %H:%M}'),
+        ('Clinician', assessment.clinician.get_full_name() or assessment.clinician.username),
+        ('Wound type', assessment.wound_type),
+        ('Stage', assessment.stage),
+        ('Location', assessment.location),
+        ('Body part', assessment.body_part),
+        ('Exudate', assessment.exudate),
+        ('Pain level', f'{assessment.pain_level}/10'),
+    ])
+
+    layout.heading('Measurements')
+    layout.fields([
+        ('Length', _measurement(assessment.length, assessment.length_cm)),
+        ('Width', _measurement(assessment.width, assessment.width_cm)),
+        ('Depth', _measurement(assessment.depth, assessment.depth_cm)),
+        ('Area', f'{assessment.area_cm2} cm²' if assessment.area_cm2 is not None else None),
+        ('Volume', f'{assessment.volume_cm3} cm³' if assessment.volume_cm3 is not None else None),
+    ])
+
+    layout.heading('Notes')
+    layout.paragraph(assessment.notes or '')
+
+    images = sorted(assessment.images.all(), key=lambda image: image.pk)
+    if images:
+        layout.heading('Images')
+        layout.images([_jpeg(image) for image in images])
+    return document.render()
+
+
+def report_file_name(assessment_id, version):
+    return f'assessment-{assessment_id}-{version[:16]}.pdf'
+
+
+def request_report(assessment, retry=False):
+    """
+    The AssessmentReport of `assessment`, queueing a render when there is no
+    current one. A render of the current version that failed is only queued
+    again with `retry`; otherwise the report keeps its failed status so the
+    caller can say so. Returns `(report, ready)`.
+    """
+    version = report_version(assessment)
+    report, created = AssessmentReport.objects.get_or_create(
+        assessment=assessment, defaults={'version': version}
+    )
+    if not created and report.version == version:
+        if report.status == AssessmentReport.STATUS_READY and report.file:
+            return report, True
+        if report.status == AssessmentReport.STATUS_PENDING:
+            return report, False
+        if report.status == AssessmentReport.STATUS_FAILED and not retry:
+            return report, False
+    if not created:
+        # Outdated, or failed and retried: render the current version
+        AssessmentReport.objects.filter(pk=report.pk).update(
+            version=version, status=AssessmentReport.STATUS_PENDING, requested_at=timezone.now()
+        )
+        report.version, report.status = version, AssessmentReport.STATUS_PENDING
+    enqueue('render_assessment_report', assessment_id=assessment.pk, version=version)
+    return report, False
+
+
+def store_report(report, version, data):
+    """
+    Save rendered `data` as the file of `report` unless a newer version was
+    requested meanwhile. Replaces the previous file.
+    """
+    previous = report.file.name
+    storage = report.file.storage
+    name = storage.save(f'{report.file.field.upload_to}{report_file_name(report.assessment_id, version)}', ContentFile(data))
+    stored = AssessmentReport.objects.filter(pk=report.pk, version=version).update(
+        file=name, status=AssessmentReport.STATUS_READY, generated_at=timezone.now()
+    )
+    if not stored:
+        storage.delete(name)
+    elif previous and previous != name:
+        storage.delete(previous)
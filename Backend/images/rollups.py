@@ -0,0 +1,197 @@
+"""
+Daily and weekly distributions of assessment stage, pain level and exudate
+per ward, pre-aggregated for the unit charts.
+
+Every assessment adds one to an AssessmentRollup row for each period
+(its day and its week, weeks starting on Monday) and each dimension. Like
+the dashboard counters (stats.py), the rows are moved by signals as
+assessments are saved and deleted, and by record_created() after
+bulk_create(). An assessment counts under its patient's current ward, so a
+patient changing ward moves their assessments with them. Anything written
+around the signals (QuerySet.update(), raw SQL) is corrected by
+`python manage.py rebuild_assessment_rollups`, which recomputes the rows
+from the assessments with GROUP BY queries.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncDate, TruncWeek
+
+from .models import Assessment, AssessmentRollup
+from .stats import UNCHANGED, increment, local_date
+
+DAY = AssessmentRollup.PERIOD_DAY
+WEEK = AssessmentRollup.PERIOD_WEEK
+
+ROLLUP_DIMENSIONS = ('stage', 'pain_level', 'exudate')
+
+ROLLUP_BATCH_SIZE = 1000
+
+# How far back charts go by default: 30 days, 12 weeks
+DEFAULT_SPANS = {DAY: timedelta(days=29), WEEK: timedelta(weeks=11)}
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _value(value):
+    return '' if value is None else str(value)
+
+
+def _keys(date, ward, values):
+    """
+    The `(period, period_start, ward, dimension, value)` rows one assessment
+    adds one to.
+    """
+    day = local_date(date)
+    ward = ward or ''
+    return [
+        (period, start, ward, dimension, _value(values[dimension]))
+        for period, start in ((DAY, day), (WEEK, week_start(day)))
+        for dimension in ROLLUP_DIMENSIONS
+    ]
+
+
+def _ward(assessment):
+    return assessment.related_patient.ward if assessment.related_patient_id else None
+
+
+def rollup_keys(assessment, ward=None):
+    """
+    The rollup rows `assessment` counts in; pass `ward` when it's already
+    known to skip loading the patient.
+    """
+    values = {dimension: getattr(assessment, dimension) for dimension in ROLLUP_DIMENSIONS}
+    return _keys(assessment.date, _ward(assessment) if ward is None else ward, values)
+
+
+def apply_changes(before, after):
+    changes = Counter(after)
+    changes.subtract(before)
+    for (period, start, ward, dimension, value), delta in changes.items():
+        increment(
+            AssessmentRollup, 'count', delta,
+            period=period, period_start=start, ward=ward, dimension=dimension, value=value,
+        )
+
+
+def record_saved(assessment, stored):
+    """
+    Move the rollups of a saved assessment; `stored` is from
+    stats.stored_row().
+    """
+    if stored is UNCHANGED:
+        return
+    if stored is None:
+        apply_changes([], rollup_keys(assessment))
+        return
+    before = rollup_keys(stored)
+    # Same patient: reuse the ward read with the stored row
+    ward = (_ward(stored) or '') if stored.related_patient_id == assessment.related_patient_id else None
+    apply_changes(before, rollup_keys(assessment, ward))
+
+
+def record_deleted(assessment):
+    apply_changes(rollup_keys(assessment), [])
+
+
+def record_created(assessments):
+    """
+    Count assessments inserted with bulk_create(), which sends no signals.
+    """
+    from patient.models import Patient
+
+    wards = dict(
+        Patient.objects.filter(pk__in={a.related_patient_id for a in assessments if a.related_patient_id})
+        .values_list('pk', 'ward')
+    )
+    added = []
+    for assessment in assessments:
+        added.extend(rollup_keys(assessment, wards.get(assessment.related_patient_id) or ''))
+    apply_changes([], added)
+
+
+def _grouped(assessments, ward_field=None):
+    """
+    Yield `(key, count)` for the rollup rows of `assessments`, counted with
+    one GROUP BY query per period and dimension. The ward in each key is
+    read from `ward_field`, or left empty.
+    """
+    for period, trunc in ((DAY, TruncDate('date')), (WEEK, TruncWeek('date', output_field=DateField()))):
+        for dimension in ROLLUP_DIMENSIONS:
+            fields = ['start', dimension] + ([ward_field] if ward_field else [])
+            rows = assessments.annotate(start=trunc).values(*fields).annotate(total=Count('id')).order_by()
+            for row in rows:
+                ward = (row[ward_field] or '') if ward_field else ''
+                yield (period, row['start'], ward, dimension, _value(row[dimension])), row['total']
+
+
+def move_patient(patient_id, old_ward, new_ward):
+    """
+    Move a patient's assessments from `old_ward` to `new_ward`.
+    """
+    old_ward, new_ward = old_ward or '', new_ward or ''
+    if old_ward == new_ward:
+        return
+    before, after = Counter(), Counter()
+    for (period, start, _, dimension, value), count in _grouped(Assessment.objects.filter(related_patient_id=patient_id)):
+        before[(period, start, old_ward, dimension, value)] += count
+        after[(period, start, new_ward, dimension, value)] += count
+    apply_changes(before, after)
+
+
+def computed_rollups():
+    """
+    Every rollup row as counted from the assessments.
+    """
+    counts = Counter()
+    for key, count in _grouped(Assessment.objects.all(), 'related_patient__ward'):
+        counts[key] += count
+    return counts
+
+
+def rebuild(batch_size=ROLLUP_BATCH_SIZE):
+    """
+    Replace every rollup row with freshly computed counts. Returns the number
+    of rows written.
+    """
+    counts = computed_rollups()
+    with transaction.atomic():
+        AssessmentRollup.objects.all().delete()
+        AssessmentRollup.objects.bulk_create(
+            (
+                AssessmentRollup(
+                    period=period, period_start=start, ward=ward, dimension=dimension, value=value, count=count
+                )
+                for (period, start, ward, dimension, value), count in counts.items()
+            ),
+            batch_size=batch_size,
+        )
+    return len(counts)
+
+
+def distribution(period, start, end, ward=None, dimensions=ROLLUP_DIMENSIONS):
+    """
+    `[{'period_start': date, dimension: {value: count}}]` for each period
+    from `start` to `end` (inclusive) that has assessments, oldest first.
+    Without `ward`, all wards are summed.
+    """
+    if period == WEEK:
+        start = week_start(start)
+    rows = AssessmentRollup.objects.filter(
+        period=period, period_start__range=(start, end), dimension__in=dimensions, count__gt=0
+    )
+    if ward is not None:
+        rows = rows.filter(ward=ward)
+    rows = rows.values('period_start', 'dimension', 'value').annotate(total=Sum('count')).order_by('period_start')
+
+    buckets = {}
+    for row in rows:
+        bucket = buckets.setdefault(
+            row['period_start'], {'period_start': row['period_start'], **{d: {} for d in dimensions}}
+        )
+        bucket[row['dimension']][row['value']] = row['total']
+    return list(buckets.values())
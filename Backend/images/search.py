@@ -0,0 +1,177 @@
+"""
+Full-text search over assessment notes and patient diagnoses.
+
+PostgreSQL: each searchable table gets a `search_vector tsvector` column,
+filled by a trigger on every insert and update (bulk_create() and update()
+included) and covered by a GIN index. The column is not a model field, so
+the ORM never writes it.
+
+SQLite (local development): an FTS5 external-content table per model, kept
+in sync by triggers. SQLite rebuilds a table for most ALTERs, which drops
+its triggers; run `python manage.py rebuild_search_index` after such a
+migration.
+
+Any other database falls back to icontains.
+
+The triggers and indexes are installed by migration 0021 (install_search).
+"""
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'english'
+
+# ts_rank()'s default weight for each tsvector weight letter, reused for bm25()
+WEIGHT_VALUES = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+
+def _searchable():
+    from patient.models import Patient
+
+    from .models import Assessment
+
+    # Model -> (column, tsvector weight); earlier columns rank higher
+    return {
+        Assessment: [('wound_type', 'A'), ('location', 'B'), ('notes', 'C')],
+        Patient: [('diagnosis', 'A')],
+    }
+
+
+def _fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def _postgresql_sql(model, columns):
+    table = model._meta.db_table
+    vector = ' || '.join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.{column}, '')), '{weight}')"
+        for column, weight in columns
+    )
+    return [
+        f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector',
+        f'''CREATE OR REPLACE FUNCTION {table}_search_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {vector};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql''',
+        f'DROP TRIGGER IF EXISTS {table}_search_update ON {table}',
+        f'''CREATE TRIGGER {table}_search_update BEFORE INSERT OR UPDATE ON {table}
+FOR EACH ROW EXECUTE FUNCTION {table}_search_update()''',
+        # Fill existing rows through the trigger
+        f'UPDATE {table} SET id = id',
+        f'CREATE INDEX IF NOT EXISTS {table}_search_gin ON {table} USING gin (search_vector)',
+    ]
+
+
+def _sqlite_sql(model, columns):
+    table = model._meta.db_table
+    fts = _fts_table(model)
+    names = ', '.join(column for column, _ in columns)
+    new_values = ', '.join(f'new.{column}' for column, _ in columns)
+    old_values = ', '.join(f'old.{column}' for column, _ in columns)
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{names}, content='{table}', content_rowid='id', tokenize='porter unicode61')",
+        f'DROP TRIGGER IF EXISTS {fts}_insert',
+        f'DROP TRIGGER IF EXISTS {fts}_delete',
+        f'DROP TRIGGER IF EXISTS {fts}_update',
+        f'CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert_new} END',
+        f'CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete_old} END',
+        f'CREATE TRIGGER {fts}_update AFTER UPDATE ON {table} BEGIN {delete_old} {insert_new} END',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def install_search(schema_editor):
+    """
+    Create (or re-create) the search columns, indexes and triggers and index
+    the existing rows. Safe to run repeatedly.
+    """
+    vendor = schema_editor.connection.vendor
+    for model, columns in _searchable().items():
+        if vendor == 'postgresql':
+            statements = _postgresql_sql(model, columns)
+        elif vendor == 'sqlite':
+            statements = _sqlite_sql(model, columns)
+        else:
+            return
+        for sql in statements:
+            schema_editor.execute(sql, params=None)
+
+
+def uninstall_search(schema_editor):
+    vendor = schema_editor.connection.vendor
+    for model in _searchable():
+        table = model._meta.db_table
+        if vendor == 'postgresql':
+            statements = [
+                f'DROP TRIGGER IF EXISTS {table}_search_update ON {table}',
+                f'DROP FUNCTION IF EXISTS {table}_search_update()',
+                f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector',
+            ]
+        elif vendor == 'sqlite':
+            fts = _fts_table(model)
+            statements = [f'DROP TRIGGER IF EXISTS {fts}_{event}' for event in ('insert', 'delete', 'update')]
+            statements.append(f'DROP TABLE IF EXISTS {fts}')
+        else:
+            return
+        for sql in statements:
+            schema_editor.execute(sql, params=None)
+
+
+def _fts5_query(query):
+    # Quote every word so FTS5 operators typed by the user are matched literally
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+
+
+def _has_fts_table(model):
+    return _fts_table(model) in connection.introspection.table_names()
+
+
+def search_filter(model, query):
+    """
+    Q matching the rows of `model` whose searchable text matches `query`.
+    """
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = f'SELECT id FROM {table} WHERE search_vector @@ websearch_to_tsquery(%s::regconfig, %s)'
+        return Q(id__in=RawSQL(sql, [SEARCH_CONFIG, query]))
+    if connection.vendor == 'sqlite' and _has_fts_table(model):
+        fts = _fts_table(model)
+        return Q(id__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [_fts5_query(query)]))
+
+    match = Q()
+    for column, _ in _searchable()[model]:
+        match |= Q(**{f'{column}__icontains': query})
+    return match
+
+
+def search_rank(model, query):
+    """
+    Relevance of each row to `query`, higher is better.
+    """
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = f'ts_rank({table}.search_vector, websearch_to_tsquery(%s::regconfig, %s))'
+        return RawSQL(sql, [SEARCH_CONFIG, query], output_field=FloatField())
+    if connection.vendor == 'sqlite' and _has_fts_table(model):
+        fts = _fts_table(model)
+        weights = ', '.join(str(WEIGHT_VALUES[weight]) for _, weight in _searchable()[model])
+        # bm25() is lower for better matches
+        sql = f'SELECT -bm25({fts}, {weights}) FROM {fts} WHERE {fts} MATCH %s AND {fts}.rowid = {table}.id'
+        return RawSQL(sql, [_fts5_query(query)], output_field=FloatField())
+    return Value(0.0, output_field=FloatField())
+
+
+def search(queryset, query):
+    """
+    `queryset` narrowed to rows matching `query`, best matches first, with
+    the score in `rank`.
+    """
+    model = queryset.model
+    return queryset.filter(search_filter(model, query)).annotate(
+        rank=search_rank(model, query)
+    ).order_by('-rank', '-pk')
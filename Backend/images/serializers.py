@@ -1,27 +1,88 @@
 from rest_framework import serializers
-from .models import UploadedImage, Assessment
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.base import File
+from .models import UploadedImage, Assessment, UploadSession
+from .derivatives import RENDITION_SIZES
+from .signing import signed_media_url
+from .validators import MAX_IMAGE_SIZE, validate_image_content, validate_image_format, validate_image_size
 
 class UploadedImageSerializer(serializers.ModelSerializer):
     """
     Serializer for uploaded images.
     """
+    # A plain FileField: the header check in validate_image_content replaces
+    # DRF's ImageField, which would fully decode the image with Pillow.
+    image = serializers.FileField(
+        validators=[validate_image_format, validate_image_size, validate_image_content]
+    )
     image_url = serializers.SerializerMethodField()
+    derivatives = serializers.SerializerMethodField()
     
     class Meta:
         model = UploadedImage
-        fields = ['id', 'image', 'image_url', 'image_full_url', 'uploaded_at', 'description', 'uploaded_by']
-        read_only_fields = ['uploaded_at']
+        fields = [
+            'id', 'image', 'image_url', 'derivatives', 'image_full_url', 'uploaded_at', 'description', 'uploaded_by',
+            'width', 'height', 'image_format', 'byte_size', 'content_hash', 'processing_status'
+        ]
+        read_only_fields = [
+            'uploaded_at', 'width', 'height', 'image_format', 'byte_size', 'content_hash', 'processing_status'
+        ]
     
+    def _absolute_url(self, field_file):
+        # Signed and expiring, see signing.py
+        return signed_media_url(field_file, self.context.get('request'))
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.image:
+            # Never hand out the permanent, unauthenticated /media/ URLs
+            data['image'] = data['image_full_url'] = data['image_url']
+        return data
+
     def get_image_url(self, obj):
         """
         Get the full URL of the uploaded image.
         """
-        request = self.context.get('request')
-        if obj.image and hasattr(obj.image, 'url'):
-            if request is not None:
-                return request.build_absolute_uri(obj.image.url)
-            return obj.image.url
-        return None
+        return self._absolute_url(obj.image)
+
+    def get_derivatives(self, obj):
+        """
+        Map each rendition size to its URL. Sizes that have not been generated
+        (yet, or because the original is smaller) fall back to the original.
+        """
+        original_url = self.get_image_url(obj)
+        urls = {str(size): original_url for size in RENDITION_SIZES}
+        for derivative in obj.derivatives.all():
+            urls[str(derivative.size)] = self._absolute_url(derivative.image)
+        return urls
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for resumable upload sessions. `offset` is the number of bytes
+    already received, i.e. where the next chunk has to start.
+    """
+    offset = serializers.IntegerField(source='received', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'total_size', 'offset', 'description', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
+
+    def validate_filename(self, value):
+        try:
+            validate_image_format(File(None, name=value))
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+        return value
+
+    def validate_total_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('File is empty.')
+        if value > MAX_IMAGE_SIZE:
+            raise serializers.ValidationError(
+                f'File size exceeds 10MB limit. Your file is {value / (1024 * 1024):.2f}MB'
+            )
+        return value
 
 from patient.serializers import PatientSerializer
 
@@ -37,6 +98,10 @@ class AssessmentSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'patient_id', 'related_patient', 'patient_details', 'clinician', 
             'date', 'notes', 'stage', 'wound_type', 'exudate', 'pain_level', 
-            'length', 'width', 'depth', 'location', 'body_part', 'images', 'image_details'
+            'length', 'width', 'depth', 'length_cm', 'width_cm', 'depth_cm', 'area_cm2', 'volume_cm3',
+            'location', 'body_part', 'images', 'image_details'
+        ]
+        read_only_fields = [
+            'date', 'clinician', 'related_patient', 'images',
+            'length_cm', 'width_cm', 'depth_cm', 'area_cm2', 'volume_cm3'
         ]
-        read_only_fields = ['date', 'clinician', 'related_patient', 'images']
@@ -0,0 +1,80 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from patient.models import Patient, PatientAssignment
+
+from . import rollups, stats
+from .analytics import invalidate_healing_cache
+from .models import Assessment, AssessmentReport, DeletedRecord, UploadedImage
+
+# Tombstone name and the field holding the user whose feed it belongs to
+TOMBSTONES = {
+    Assessment: ('assessment', 'clinician_id'),
+    UploadedImage: ('image', 'uploaded_by_id'),
+    Patient: ('patient', None),
+    PatientAssignment: ('assignment', 'nurse_id'),
+}
+
+
+@receiver([post_save, post_delete], sender=Assessment)
+@receiver([post_save, post_delete], sender=Patient)
+def assessment_changed(sender, **kwargs):
+    # A new measurement or a patient moving ward changes the healing metrics
+    invalidate_healing_cache()
+
+
+@receiver(post_delete, sender=Assessment)
+@receiver(post_delete, sender=UploadedImage)
+@receiver(post_delete, sender=Patient)
+@receiver(post_delete, sender=PatientAssignment)
+def record_deletion(sender, instance, **kwargs):
+    # Lets the change feed tell clients to drop their copy
+    model, owner_field = TOMBSTONES[sender]
+    DeletedRecord.objects.create(
+        model=model,
+        object_id=instance.pk,
+        owner_id=getattr(instance, owner_field) if owner_field else None,
+    )
+
+
+@receiver(pre_save, sender=Assessment)
+@receiver(pre_save, sender=Patient)
+@receiver(pre_save, sender=PatientAssignment)
+def read_stored_row(sender, instance, update_fields=None, raw=False, **kwargs):
+    # What the row counted for before this save, so post_save can move it
+    instance._stored_row = stats.UNCHANGED if raw else stats.stored_row(instance, update_fields)
+
+
+@receiver(post_save, sender=Assessment)
+@receiver(post_save, sender=Patient)
+@receiver(post_save, sender=PatientAssignment)
+def update_counters(sender, instance, **kwargs):
+    stored = getattr(instance, '_stored_row', stats.UNCHANGED)
+    instance._stored_row = stats.UNCHANGED
+    stats.record_saved(instance, stored)
+    if sender is Assessment:
+        rollups.record_saved(instance, stored)
+    elif sender is Patient and stored is not None and stored is not stats.UNCHANGED:
+        rollups.move_patient(instance.pk, stored.ward, instance.ward)
+
+
+@receiver(pre_delete, sender=Patient)
+def detach_patient_rollups(sender, instance, **kwargs):
+    # The patient's assessments are about to lose their link, and their ward
+    rollups.move_patient(instance.pk, instance.ward, None)
+
+
+@receiver(post_delete, sender=Assessment)
+@receiver(post_delete, sender=Patient)
+@receiver(post_delete, sender=PatientAssignment)
+def remove_counters(sender, instance, **kwargs):
+    stats.apply_changes(stats.contributions(instance), [])
+    if sender is Assessment:
+        rollups.record_deleted(instance)
+
+
+@receiver(post_delete, sender=AssessmentReport)
+def delete_report_file(sender, instance, **kwargs):
+    # Rendered reports are per assessment; nothing else refers to the file
+    if instance.file:
+        instance.file.delete(save=False)
@@ -0,0 +1,212 @@
+"""
+Dashboard statistics kept as counters instead of counted on every load.
+
+Each patient, assessment and nurse assignment contributes +1 to a few
+DashboardCounter rows (patients per ward, high-risk patients per ward,
+assessments per clinician per day, active assignments per nurse). Signals
+apply the difference between a row's counters before and after each save
+or delete with atomic `value = value + n` updates; an update costs one
+extra primary-key read of the stored row. bulk_create() and update() send
+no signals: call record_created() after bulk_create(), and run
+`python manage.py reconcile_dashboard_stats` periodically to correct any
+drift.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Assessment, DashboardCounter
+
+WARD = DashboardCounter.SCOPE_WARD
+CLINICIAN = DashboardCounter.SCOPE_CLINICIAN
+
+# Returned by stored_row() when a save can't change any counter
+UNCHANGED = object()
+
+
+def local_date(value):
+    """
+    The calendar day of a datetime in the current time zone, as TruncDate
+    computes it.
+    """
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+def _tracked_fields():
+    from patient.models import Patient, PatientAssignment
+
+    # Model -> the fields the counters here and in rollups.py depend on
+    return {
+        Patient: ('ward', 'risk_level'),
+        Assessment: ('clinician', 'date', 'related_patient__ward', 'stage', 'pain_level', 'exudate'),
+        PatientAssignment: ('nurse', 'active'),
+    }
+
+
+def contributions(instance):
+    """
+    The `(scope, key, metric, bucket)` counters `instance` adds one to.
+    """
+    from patient.models import Patient, PatientAssignment
+
+    if isinstance(instance, Patient):
+        ward = instance.ward or ''
+        counters = [(WARD, ward, 'patients', '')]
+        if instance.risk_level == 'High':
+            counters.append((WARD, ward, 'critical_patients', ''))
+        return counters
+    if isinstance(instance, Assessment):
+        return [(CLINICIAN, str(instance.clinician_id), 'assessments', local_date(instance.date).isoformat())]
+    if isinstance(instance, PatientAssignment):
+        return [(CLINICIAN, str(instance.nurse_id), 'assigned_patients', '')] if instance.active else []
+    return []
+
+
+def stored_row(instance, update_fields=None):
+    """
+    The saved row behind `instance` with the fields counters depend on, read
+    before the save overwrites it. None for a new row, UNCHANGED when the
+    save doesn't write any of those fields.
+    """
+    if instance._state.adding:
+        return None
+    fields = _tracked_fields()[type(instance)]
+    if update_fields is not None and not {field.split('__')[0] for field in fields} & set(update_fields):
+        return UNCHANGED
+    queryset = type(instance)._base_manager.filter(pk=instance.pk)
+    if isinstance(instance, Assessment):
+        queryset = queryset.select_related('related_patient')
+    return queryset.only(*fields).first()
+
+
+def increment(model, field, delta, **lookup):
+    """
+    Add `delta` to `field` of the `model` row matching `lookup`, creating
+    the row when there is none yet.
+    """
+    if not delta:
+        return
+    if model.objects.filter(**lookup).update(**{field: F(field) + delta}):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**{field: delta}, **lookup)
+    except IntegrityError:
+        # Created concurrently; it exists now
+        model.objects.filter(**lookup).update(**{field: F(field) + delta})
+
+
+def bump(scope, key, metric, bucket, delta):
+    increment(DashboardCounter, 'value', delta, scope=scope, key=key, metric=metric, bucket=bucket)
+
+
+def apply_changes(before, after):
+    """
+    Move the counters from the `before` contributions to the `after` ones.
+    """
+    changes = Counter(after)
+    changes.subtract(before)
+    for counter, delta in changes.items():
+        bump(*counter, delta)
+
+
+def record_saved(instance, stored):
+    """
+    Move the counters of a saved instance; `stored` is from stored_row().
+    """
+    if stored is UNCHANGED:
+        return
+    apply_changes(contributions(stored) if stored is not None else [], contributions(instance))
+
+
+def record_created(instances):
+    """
+    Count rows inserted with bulk_create(), which sends no signals.
+    """
+    added = [counter for instance in instances for counter in contributions(instance)]
+    apply_changes([], added)
+
+
+def computed_counters():
+    """
+    Every counter as counted from scratch with GROUP BY queries.
+    """
+    from patient.models import Patient, PatientAssignment
+
+    counters = Counter()
+    wards = Patient.objects.values('ward').annotate(
+        total=Count('id'), critical=Count('id', filter=Q(risk_level='High'))
+    )
+    for row in wards:
+        ward = row['ward'] or ''
+        counters[(WARD, ward, 'patients', '')] += row['total']
+        counters[(WARD, ward, 'critical_patients', '')] += row['critical']
+
+    daily = Assessment.objects.annotate(day=TruncDate('date')).values('clinician_id', 'day').annotate(total=Count('id'))
+    for row in daily:
+        counters[(CLINICIAN, str(row['clinician_id']), 'assessments', row['day'].isoformat())] += row['total']
+
+    assigned = PatientAssignment.objects.filter(active=True).values('nurse_id').annotate(total=Count('id'))
+    for row in assigned:
+        counters[(CLINICIAN, str(row['nurse_id']), 'assigned_patients', '')] += row['total']
+    return +counters
+
+
+def reconcile():
+    """
+    Replace every counter with its value counted from scratch. Returns how
+    many counters had drifted (wrong, missing or stale).
+    """
+    with transaction.atomic():
+        expected = computed_counters()
+        current = {
+            (scope, key, metric, bucket): value
+            for scope, key, metric, bucket, value in DashboardCounter.objects.select_for_update().values_list(
+                'scope', 'key', 'metric', 'bucket', 'value'
+            )
+        }
+        drifted = sum(1 for counter in expected.keys() | current.keys() if expected.get(counter, 0) != current.get(counter, 0))
+        DashboardCounter.objects.all().delete()
+        DashboardCounter.objects.bulk_create([
+            DashboardCounter(scope=scope, key=key, metric=metric, bucket=bucket, value=value)
+            for (scope, key, metric, bucket), value in expected.items()
+        ])
+    return drifted
+
+
+def dashboard_stats(user):
+    """
+    The dashboard numbers for `user`, read from the counters in one query.
+    """
+    today = local_date(timezone.now()).isoformat()
+    rows = DashboardCounter.objects.filter(
+        Q(scope=WARD, bucket='')
+        | Q(scope=CLINICIAN, metric='assessments', bucket=today)
+        | Q(scope=CLINICIAN, key=str(user.pk), metric='assigned_patients')
+    ).exclude(value=0).values_list('scope', 'key', 'metric', 'value')
+
+    wards = {}
+    stats = {
+        'active_patients': 0,
+        'critical_cases': 0,
+        'assessments_today': 0,
+        'my_assessments_today': 0,
+        'my_assigned_patients': 0,
+    }
+    for scope, key, metric, value in rows:
+        if scope == WARD:
+            wards.setdefault(key, {'patients': 0, 'critical_patients': 0})[metric] = value
+            stats['active_patients' if metric == 'patients' else 'critical_cases'] += value
+        elif metric == 'assessments':
+            stats['assessments_today'] += value
+            if key == str(user.pk):
+                stats['my_assessments_today'] = value
+        else:
+            stats['my_assigned_patients'] = value
+    stats['wards'] = [dict(ward=ward, **counts) for ward, counts in sorted(wards.items())]
+    return stats
@@ -0,0 +1,86 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def compute_content_hash(file):
+    """
+    Return the SHA-256 hex digest of a file, reading it in chunks.
+    The file position is rewound afterwards so it can still be saved.
+    """
+    digest = hashlib.sha256()
+    for chunk in file.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def upload_content_hash(upload):
+    """
+    Hash an incoming upload once, caching the digest on the file object so the
+    view and the model's save() don't both read it.
+    """
+    if getattr(upload, 'content_hash', None) is None:
+        upload.content_hash = compute_content_hash(upload)
+    return upload.content_hash
+
+
+def sharded_path(prefix, content_hash, extension):
+    """
+    Build `<prefix>/ab/cd/<hash><ext>` so no directory grows past 65k siblings.
+    """
+    return f'{prefix}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{extension}'
+
+
+def normalized_extension(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return '.jpg' if ext == '.jpeg' else ext
+
+
+def hashed_upload_to(instance, filename):
+    """
+    upload_to callable for UploadedImage: the path is derived from the content
+    hash so identical bytes always map to the same file.
+    """
+    if not instance.content_hash:
+        instance.content_hash = compute_content_hash(instance.image)
+    return sharded_path('wounds', instance.content_hash, normalized_extension(filename))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage where a name identifies its content.
+
+    Saving a name that already exists is a no-op (the bytes are identical), so
+    duplicate uploads share a single blob instead of getting `_<random>` copies.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return self.replace(name, content)
+
+    def replace(self, name, content):
+        """
+        Write `content` under `name` even when it exists, for files whose name
+        isn't a hash of their own bytes (renditions) and need re-rendering.
+        """
+        # Write under a unique temporary name and move it into place so two
+        # concurrent uploads of the same bytes can never produce a torn file.
+        directory, filename = os.path.split(name)
+        temp_name = os.path.join(directory, f'.{uuid.uuid4().hex}.{filename}.part')
+        temp_name = super()._save(temp_name, content)
+        os.replace(self.path(temp_name), self.path(name))
+        return name
+
+
+content_addressed_storage = ContentAddressedStorage()
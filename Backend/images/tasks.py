@@ -0,0 +1,89 @@
+from django.utils import timezone
+
+from .derivatives import generate_derivatives
+from .jobs import task
+from .models import Assessment, AssessmentReport, UploadedImage
+from .phash import dhash_file
+from .processing import file_metadata
+from .reports import render_report, report_version, store_report
+
+
+def _mark_failed(image_id):
+    UploadedImage.objects.filter(pk=image_id).update(
+        processing_status=UploadedImage.PROCESSING_FAILED, updated_at=timezone.now()
+    )
+
+
+@task('process_upload', on_failure=_mark_failed)
+def process_upload(image_id, regenerate=False):
+    """
+    Post-upload processing for a new image: renditions and perceptual hash.
+    `regenerate` renders every rendition again (the admin action).
+    """
+    try:
+        image = UploadedImage.objects.get(pk=image_id)
+    except UploadedImage.DoesNotExist:
+        return  # Deleted before the worker got to it
+
+    UploadedImage.objects.filter(pk=image_id).update(
+        processing_status=UploadedImage.PROCESSING_RUNNING, updated_at=timezone.now()
+    )
+    try:
+        generate_derivatives(image, copy_siblings=not regenerate)
+        perceptual_hash = dhash_file(image.image.path)
+    except Exception:
+        # Pending again while the job waits for its retry; _mark_failed
+        # runs after the last attempt
+        UploadedImage.objects.filter(pk=image_id).update(
+            processing_status=UploadedImage.PROCESSING_PENDING, updated_at=timezone.now()
+        )
+        raise
+    UploadedImage.objects.filter(pk=image_id).update(
+        perceptual_hash=perceptual_hash,
+        processing_status=UploadedImage.PROCESSING_READY,
+        updated_at=timezone.now(),
+    )
+
+
+@task('update_image_metadata')
+def update_image_metadata(image_id):
+    """
+    Re-read the content hash, dimensions, format and byte size of a stored image.
+    """
+    image = UploadedImage.objects.filter(pk=image_id).exclude(image='').only('image').first()
+    if image is None:
+        return
+    content_hash, header, byte_size = file_metadata(image.image.path)
+    UploadedImage.objects.filter(pk=image_id).update(
+        content_hash=content_hash,
+        width=header.width,
+        height=header.height,
+        image_format=header.format,
+        byte_size=byte_size,
+        updated_at=timezone.now(),
+    )
+
+
+def _mark_report_failed(assessment_id, version):
+    # Reported as failed until a download asks for a retry or the assessment changes
+    AssessmentReport.objects.filter(assessment_id=assessment_id, version=version).update(
+        status=AssessmentReport.STATUS_FAILED
+    )
+
+
+@task('render_assessment_report', on_failure=_mark_report_failed)
+def render_assessment_report(assessment_id, version):
+    """
+    Render and store the PDF report of an assessment, unless it has changed
+    since the report was requested (the next request queues the new version).
+    """
+    report = AssessmentReport.objects.filter(assessment_id=assessment_id, version=version).first()
+    if report is None or report.status == AssessmentReport.STATUS_READY:
+        return  # Superseded, or a duplicate job already rendered it
+    try:
+        assessment = Assessment.objects.with_details().select_related('clinician').get(pk=assessment_id)
+    except Assessment.DoesNotExist:
+        return
+    if report_version(assessment) != version:
+        return
+    store_report(report, version, render_report(assessment))
@@ -1,3 +1,1742 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import random
+import shutil
+import struct
+import tempfile
+import zipfile
+import zlib
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from patient.models import Patient, PatientAssignment
+
+from .admin import UploadedImageAdmin
+from .analytics import healing_metrics, patient_healing
+from .archive import archive_path
+from .export import export_rows
+from .importer import import_assessments, read_rows
+from .derivatives import expected_sizes, generate_derivatives, render_renditions, save_renditions
+from . import phash
+from .jobs import claim_job, enqueue, run_job, run_worker, task
+from .measurements import parse_measurement
+from .models import Assessment, AssessmentImage, AssessmentReport, AssessmentRollup, DashboardCounter, DeletedRecord, ImageDerivative, ProcessingJob, UploadedImage, UploadSession
+from .pagination import encode_token
+from .tasks import process_upload
+from .processing import ImageProcessingPool, file_metadata
+from .search import uninstall_search
+from .signing import media_expiry, sign_media, signed_media_url, verify_media
+from . import rollups, stats
+from .storage import compute_content_hash, content_addressed_storage
+from .validators import read_image_header, validate_image_content
+
+
+def image_bytes(width=100, height=80, color=(200, 30, 30), image_format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def image_upload(name='wound.png', width=100, height=80, color=(200, 30, 30), image_format=None):
+    image_format = image_format or ('PNG' if name.endswith('.png') else 'JPEG')
+    content_type = 'image/png' if image_format == 'PNG' else 'image/jpeg'
+    return SimpleUploadedFile(name, image_bytes(width, height, color, image_format), content_type=content_type)
+
+
+def make_user(username, role='DOCTOR'):
+    user = User.objects.create_user(username, f'{username}@example.com', 'password')
+    user.profile.role = role
+    user.profile.save()
+    return user
+
+
+def make_patient(mrn='MRN-1', **kwargs):
+    return Patient.objects.create(name=f'Patient {mrn}', mrn=mrn, dob=date(1960, 1, 1), **kwargs)
+
+
+class MediaTestCase(TestCase):
+    """
+    Stores uploads, renditions and upload sessions in a temporary directory.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls._media_settings = override_settings(
+            MEDIA_ROOT=cls.media_root, CHUNKED_UPLOAD_DIR=f'{cls.media_root}/sessions'
+        )
+        cls._media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        self.user = make_user('doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_image(self, name='wound.png', user=None, **kwargs):
+        return UploadedImage.objects.create(image=image_upload(name, **kwargs), uploaded_by=user or self.user)
+
+
+class RenditionTests(MediaTestCase):
+    def test_renders_every_size_below_the_original(self):
+        renditions = render_renditions(io.BytesIO(image_bytes(2000, 1000)))
+        self.assertEqual(sorted(renditions), [64, 320, 1280])
+        self.assertEqual(renditions[320][1:], (320, 160))
+
+    def test_small_images_are_not_upscaled(self):
+        renditions = render_renditions(io.BytesIO(image_bytes(200, 100)))
+        self.assertEqual(sorted(renditions), [64])
+        self.assertEqual(expected_sizes(200, 100), [64])
+
+    def test_generate_derivatives_stores_renditions(self):
+        image = self.create_image(width=400, height=300)
+        generate_derivatives(image)
+        self.assertEqual(sorted(image.derivatives.values_list('size', flat=True)), [64, 320])
+        self.assertEqual(image.get_derivative(320).width, 320)
+
+    def test_backfill_skips_images_with_their_expected_renditions(self):
+        small = self.create_image('small.png', width=200, height=100)
+        large = self.create_image('large.png', width=400, height=300, color=(1, 2, 3))
+        generate_derivatives(small)
+
+        call_command('generate_derivatives', workers=1, stdout=io.StringIO())
+
+        self.assertEqual(list(small.derivatives.values_list('size', flat=True)), [64])
+        self.assertEqual(sorted(large.derivatives.values_list('size', flat=True)), [64, 320])
+        output = io.StringIO()
+        call_command('generate_derivatives', workers=1, stdout=output)
+        self.assertIn('Done: 0 tasks', output.getvalue())
+
+
+class ContentAddressedStorageTests(MediaTestCase):
+    def test_path_is_derived_from_the_content_hash(self):
+        upload = image_upload()
+        content_hash = compute_content_hash(upload)
+        image = UploadedImage.objects.create(image=upload, uploaded_by=self.user)
+        self.assertEqual(image.content_hash, content_hash)
+        self.assertEqual(image.image.name, f'wounds/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.png')
+
+    def test_identical_uploads_share_one_file(self):
+        other = make_user('other')
+        first = self.create_image('a.png')
+        second = self.create_image('b.png', user=other)
+        self.assertEqual(first.image.name, second.image.name)
+
+    def test_reupload_returns_the_existing_image(self):
+        first = self.client.post('/api/images/upload/', {'image': image_upload()}, format='multipart')
+        again = self.client.post('/api/images/upload/', {'image': image_upload('copy.png')}, format='multipart')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data['data']['id'], first.data['data']['id'])
+        self.assertEqual(UploadedImage.objects.count(), 1)
+
+    def test_duplicates_reuse_renditions(self):
+        first = self.create_image('a.png', width=400, height=300)
+        generate_derivatives(first)
+        second = self.create_image('b.png', user=make_user('other'), width=400, height=300)
+        generate_derivatives(second)
+        self.assertEqual(
+            sorted(second.derivatives.values_list('image', flat=True)),
+            sorted(first.derivatives.values_list('image', flat=True)),
+        )
+
+    def test_duplicates_render_the_sizes_their_sibling_lacks(self):
+        first = self.create_image('a.png', width=400, height=300)
+        generate_derivatives(first, sizes=(64,))
+        second = self.create_image('b.png', user=make_user('other'), width=400, height=300)
+        generate_derivatives(second)
+        self.assertEqual(sorted(second.derivatives.values_list('size', flat=True)), [64, 320])
+        self.assertEqual(second.get_derivative(64).image.name, first.get_derivative(64).image.name)
+
+    def test_backfill_repairs_duplicates_missing_a_size(self):
+        first = self.create_image('a.png', width=400, height=300)
+        generate_derivatives(first, sizes=(64,))
+        second = self.create_image('b.png', user=make_user('other'), width=400, height=300)
+        with second.image.open('rb') as source:
+            generate_derivatives(second, renditions=render_renditions(source, (64,)))
+
+        call_command('generate_derivatives', workers=1, stdout=io.StringIO())
+
+        for image in (first, second):
+            self.assertEqual(sorted(image.derivatives.values_list('size', flat=True)), [64, 320])
+
+    def test_force_rewrites_damaged_renditions(self):
+        image = self.create_image(width=400, height=300)
+        generate_derivatives(image)
+        name = image.get_derivative(320).image.name
+        with open(content_addressed_storage.path(name), 'wb') as file:
+            file.write(b'truncated')
+
+        call_command('generate_derivatives', workers=1, force=True, stdout=io.StringIO())
+
+        self.assertEqual(image.get_derivative(320).image.name, name)
+        with content_addressed_storage.open(name) as file:
+            self.assertEqual(Image.open(file).size, (320, 240))
+
+    def test_changed_quality_gets_new_files(self):
+        image = self.create_image(width=400, height=300)
+        generate_derivatives(image)
+        previous = image.get_derivative(64).image.name
+        with mock.patch('images.derivatives.RENDITION_QUALITY', 40):
+            call_command('generate_derivatives', workers=1, force=True, stdout=io.StringIO())
+        name = image.get_derivative(64).image.name
+        self.assertTrue(name.endswith('-q40.jpg'))
+        self.assertFalse(content_addressed_storage.exists(previous))
+
+    def test_regenerating_keeps_files_other_images_use(self):
+        first = self.create_image('a.png', width=400, height=300)
+        generate_derivatives(first)
+        second = self.create_image('b.png', user=make_user('other'), width=400, height=300)
+        generate_derivatives(second)
+
+        with first.image.open('rb') as source:
+            save_renditions(first, render_renditions(source))
+
+        for derivative in ImageDerivative.objects.filter(source=second):
+            self.assertTrue(content_addressed_storage.exists(derivative.image.name))
+
+
+class ChunkedUploadTests(MediaTestCase):
+    def start_session(self, data):
+        response = self.client.post(
+            '/api/images/upload/sessions/', {'filename': 'wound.png', 'total_size': len(data)}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        return f"/api/images/upload/sessions/{response.data['id']}/"
+
+    def send_chunk(self, url, chunk, offset):
+        return self.client.patch(
+            url, chunk, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_upload_in_chunks_and_finalize(self):
+        data = image_bytes(300, 200)
+        url = self.start_session(data)
+        middle = len(data) // 2
+
+        self.assertEqual(self.send_chunk(url, data[:middle], 0)['Upload-Offset'], str(middle))
+        self.assertEqual(self.client.get(url)['Upload-Offset'], str(middle))
+        self.assertEqual(self.client.post(f'{url}finalize/').status_code, 409)
+        self.send_chunk(url, data[middle:], middle)
+        response = self.client.post(f'{url}finalize/')
+
+        self.assertEqual(response.status_code, 201)
+        image = UploadedImage.objects.get()
+        self.assertEqual((image.width, image.height), (300, 200))
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(list(ProcessingJob.objects.values_list('task', flat=True)), ['process_upload'])
+
+    def test_finalize_after_the_data_was_removed(self):
+        data = image_bytes()
+        url = self.start_session(data)
+        self.send_chunk(url, data, 0)
+        os.remove(UploadSession.objects.get().temp_path)
+
+        response = self.client.post(f'{url}finalize/')
+
+        self.assertEqual(response.status_code, 410)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_resuming_at_the_wrong_offset_is_rejected(self):
+        data = image_bytes()
+        url = self.start_session(data)
+        self.send_chunk(url, data[:10], 0)
+
+        response = self.send_chunk(url, data[20:], 20)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '10')
+
+    def test_chunk_past_the_declared_size_is_rejected(self):
+        data = image_bytes()
+        url = self.start_session(data)
+        self.assertEqual(self.send_chunk(url, data + b'extra', 0).status_code, 400)
+        self.assertEqual(self.client.get(url).data['offset'], 0)
+
+    def test_invalid_file_is_rejected_on_finalize(self):
+        data = b'not an image at all'
+        url = self.start_session(data)
+        self.send_chunk(url, data, 0)
+        session = UploadSession.objects.get()
+
+        self.assertEqual(self.client.post(f'{url}finalize/').status_code, 400)
+        self.assertFalse(UploadedImage.objects.exists())
+        self.assertFalse(os.path.exists(session.temp_path))
+
+    def test_sessions_are_private(self):
+        url = self.start_session(image_bytes())
+        other = APIClient()
+        other.force_authenticate(make_user('other'))
+        self.assertEqual(other.get(url).status_code, 404)
+
+
+class BatchUploadTests(MediaTestCase):
+    def test_each_file_is_reported_by_index(self):
+        response = self.client.post('/api/images/upload/batch/', {
+            'images': [
+                image_upload('a.png'),
+                image_upload('b.png', color=(0, 0, 255)),
+                image_upload('a-again.png'),
+                SimpleUploadedFile('notes.txt', b'hello', content_type='text/plain'),
+            ],
+            'descriptions': ['first', 'second', 'third', 'fourth'],
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        statuses = [(result['index'], result['status']) for result in response.data['results']]
+        self.assertEqual(statuses, [(0, 'created'), (1, 'created'), (2, 'duplicate'), (3, 'error')])
+        self.assertEqual(response.data['results'][2]['duplicate_of'], 0)
+        self.assertEqual(
+            sorted(UploadedImage.objects.values_list('description', flat=True)), ['first', 'second']
+        )
+        self.assertEqual(ProcessingJob.objects.filter(task='process_upload').count(), 2)
+
+    def test_already_uploaded_images_are_not_stored_again(self):
+        existing = self.create_image('a.png')
+        response = self.client.post('/api/images/upload/batch/', {'images': [image_upload('a.png')]}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['data']['id'], existing.pk)
+        self.assertEqual(UploadedImage.objects.count(), 1)
+
+    def test_too_many_files_are_rejected(self):
+        files = [image_upload(f'{index}.png', color=(index, 0, 0)) for index in range(21)]
+        response = self.client.post('/api/images/upload/batch/', {'images': files}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UploadedImage.objects.exists())
+
+
+def png_header_only(width, height):
+    # Signature and IHDR chunk of an RGB PNG, without any pixel data
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr))
+
+
+class ImageHeaderTests(TestCase):
+    def test_png_header(self):
+        header = read_image_header(io.BytesIO(image_bytes(123, 45)))
+        self.assertEqual(header, ('PNG', 123, 45, 'RGB'))
+
+    def test_jpeg_header(self):
+        header = read_image_header(io.BytesIO(image_bytes(640, 480, image_format='JPEG')))
+        self.assertEqual(header, ('JPEG', 640, 480, 'RGB'))
+
+    def test_jpeg_header_after_exif_and_progressive(self):
+        buffer = io.BytesIO()
+        image = Image.new('L', (33, 77))
+        exif = Image.Exif()
+        exif[0x010E] = 'x' * 5000  # ImageDescription, a large APP1 segment before the frame
+        image.save(buffer, 'JPEG', progressive=True, exif=exif)
+        header = read_image_header(io.BytesIO(buffer.getvalue()))
+        self.assertEqual(header, ('JPEG', 33, 77, 'L'))
+
+    def test_file_position_is_rewound(self):
+        file = io.BytesIO(image_bytes())
+        read_image_header(file)
+        self.assertEqual(file.tell(), 0)
+
+    def test_other_content_is_rejected(self):
+        for data in (b'GIF89a' + b'\0' * 20, b'', b'\x89PNG\r\n\x1a\n\0\0', b'\xff\xd8\xff'):
+            with self.subTest(data=data), self.assertRaises(ValidationError):
+                read_image_header(io.BytesIO(data))
+
+    def test_content_must_match_the_extension(self):
+        with self.assertRaisesMessage(ValidationError, 'does not match its extension'):
+            validate_image_content(image_upload('wound.jpg', image_format='PNG'))
+        with self.assertRaisesMessage(ValidationError, 'does not match its extension'):
+            validate_image_content(image_upload('wound.png', image_format='JPEG'))
+        validate_image_content(image_upload('wound.jpeg'))
+
+    def test_decompression_bombs_are_rejected_from_the_header(self):
+        upload = SimpleUploadedFile('bomb.png', png_header_only(20000, 20000), content_type='image/png')
+        with self.assertRaisesMessage(ValidationError, 'too large'):
+            validate_image_content(upload)
+
+
+class UploadValidationTests(MediaTestCase):
+    def test_mismatched_extension_is_rejected_by_the_api(self):
+        response = self.client.post(
+            '/api/images/upload/', {'image': image_upload('wound.jpg', image_format='PNG')}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_renamed_file_is_rejected_by_the_api(self):
+        upload = SimpleUploadedFile('wound.png', b'%PDF-1.4 not an image', content_type='image/png')
+        response = self.client.post('/api/images/upload/', {'image': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+
+class ImageMetadataTests(MediaTestCase):
+    def test_upload_records_dimensions_format_and_size(self):
+        upload = image_upload('wound.jpg', width=320, height=240)
+        response = self.client.post('/api/images/upload/', {'image': upload}, format='multipart')
+
+        data = response.data['data']
+        self.assertEqual((data['width'], data['height'], data['image_format']), (320, 240, 'JPEG'))
+        self.assertEqual(data['byte_size'], upload.size)
+
+    def test_list_filters_on_dimensions(self):
+        self.create_image('small.png', width=100, height=100)
+        large = self.create_image('large.png', width=500, height=100, color=(0, 0, 0))
+
+        response = self.client.get('/api/images/?min_width=400')
+
+        self.assertEqual([image['id'] for image in response.data['images']], [large.pk])
+        self.assertEqual(self.client.get('/api/images/?min_height=abc').status_code, 400)
+
+    def test_backfill_fills_missing_metadata(self):
+        image = self.create_image(width=64, height=48)
+        UploadedImage.objects.filter(pk=image.pk).update(
+            width=None, height=None, image_format=None, byte_size=None, content_hash=None
+        )
+
+        call_command('backfill_image_metadata', workers=1, stdout=io.StringIO())
+
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height, image.image_format), (64, 48, 'PNG'))
+        self.assertEqual(image.byte_size, image.image.size)
+        self.assertEqual(len(image.content_hash), 64)
+
+    def test_backfill_leaves_unreadable_rows_for_the_next_run(self):
+        good = self.create_image(width=64, height=48)
+        bad = self.create_image('bad.png', color=(1, 2, 3))
+        with open(bad.image.path, 'wb') as file:
+            file.write(b'not an image')
+        UploadedImage.objects.update(width=None, height=None, image_format=None, byte_size=None)
+        bad_updated_at = UploadedImage.objects.get(pk=bad.pk).updated_at
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command('backfill_image_metadata', workers=1, stdout=out, stderr=err)
+
+        self.assertIn('Done: 1 updated, 1 could not be read.', out.getvalue())
+        self.assertIn('1 images still lack metadata', out.getvalue())
+        self.assertIn(f'Image {bad.pk}:', err.getvalue())
+        self.assertEqual(UploadedImage.objects.get(pk=good.pk).width, 64)
+        bad.refresh_from_db()
+        self.assertEqual((bad.width, bad.updated_at), (None, bad_updated_at))
+
+
+failures = []
+
+
+@task('tests.flaky', on_failure=lambda **payload: failures.append(payload))
+def flaky(fail):
+    if fail:
+        raise RuntimeError('flaky failed')
+
+
+class JobQueueTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        failures.clear()
+
+    def make_runnable(self, job):
+        ProcessingJob.objects.filter(pk=job.pk).update(run_after=timezone.now() - timedelta(seconds=1))
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = enqueue('tests.flaky', max_attempts=2, fail=True)
+
+        with self.assertLogs('images.jobs', 'WARNING'):
+            run_job(claim_job('worker'))
+        job.refresh_from_db()
+
+        self.assertEqual((job.status, job.attempts), (ProcessingJob.STATUS_QUEUED, 1))
+        self.assertIn('flaky failed', job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(claim_job('worker'))
+
+    def test_job_fails_after_its_last_attempt(self):
+        job = enqueue('tests.flaky', max_attempts=2, fail=True)
+        for _ in range(2):
+            self.make_runnable(job)
+            with self.assertLogs('images.jobs', 'WARNING'):
+                run_job(claim_job('worker'))
+        job.refresh_from_db()
+
+        self.assertEqual((job.status, job.attempts), (ProcessingJob.STATUS_FAILED, 2))
+        self.assertEqual(failures, [{'fail': True}])
+        self.assertIsNone(claim_job('worker'))
+
+    def test_claimed_job_is_invisible_until_its_lock_expires(self):
+        job = enqueue('tests.flaky', fail=False)
+        first = claim_job('first', visibility_timeout=timedelta(minutes=5))
+        self.assertEqual(first.pk, job.pk)
+        self.assertIsNone(claim_job('second'))
+
+        # The first worker died; once its lock runs out the job is claimable again
+        ProcessingJob.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        second = claim_job('second')
+        self.assertEqual((second.pk, second.attempts, second.locked_by), (job.pk, 2, 'second'))
+
+        # The late first worker can't overwrite the outcome of the second
+        run_job(second)
+        first.status = ProcessingJob.STATUS_RUNNING
+        run_job(first)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (ProcessingJob.STATUS_DONE, None))
+
+    def test_upload_is_processed_by_the_worker(self):
+        response = self.client.post(
+            '/api/images/upload/', {'image': image_upload(width=400, height=300)}, format='multipart'
+        )
+        image_id = response.data['data']['id']
+        self.assertEqual(self.client.get(f'/api/images/{image_id}/status/').data['processing_status'], 'pending')
+
+        self.assertEqual(run_worker(burst=True), 1)
+
+        image = UploadedImage.objects.get(pk=image_id)
+        self.assertEqual(image.processing_status, UploadedImage.PROCESSING_READY)
+        self.assertIsNotNone(image.perceptual_hash)
+        self.assertEqual(sorted(image.derivatives.values_list('size', flat=True)), [64, 320])
+
+
+    def test_upload_status_while_retrying(self):
+        image = self.create_image(width=400, height=300)
+        job = enqueue('process_upload', max_attempts=2, image_id=image.pk)
+
+        def status_after_attempt():
+            self.make_runnable(job)
+            with self.assertLogs('images.jobs', 'WARNING'):
+                run_job(claim_job('worker'))
+            image.refresh_from_db()
+            return image.processing_status
+
+        with mock.patch('images.tasks.generate_derivatives', side_effect=OSError('disk full')):
+            self.assertEqual(status_after_attempt(), UploadedImage.PROCESSING_PENDING)
+            self.assertEqual(status_after_attempt(), UploadedImage.PROCESSING_FAILED)
+
+
+class ProcessingPoolTests(MediaTestCase):
+    def test_results_and_errors_are_reported_per_task(self):
+        image = self.create_image(width=30, height=20)
+        pool = ImageProcessingPool(workers=2)
+
+        results = {result.key: result for result in pool.imap(file_metadata, [
+            ('stored', (image.image.path,)),
+            ('missing', (f'{self.media_root}/missing.png',)),
+        ])}
+
+        content_hash, header, byte_size = results['stored'].value
+        self.assertEqual((content_hash, header.width, byte_size), (image.content_hash, 30, image.byte_size))
+        self.assertIsNone(results['missing'].value)
+        self.assertIn('FileNotFoundError', results['missing'].error)
+        self.assertEqual((pool.stats.completed, pool.stats.failed), (2, 1))
+
+    def test_tasks_are_consumed_lazily(self):
+        path = self.create_image().image.path
+        consumed = []
+
+        def tasks():
+            for index in range(10):
+                consumed.append(index)
+                yield index, (path,)
+
+        pool = ImageProcessingPool(workers=1, max_in_flight=2)
+        results = pool.imap(file_metadata, tasks())
+        next(results)
+        self.assertLessEqual(len(consumed), 3)
+        self.assertEqual(len(list(results)), 9)
+
+
+class UploadedImageAdminTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = UploadedImageAdmin(UploadedImage, site)
+        self.admin.message_user = lambda request, message: None
+
+    def test_regenerate_renditions_queues_jobs(self):
+        image = self.create_image()
+        UploadedImage.objects.filter(pk=image.pk).update(processing_status=UploadedImage.PROCESSING_READY)
+
+        self.admin.regenerate_renditions(None, UploadedImage.objects.all())
+
+        self.assertEqual(list(ProcessingJob.objects.values_list('task', 'payload')), [('process_upload', {'image_id': image.pk, 'regenerate': True})])
+        image.refresh_from_db()
+        self.assertEqual(image.processing_status, UploadedImage.PROCESSING_PENDING)
+        self.assertFalse(image.derivatives.exists())
+
+    def test_regenerated_renditions_replace_damaged_files(self):
+        image = self.create_image(width=400, height=300)
+        generate_derivatives(image)
+        # Another upload of the same bytes shares the files
+        generate_derivatives(self.create_image('copy.png', user=make_user('other'), width=400, height=300))
+        name = image.get_derivative(64).image.name
+        with open(content_addressed_storage.path(name), 'wb') as file:
+            file.write(b'')
+
+        self.admin.regenerate_renditions(None, UploadedImage.objects.filter(pk=image.pk))
+        run_worker(burst=True)
+
+        with content_addressed_storage.open(name) as file:
+            self.assertEqual(Image.open(file).size, (64, 48))
+
+    def test_update_metadata_runs_in_the_worker(self):
+        image = self.create_image(width=30, height=20)
+        UploadedImage.objects.filter(pk=image.pk).update(width=None, height=None)
+
+        self.admin.update_selected_metadata(None, UploadedImage.objects.all())
+        image.refresh_from_db()
+        self.assertIsNone(image.width)
+
+        run_worker(burst=True)
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height), (30, 20))
+
+
+class PerceptualHashTests(TestCase):
+    def test_bk_tree_matches_a_full_scan(self):
+        generator = random.Random(9)
+        hashes = [(generator.getrandbits(64), key) for key in range(300)]
+        # Near copies of a few hashes so there is something to find
+        hashes += [(value ^ (1 << generator.randrange(64)), f'{key}-copy') for value, key in hashes[:20]]
+        tree = phash.BKTree(hashes)
+
+        for query, _ in hashes[:40]:
+            expected = sorted((phash.hamming(query, value), key) for value, key in hashes if phash.hamming(query, value) <= 8)
+            self.assertEqual(tree.search(query, 8), expected)
+
+    def test_near_duplicates_are_grouped_transitively(self):
+        groups = phash.near_duplicate_groups([(0b0, 1), (0b11, 2), (0b1111, 3), (-1, 4)], max_distance=2)
+        self.assertEqual(groups, [[1, 2, 3]])
+
+    def test_dhash_survives_reencoding(self):
+        buffer = io.BytesIO()
+        image = Image.radial_gradient('L').resize((400, 300))
+        original = phash.dhash(image)
+        image.convert('RGB').save(buffer, 'JPEG', quality=60)
+        buffer.seek(0)
+        with Image.open(buffer) as reencoded:
+            self.assertLessEqual(phash.hamming(original, phash.dhash(reencoded)), 4)
+
+    def test_signed_storage_round_trip(self):
+        self.assertEqual(phash.to_signed(2 ** 64 - 1), -1)
+        self.assertEqual(phash.hamming(phash.to_signed(2 ** 64 - 1), 2 ** 64 - 1), 0)
+
+
+class SimilarImagesTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        phash._trees.clear()
+
+    def hashed_image(self, perceptual_hash, user=None):
+        image = self.create_image(f'{perceptual_hash}.png', user=user, color=(perceptual_hash % 256, 0, 0))
+        UploadedImage.objects.filter(pk=image.pk).update(perceptual_hash=perceptual_hash, updated_at=timezone.now())
+        return image
+
+    def similar(self, image):
+        response = self.client.get(f'/api/images/{image.pk}/similar/')
+        return [(item['id'], item['distance']) for item in response.data['images']]
+
+    def test_finds_the_users_near_duplicates(self):
+        image = self.hashed_image(0b0)
+        close = self.hashed_image(0b111)
+        self.hashed_image(2 ** 40 - 1)
+        self.hashed_image(0b1, user=make_user('other'))
+
+        self.assertEqual(self.similar(image), [(close.pk, 3)])
+
+    def test_tree_is_reused_until_the_images_change(self):
+        image = self.hashed_image(0b0)
+        first = self.hashed_image(0b1)
+        with self.assertNumQueries(2):
+            tree = phash.uploader_tree(self.user)
+        with self.assertNumQueries(1):
+            self.assertIs(phash.uploader_tree(self.user), tree)
+
+        second = self.hashed_image(0b11)
+        self.assertEqual(self.similar(image), [(first.pk, 1), (second.pk, 2)])
+        first.delete()
+        self.assertEqual(self.similar(image), [(second.pk, 2)])
+
+    def test_assessment_duplicates(self):
+        assessment = Assessment.objects.create(patient_id='MRN-1', clinician=self.user)
+        images = [self.hashed_image(value) for value in (0b0, 0b1, 2 ** 40 - 1)]
+        for image in images:
+            AssessmentImage.objects.create(assessment=assessment, uploaded_image=image)
+
+        response = self.client.get(f'/api/images/assessments/{assessment.pk}/duplicates/')
+
+        self.assertEqual(response.data['groups'], [[images[0].pk, images[1].pk]])
+
+
+class MediaServingTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.image = self.create_image(width=400, height=300)
+        self.url = f'/api/images/{self.image.pk}/file/'
+        with self.image.image.open('rb') as file:
+            self.data = file.read()
+
+    def test_full_download_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response['ETag'], f'"{self.image.content_hash}"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'image/png')
+
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.data)}')
+        self.assertEqual(b''.join(response.streaming_content), self.data[10:20])
+
+        suffix = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(suffix.streaming_content), self.data[-5:])
+
+        beyond = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(beyond.status_code, 416)
+        self.assertEqual(beyond['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    def test_renditions(self):
+        generate_derivatives(self.image)
+        response = self.client.get(f'{self.url}?size=64')
+        self.assertEqual(response.status_code, 200)
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as rendition:
+            self.assertEqual(rendition.size, (64, 48))
+        self.assertEqual(self.client.get(f'{self.url}?size=1280').status_code, 404)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='X-Accel-Redirect')
+    def test_transfer_can_be_handed_to_the_web_server(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.image.image.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_only_the_uploader_and_their_clinicians_can_download(self):
+        stranger = APIClient()
+        stranger.force_authenticate(make_user('stranger'))
+        self.assertEqual(stranger.get(self.url).status_code, 404)
+
+        clinician = make_user('clinician')
+        assessment = Assessment.objects.create(patient_id='MRN-1', clinician=clinician)
+        AssessmentImage.objects.create(assessment=assessment, uploaded_image=self.image)
+        stranger.force_authenticate(clinician)
+        self.assertEqual(stranger.get(self.url).status_code, 200)
+
+
+class CreateAssessmentTests(MediaTestCase):
+    def create(self, image_ids, **data):
+        payload = {
+            'patient_id': 'MRN-1',
+            'notes': 'Dressing changed',
+            'images': image_ids,
+            'clinical_details': {'woundType': 'Pressure ulcer', 'measurements': {'length': '3 cm', 'width': '2 cm'}},
+            **data,
+        }
+        return self.client.post('/api/images/assessments/create/', payload, format='json')
+
+    def test_images_are_linked_in_the_requested_order(self):
+        images = [self.create_image(f'{index}.png', color=(index, 0, 0)) for index in range(3)]
+        ids = [images[2].pk, images[0].pk, images[2].pk, images[1].pk]
+
+        response = self.create(ids)
+
+        self.assertEqual(response.status_code, 201)
+        assessment = Assessment.objects.get()
+        self.assertEqual(
+            list(AssessmentImage.objects.filter(assessment=assessment).order_by('pk').values_list('uploaded_image', flat=True)),
+            [images[2].pk, images[0].pk, images[1].pk],
+        )
+        self.assertEqual(response.data['rejected_images'], [])
+
+    def test_foreign_and_invalid_ids_are_rejected(self):
+        own = self.create_image()
+        foreign = self.create_image('other.png', user=make_user('other'), color=(0, 0, 0))
+
+        response = self.create([own.pk, foreign.pk, 'abc', 999999])
+
+        self.assertEqual(response.data['rejected_images'], ['abc', foreign.pk, 999999])
+        self.assertEqual(AssessmentImage.objects.get().uploaded_image_id, own.pk)
+
+    def test_query_count_does_not_grow_with_the_images(self):
+        images = [self.create_image(f'{index}.png', color=(index, 0, 0)) for index in range(7)]
+        # The first assessment of the day also creates its counter rows
+        self.create([images[0].pk])
+        with CaptureQueriesContext(connection) as one:
+            self.create([images[1].pk])
+        with CaptureQueriesContext(connection) as many:
+            self.create([image.pk for image in images[2:]])
+        self.assertEqual(len(many), len(one))
+        self.assertEqual(AssessmentImage.objects.count(), 7)
+
+
+class KeysetPaginationTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        # Several rows share a timestamp, so the id has to break the ties
+        dates = [datetime(2026, 1, day // 2 + 1, 9) for day in range(7)]
+        self.assessments = [
+            Assessment.objects.create(patient_id='MRN-1', clinician=self.user, date=date) for date in dates
+        ]
+
+    def walk(self, url, key):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(f'{url}&cursor={cursor}' if cursor else url)
+            self.assertEqual(response.status_code, 200)
+            seen += [item['id'] for item in response.data[key]]
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                return seen
+
+    def test_pages_cover_every_row_once_newest_first(self):
+        seen = self.walk('/api/images/assessments/?page_size=2', 'results')
+        expected = [a.pk for a in sorted(self.assessments, key=lambda a: (a.date, a.pk), reverse=True)]
+        self.assertEqual(seen, expected)
+
+    def test_rows_added_while_paging_do_not_shift_pages(self):
+        first = self.client.get('/api/images/assessments/?page_size=3')
+        Assessment.objects.create(patient_id='MRN-1', clinician=self.user, date=datetime(2026, 2, 1))
+        second = self.client.get(f"/api/images/assessments/?page_size=3&cursor={first.data['next_cursor']}")
+        self.assertFalse({item['id'] for item in first.data['results']} & {item['id'] for item in second.data['results']})
+        self.assertEqual(len(second.data['results']), 3)
+
+    def test_invalid_cursors_are_rejected(self):
+        for cursor in ('not-a-cursor', encode_token(['yesterday', 1]), encode_token({'a': 1}), encode_token(['2026-01-01T00:00:00', 'x'])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f'/api/images/assessments/?cursor={cursor}')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['message'], 'Invalid cursor')
+        self.assertEqual(self.client.get('/api/images/assessments/?page_size=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/images/?cursor=%%%').status_code, 400)
+
+    @override_settings(CURSOR_MAX_PAGE_SIZE=4)
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/images/assessments/?page_size=100')
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_without_pagination_parameters_the_full_lists_are_returned(self):
+        response = self.client.get('/api/images/assessments/')
+        self.assertEqual(len(response.data), 7)
+
+        for index in range(3):
+            self.create_image(f'{index}.png', color=(index, 0, 0))
+        response = self.client.get('/api/images/')
+        self.assertEqual(response.data['count'], 3)
+        self.assertNotIn('next_cursor', response.data)
+
+    def test_image_pages(self):
+        images = [self.create_image(f'{index}.png', color=(index, 0, 0)) for index in range(5)]
+        seen = self.walk('/api/images/?page_size=2', 'images')
+        self.assertEqual(sorted(seen), sorted(image.pk for image in images))
+        self.assertEqual(len(seen), 5)
+
+
+class AssessmentSerializerQueryTests(MediaTestCase):
+    def add_assessment(self, index):
+        patient = make_patient(f'MRN-{index}')
+        assessment = Assessment.objects.create(patient_id=patient.mrn, related_patient=patient, clinician=self.user)
+        for offset in range(2):
+            image = self.create_image(f'{index}-{offset}.png', color=(index, offset, 0))
+            generate_derivatives(image, sizes=(64,))
+            AssessmentImage.objects.create(assessment=assessment, uploaded_image=image)
+        return assessment
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_the_assessments(self):
+        self.add_assessment(0)
+        _, one = self.queries('/api/images/assessments/')
+        for index in range(1, 5):
+            self.add_assessment(index)
+        response, many = self.queries('/api/images/assessments/')
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(many, one)
+
+        _, paged = self.queries('/api/images/assessments/?page_size=3')
+        self.assertEqual(paged, one)
+
+    def test_nested_details_are_rendered(self):
+        assessment = self.add_assessment(0)
+        Assessment.objects.create(patient_id='MRN-0', related_patient=assessment.related_patient, clinician=self.user)
+        response = self.client.get('/api/images/assessments/')
+        data = next(item for item in response.data if item['id'] == assessment.pk)
+        self.assertEqual(data['patient_details']['active_wounds'], 2)
+        self.assertEqual(len(data['image_details']), 2)
+        derivatives = data['image_details'][0]['derivatives']
+        self.assertNotEqual(derivatives['64'], derivatives['320'])
+
+
+class PatientAssessmentsTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.patient = make_patient()
+        self.url = f'/api/patients/{self.patient.pk}/assessments/'
+        self.linked = [
+            Assessment.objects.create(
+                patient_id=self.patient.mrn, related_patient=self.patient, clinician=self.user,
+                date=datetime(2026, 3, day, 10), stage=f'Stage {day % 2 + 1}',
+            )
+            for day in range(1, 6)
+        ]
+        # Only linked through the MRN typed into the form
+        self.legacy = Assessment.objects.create(patient_id=self.patient.mrn, clinician=self.user, date=datetime(2026, 2, 1))
+        Assessment.objects.create(patient_id='MRN-2', clinician=self.user)
+
+    def ids(self, query='', client=None):
+        response = (client or self.client).get(f'{self.url}?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_cursor_pages_cover_every_assessment(self):
+        seen, cursor = [], ''
+        while True:
+            response = self.client.get(f'{self.url}?page_size=2{cursor}')
+            seen += [item['id'] for item in response.data['results']]
+            if response.data['next_cursor'] is None:
+                break
+            cursor = f"&cursor={response.data['next_cursor']}"
+        self.assertEqual(seen, [a.pk for a in reversed(self.linked)] + [self.legacy.pk])
+        self.assertEqual(self.ids('ordering=date'), [self.legacy.pk] + [a.pk for a in self.linked])
+
+    def test_filters(self):
+        self.assertEqual(self.ids('date_from=2026-03-02&date_to=2026-03-03'), [self.linked[2].pk, self.linked[1].pk])
+        self.assertEqual(self.ids('stage=Stage 2&ordering=date'), [a.pk for a in self.linked[::2]])
+        for query in ('date_from=yesterday', 'date_to=2026-02-30', 'ordering=stage', 'min_area=big'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'{self.url}?{query}').status_code, 400)
+
+    def test_nurses_only_see_their_own_assessments_unless_assigned(self):
+        nurse = make_user('nurse', role='NURSE')
+        client = APIClient()
+        client.force_authenticate(nurse)
+        own = Assessment.objects.create(patient_id=self.patient.mrn, related_patient=self.patient, clinician=nurse)
+        self.assertEqual(self.ids(client=client), [own.pk])
+
+        PatientAssignment.objects.create(patient=self.patient, nurse=nurse, assigned_by=self.user)
+        self.assertEqual(len(self.ids(client=client)), 7)
+
+    def test_unknown_patient(self):
+        self.assertEqual(self.client.get('/api/patients/999999/assessments/').status_code, 404)
+
+
+class MeasurementTests(TestCase):
+    def test_parse_measurement(self):
+        cases = {
+            '3 cm': Decimal('3.00'), '20mm': Decimal('2.00'), '0,5': Decimal('0.50'), ',5': Decimal('0.50'),
+            '1in': Decimal('2.54'), ' 2.5 CM ': Decimal('2.50'), '0.004': Decimal('0.00'),
+            'approx 3': None, '3 ft': None, '': None, None: None, '-2': None, '1e9': None, '999999': None,
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(parse_measurement(text), expected)
+
+    def test_area_and_volume_are_stored_on_save(self):
+        user = make_user('doctor')
+        assessment = Assessment.objects.create(clinician=user, length='3 cm', width='20mm', depth='0,5')
+        assessment.refresh_from_db()
+        self.assertEqual(assessment.area_cm2, Decimal('6.00'))
+        self.assertEqual(assessment.volume_cm3, Decimal('3.00'))
+
+        assessment.depth = 'unknown'
+        assessment.save()
+        assessment.refresh_from_db()
+        self.assertIsNone(assessment.depth_cm)
+        self.assertIsNone(assessment.volume_cm3)
+        self.assertEqual(assessment.area_cm2, Decimal('6.00'))
+
+
+class MeasurementQueryTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        patient = make_patient()
+        for length, width in (('1', '1'), ('2 cm', '3 cm'), ('40mm', '5'), ('n/a', '2')):
+            Assessment.objects.create(clinician=self.user, related_patient=patient, length=length, width=width)
+        Assessment.objects.create(clinician=make_user('other'), length='10', width='10')
+        self.patient = patient
+
+    def test_range_filters(self):
+        response = self.client.get('/api/images/assessments/?min_area=2&max_area=6')
+        self.assertEqual([item['area_cm2'] for item in response.data], ['6.00'])
+        response = self.client.get('/api/images/assessments/?min_length=2')
+        self.assertEqual(sorted(item['length_cm'] for item in response.data), ['2.00', '4.00'])
+        for query in ('min_area=big', 'max_depth=NaN', 'min_width=inf'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/images/assessments/?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('must be a number', response.data['message'])
+
+    def test_aggregates_are_computed_over_the_clinicians_assessments(self):
+        response = self.client.get('/api/images/assessments/measurements/')
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(response.data['area_cm2'], {'min': Decimal('1.00'), 'max': Decimal('20.00'), 'avg': Decimal('9.00')})
+        self.assertEqual(response.data['depth_cm'], {'min': None, 'max': None, 'avg': None})
+
+        response = self.client.get(f'/api/images/assessments/measurements/?patient={self.patient.pk}&min_area=5')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.client.get('/api/images/assessments/measurements/?patient=x').status_code, 400)
+
+
+class HealingAnalyticsTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.patient = make_patient(ward='Ward A')
+        self.assess(datetime(2026, 1, 1), '5', '2')
+        self.assess(datetime(2026, 1, 8), '3', '2')
+
+    def assess(self, when, length, width, patient=None, body_part='Heel'):
+        patient = patient or self.patient
+        return Assessment.objects.create(
+            patient_id=patient.mrn, related_patient=patient, clinician=self.user,
+            date=when, length=length, width=width, body_part=body_part,
+        )
+
+    def test_metrics(self):
+        rows = [
+            (1, 'Heel', None, datetime(2026, 1, 8), Decimal('6')),
+            (1, 'Heel', None, datetime(2026, 1, 1), Decimal('10')),
+            (1, 'Sacrum', None, datetime(2026, 1, 1), Decimal('4')),
+            (2, 'Heel', None, datetime(2026, 1, 1), Decimal('3')),
+            (2, 'Heel', None, datetime(2026, 1, 3), Decimal('0')),
+        ]
+        heel, sacrum, closed = healing_metrics(rows)
+        self.assertEqual(heel['area_reduction_percent'], 40.0)
+        self.assertEqual(heel['healing_rate_cm2_per_week'], 4.0)
+        self.assertEqual(heel['projected_closure'], date(2026, 1, 18))
+        self.assertEqual((heel['first_date'], heel['last_date']), (datetime(2026, 1, 1), datetime(2026, 1, 8)))
+        # A single assessment has no trend
+        self.assertIsNone(sacrum['healing_rate_cm2_per_week'])
+        self.assertIsNone(sacrum['projected_closure'])
+        self.assertEqual(closed['projected_closure'], date(2026, 1, 3))
+        self.assertEqual(healing_metrics([]), [])
+
+    def test_results_are_cached_until_an_assessment_changes(self):
+        self.assertEqual(patient_healing(self.patient)[0]['latest_area_cm2'], 6.0)
+        with CaptureQueriesContext(connection) as queries:
+            patient_healing(self.patient)
+        self.assertFalse([q for q in queries if 'images_assessment' in q['sql']])
+
+        self.assess(datetime(2026, 1, 15), '1', '2')
+        self.assertEqual(patient_healing(self.patient)[0]['latest_area_cm2'], 2.0)
+
+        Assessment.objects.filter(date=datetime(2026, 1, 15)).delete()
+        self.assertEqual(patient_healing(self.patient)[0]['latest_area_cm2'], 6.0)
+
+    def test_endpoint(self):
+        response = self.client.get(f'/api/images/assessments/healing/?patient={self.patient.pk}')
+        self.assertEqual(response.data['wounds'][0]['healing_rate_cm2_per_week'], 4.0)
+        other = make_patient('MRN-2', ward='Ward A')
+        self.assess(datetime(2026, 1, 1), '2', '2', patient=other)
+        response = self.client.get('/api/images/assessments/healing/?ward=Ward A')
+        self.assertEqual({wound['patient'] for wound in response.data['wounds']}, {self.patient.pk, other.pk})
+        self.assertEqual(self.client.get('/api/images/assessments/healing/').status_code, 400)
+        self.assertEqual(self.client.get('/api/images/assessments/healing/?patient=999999').status_code, 404)
+
+    def test_nurses_only_see_assigned_patients(self):
+        nurse = make_user('nurse', role='NURSE')
+        client = APIClient()
+        client.force_authenticate(nurse)
+        self.assertEqual(client.get(f'/api/images/assessments/healing/?patient={self.patient.pk}').status_code, 403)
+        self.assertEqual(client.get('/api/images/assessments/healing/?ward=Ward A').data['wounds'], [])
+
+        PatientAssignment.objects.create(patient=self.patient, nurse=nurse, assigned_by=self.user)
+        self.assertEqual(client.get(f'/api/images/assessments/healing/?patient={self.patient.pk}').status_code, 200)
+        self.assertEqual(len(client.get('/api/images/assessments/healing/?ward=Ward A').data['wounds']), 1)
+
+
+class ExportTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        patient = make_patient()
+        image = self.create_image()
+        first = Assessment.objects.create(
+            patient_id=patient.mrn, related_patient=patient, clinician=self.user,
+            length='3 cm', width='2 cm', notes='Line one,\n"quoted"',
+        )
+        AssessmentImage.objects.create(assessment=first, uploaded_image=image)
+        Assessment.objects.create(patient_id='MRN-9', clinician=self.user, length='1', width='1')
+        Assessment.objects.create(patient_id='MRN-9', clinician=make_user('other'))
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response = self.client.get('/api/images/assessments/export/')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(self.content(response))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['notes'], 'Line one,\n"quoted"')
+        self.assertEqual(rows[0]['patient_name'], 'Patient MRN-1')
+        self.assertEqual(rows[0]['area_cm2'], '6.00')
+        self.assertIn('/api/images/media/', rows[0]['image_urls'])
+        self.assertEqual(rows[1]['patient'], '')
+
+    def test_ndjson_with_filters(self):
+        response = self.client.get('/api/images/assessments/export/?output=ndjson&min_area=2')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([row['area_cm2'] for row in rows], ['6.00'])
+        self.assertEqual(len(rows[0]['image_urls']), 1)
+
+        self.assertEqual(self.client.get('/api/images/assessments/export/?output=xml').status_code, 400)
+        self.assertEqual(self.client.get('/api/images/assessments/export/?min_area=x').status_code, 400)
+
+    def test_superusers_export_everything(self):
+        self.user.is_superuser = True
+        self.user.save()
+        response = self.client.get('/api/images/assessments/export/?output=ndjson')
+        self.assertEqual(len(self.content(response).splitlines()), 3)
+
+    def test_queries_per_chunk_are_fixed(self):
+        def count(chunk_size):
+            with CaptureQueriesContext(connection) as queries:
+                rows = list(export_rows(Assessment.objects.all(), lambda image: image.image.name, chunk_size=chunk_size))
+            self.assertEqual(len(rows), 3)
+            return len(queries)
+        # The rows themselves, then one image prefetch per chunk
+        self.assertEqual(count(100), 2)
+        self.assertEqual(count(2), 3)
+        self.assertEqual(count(1), 4)
+
+    def test_command_writes_a_file(self):
+        path = os.path.join(self.media_root, 'export.csv')
+        out = io.StringIO()
+        call_command('export_assessments', file=path, chunk_size=2, stdout=out)
+        self.assertIn('Exported 3 assessments', out.getvalue())
+        with open(path, newline='', encoding='utf-8') as exported:
+            self.assertEqual(len(list(csv.DictReader(exported))), 3)
+
+
+class ImportTests(MediaTestCase):
+    def upload(self, url, name, content, client=None):
+        return (client or self.client).post(url, {'file': SimpleUploadedFile(name, content.encode())}, format='multipart')
+
+    def test_patients_from_csv(self):
+        make_patient('MRN-1')
+        content = (
+            'name,mrn,dob,ward\n'
+            'Ann,MRN-2,1950-02-03,Ward A\n'
+            'Bob,MRN-1,1950-02-03,\n'    # MRN already in the database
+            'Cid,MRN-3,not a date,\n'
+            'Dee,MRN-2,1951-01-01,\n'    # MRN earlier in the file
+            'Eve,MRN-4,1952-01-01,\n'
+        )
+        response = self.upload('/api/patients/import/', 'patients.csv', content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 3))
+        errors = {error['row']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 4])
+        self.assertIn('dob', errors[3])
+        self.assertEqual(Patient.objects.get(mrn='MRN-2').ward, 'Ward A')
+        self.assertIsNone(Patient.objects.get(mrn='MRN-4').ward)
+
+    def test_assessments_from_ndjson(self):
+        patient = make_patient('MRN-1')
+        content = '\n'.join([
+            json.dumps({'patient_id': 'MRN-1', 'date': '2020-05-01T10:00:00', 'length': '3 cm', 'width': '20mm'}),
+            'not json',
+            '',
+            json.dumps({'patient_id': 'MRN-404', 'stage': 'Stage 2'}),
+            json.dumps({'stage': 'Stage 2'}),
+            '[1, 2]',
+        ])
+        response = self.upload('/api/images/assessments/import/', 'legacy.jsonl', content)
+
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 3))
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 4, 5])
+        linked = Assessment.objects.get(related_patient=patient)
+        self.assertEqual(linked.date, datetime(2020, 5, 1, 10))
+        self.assertEqual(linked.area_cm2, Decimal('6.00'))
+        self.assertEqual(linked.clinician, self.user)
+        self.assertIsNone(Assessment.objects.get(patient_id='MRN-404').related_patient)
+
+    def test_rows_are_inserted_in_batches(self):
+        content = 'patient_id,stage\n' + ''.join(f'MRN-{index},Stage 1\n' for index in range(7))
+        rows = read_rows(io.StringIO(content), 'csv')
+        with CaptureQueriesContext(connection) as queries:
+            report = import_assessments(rows, self.user, batch_size=3)
+        self.assertEqual(report.created, 7)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "images_assessment"')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_only_doctors_can_import(self):
+        nurse = make_user('nurse', role='NURSE')
+        client = APIClient()
+        client.force_authenticate(nurse)
+        for url in ('/api/patients/import/', '/api/images/assessments/import/'):
+            with self.subTest(url=url):
+                response = self.upload(url, 'rows.csv', 'patient_id\nMRN-1\n', client=client)
+                self.assertEqual(response.status_code, 403)
+        self.assertFalse(Assessment.objects.exists())
+
+    def test_bad_requests(self):
+        url = '/api/images/assessments/import/'
+        self.assertEqual(self.client.post(url, {}, format='multipart').status_code, 400)
+        response = self.upload(url, 'rows.xlsx', 'patient_id\nMRN-1\n')
+        self.assertEqual(response.data['message'], 'input must be csv or ndjson')
+        response = self.client.post(url, {'file': SimpleUploadedFile('rows', b'patient_id\nMRN-1\n'), 'input': 'csv'}, format='multipart')
+        self.assertEqual(response.data['created'], 1)
+
+    def test_command(self):
+        path = os.path.join(self.media_root, 'patients.ndjson')
+        with open(path, 'w') as rows:
+            rows.write(json.dumps({'name': 'Ann', 'mrn': 'MRN-7', 'dob': '1950-01-01'}) + '\n')
+        out = io.StringIO()
+        call_command('import_records', 'patients', path, stdout=out)
+        self.assertIn('Created 1 patients, 0 rows failed.', out.getvalue())
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.patient = make_patient()
+        self.assessment = Assessment.objects.create(patient_id='MRN-1', related_patient=self.patient, clinician=self.user)
+        self.image = self.create_image()
+
+    def sync(self, since=None, client=None, **params):
+        if since:
+            params['since'] = since
+        response = (client or self.client).get('/api/images/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, data, feed):
+        return [item['id'] for item in data[feed]]
+
+    def test_snapshot_then_only_changes(self):
+        snapshot = self.sync()
+        self.assertEqual(self.ids(snapshot, 'assessments'), [self.assessment.pk])
+        self.assertEqual(self.ids(snapshot, 'images'), [self.image.pk])
+        self.assertEqual(self.ids(snapshot, 'patients'), [self.patient.pk])
+        self.assertEqual(snapshot['deleted'], [])
+
+        unchanged = self.sync(snapshot['next_cursor'])
+        self.assertEqual([unchanged[feed] for feed in ('assessments', 'images', 'patients', 'deleted')], [[], [], [], []])
+
+        self.assessment.notes = 'Edited'
+        self.assessment.save()
+        image_id = self.image.pk
+        self.image.delete()
+        Assessment.objects.create(clinician=make_user('other')).delete()
+        changes = self.sync(unchanged['next_cursor'])
+        self.assertEqual(self.ids(changes, 'assessments'), [self.assessment.pk])
+        self.assertEqual(changes['images'], [])
+        self.assertEqual([(row['model'], row['id']) for row in changes['deleted']], [('image', image_id)])
+
+    def test_background_processing_shows_up_as_a_change(self):
+        cursor = self.sync()['next_cursor']
+        process_upload(self.image.pk)
+        changes = self.sync(cursor)
+        self.assertEqual(self.ids(changes, 'images'), [self.image.pk])
+        self.assertEqual(changes['images'][0]['processing_status'], UploadedImage.PROCESSING_READY)
+
+    def test_pages(self):
+        for index in range(4):
+            Assessment.objects.create(patient_id=f'MRN-{index}', clinician=self.user)
+        seen, cursor = [], None
+        while True:
+            data = self.sync(cursor, page_size=2)
+            seen += self.ids(data, 'assessments')
+            cursor = data['next_cursor']
+            if not data['has_more']:
+                break
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_nurses_only_get_their_patients(self):
+        nurse = make_user('nurse', role='NURSE')
+        client = APIClient()
+        client.force_authenticate(nurse)
+        self.assertEqual(self.sync(client=client)['patients'], [])
+        PatientAssignment.objects.create(patient=self.patient, nurse=nurse, assigned_by=self.user)
+        data = self.sync(client=client)
+        self.assertEqual(self.ids(data, 'patients'), [self.patient.pk])
+        self.assertEqual(data['assessments'], [])
+
+    @override_settings(CHANGE_FEED_SETTLE_SECONDS=60)
+    def test_recent_rows_are_held_back(self):
+        self.assertEqual(self.sync()['assessments'], [])
+
+    def test_bad_and_expired_cursors(self):
+        for cursor in ('garbage', encode_token({'synced': 'x', 'positions': {}}), encode_token(['a'])):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/images/changes/', {'since': cursor}).status_code, 400)
+        expired = encode_token({'synced': (timezone.now() - timedelta(days=365)).isoformat(), 'positions': {}})
+        self.assertEqual(self.client.get('/api/images/changes/', {'since': expired}).status_code, 410)
+
+    def test_old_tombstones_are_pruned(self):
+        DeletedRecord.objects.create(model='image', object_id=1, deleted_at=timezone.now() - timedelta(days=365))
+        DeletedRecord.objects.create(model='image', object_id=2)
+        call_command('prune_deleted_records', stdout=io.StringIO())
+        self.assertEqual(list(DeletedRecord.objects.values_list('object_id', flat=True)), [2])
+
+
+class SearchTestMixin:
+    def setUp(self):
+        self.user = make_user('doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.diabetic = make_patient('MRN-1', diagnosis='Type 2 diabetes with foot ulcers')
+        self.fracture = make_patient('MRN-2', diagnosis='Hip fracture')
+        self.heel = Assessment.objects.create(
+            clinician=self.user, wound_type='Pressure ulcer', location='Heel', notes='Slough reducing'
+        )
+        self.foot = Assessment.objects.create(
+            clinician=self.user, wound_type='Diabetic foot', notes='Pressure relief advised'
+        )
+        Assessment.objects.create(clinician=make_user('other'), wound_type='Pressure ulcer')
+
+    def search(self, query, client=None):
+        response = (client or self.client).get('/api/images/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['assessments']], [item['id'] for item in response.data['patients']]
+
+
+class SearchTests(SearchTestMixin, TestCase):
+    # Built without migrations, so no search index: the substring fallback
+    def test_substring_matches(self):
+        self.assertEqual(self.search('ulcer'), ([self.heel.pk], [self.diabetic.pk]))
+        self.assertEqual(self.search('PRESSURE')[0], [self.foot.pk, self.heel.pk])
+        self.assertEqual(self.search('fracture')[1], [self.fracture.pk])
+
+    def test_nurses_only_find_assigned_patients(self):
+        nurse = make_user('nurse', role='NURSE')
+        client = APIClient()
+        client.force_authenticate(nurse)
+        self.assertEqual(self.search('fracture', client), ([], []))
+        PatientAssignment.objects.create(patient=self.fracture, nurse=nurse, assigned_by=self.user)
+        self.assertEqual(self.search('fracture', client), ([], [self.fracture.pk]))
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get('/api/images/search/', {'q': '  '}).status_code, 400)
+        self.assertEqual(self.client.get('/api/images/search/', {'q': 'x', 'page_size': 'all'}).status_code, 400)
+
+
+class FullTextSearchTests(SearchTestMixin, TransactionTestCase):
+    def setUp(self):
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        super().setUp()
+
+    def tearDown(self):
+        with connection.schema_editor() as schema_editor:
+            uninstall_search(schema_editor)
+        super().tearDown()
+
+    def test_ranked_and_stemmed(self):
+        if connection.vendor == 'sqlite':
+            # Limited to the clinician's own assessments, stemmed
+            self.assertEqual(self.search('ulcers'), ([self.heel.pk], [self.diabetic.pk]))
+        # The wound type outranks the notes
+        self.assertEqual(self.search('pressure')[0], [self.heel.pk, self.foot.pk])
+
+    def test_index_follows_updates(self):
+        self.foot.notes = 'Granulating'
+        self.foot.save()
+        self.assertEqual(self.search('pressure')[0], [self.heel.pk])
+        self.assertEqual(self.search('granulating')[0], [self.foot.pk])
+        self.foot.delete()
+        self.assertEqual(self.search('granulating')[0], [])
+
+    def test_operators_are_matched_as_words(self):
+        self.assertEqual(self.search('heel OR NOT "'), ([], []))
+
+
+class DashboardStatsTests(MediaTestCase):
+    def counters(self):
+        return {
+            (row.scope, row.key, row.metric, row.bucket): row.value
+            for row in DashboardCounter.objects.exclude(value=0)
+        }
+
+    def test_counters_follow_saves_and_deletes(self):
+        nurse = make_user('nurse', role='NURSE')
+        ward_a = make_patient('MRN-1', ward='A', risk_level='High')
+        ward_b = make_patient('MRN-2', ward='B')
+        make_patient('MRN-3')
+        assignment = PatientAssignment.objects.create(patient=ward_a, nurse=nurse, assigned_by=self.user)
+        PatientAssignment.objects.create(patient=ward_b, nurse=nurse, assigned_by=self.user)
+        today = Assessment.objects.create(clinician=self.user, related_patient=ward_a)
+        Assessment.objects.create(clinician=nurse, date=timezone.now() - timedelta(days=3))
+
+        ward_b.ward, ward_b.risk_level = 'A', 'High'
+        ward_b.save()
+        ward_a.risk_level = 'Low'
+        ward_a.save()
+        assignment.active = False
+        assignment.save()
+        today.date -= timedelta(days=1)
+        today.save()
+        Assessment.objects.create(clinician=self.user).delete()
+        make_patient('MRN-4', ward='C').delete()
+
+        self.assertEqual(self.counters(), dict(stats.computed_counters()))
+
+    def test_saves_that_cannot_change_a_counter_skip_the_read(self):
+        assessment = Assessment.objects.create(clinician=self.user)
+        assessment.notes = 'Edited'
+        with CaptureQueriesContext(connection) as queries:
+            assessment.save(update_fields=['notes', 'updated_at'])
+        # The healing cache is still invalidated; nothing else is read or written
+        sql = [query['sql'] for query in queries if 'django_cache' not in query['sql'] and 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(sql), 1)
+        self.assertTrue(sql[0].startswith('UPDATE "images_assessment"'))
+
+    def test_endpoint(self):
+        nurse = make_user('nurse', role='NURSE')
+        patient = make_patient('MRN-1', ward='A', risk_level='High')
+        make_patient('MRN-2', ward='A')
+        make_patient('MRN-3')
+        PatientAssignment.objects.create(patient=patient, nurse=nurse, assigned_by=self.user)
+        Assessment.objects.create(clinician=self.user)
+        Assessment.objects.create(clinician=nurse)
+        Assessment.objects.create(clinician=self.user, date=timezone.now() - timedelta(days=2))
+
+        client = APIClient()
+        client.force_authenticate(nurse)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/images/stats/')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.data, {
+            'active_patients': 3,
+            'critical_cases': 1,
+            'assessments_today': 2,
+            'my_assessments_today': 1,
+            'my_assigned_patients': 1,
+            'wards': [
+                {'ward': '', 'patients': 1, 'critical_patients': 0},
+                {'ward': 'A', 'patients': 2, 'critical_patients': 1},
+            ],
+        })
+
+    def test_reconcile_corrects_drift(self):
+        make_patient('MRN-1', ward='A')
+        Assessment.objects.create(clinician=self.user)
+        # update() and bulk_create() send no signals
+        Patient.objects.update(ward='B')
+        Assessment.objects.bulk_create([Assessment(clinician=self.user)])
+
+        out = io.StringIO()
+        call_command('reconcile_dashboard_stats', stdout=out)
+        self.assertIn('Corrected 3 dashboard counters.', out.getvalue())
+        self.assertEqual(self.counters(), dict(stats.computed_counters()))
+        self.assertEqual(stats.reconcile(), 0)
+
+
+class AssessmentRollupTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ward_a = make_patient('MRN-1', ward='A')
+        self.ward_b = make_patient('MRN-2', ward='B')
+
+    def assess(self, when, patient=None, **fields):
+        return Assessment.objects.create(clinician=self.user, related_patient=patient, date=when, **fields)
+
+    def rows(self):
+        return Counter({
+            (row.period, row.period_start, row.ward, row.dimension, row.value): row.count
+            for row in AssessmentRollup.objects.exclude(count=0)
+        })
+
+    def test_rollups_follow_saves_deletes_and_ward_moves(self):
+        # Wednesday and the Sunday of the same week, then the next Monday
+        first = self.assess(datetime(2026, 3, 4, 9), self.ward_a, stage='Stage 2', pain_level=3, exudate='Low')
+        self.assess(datetime(2026, 3, 8, 23), self.ward_a, stage='Stage 2')
+        self.assess(datetime(2026, 3, 9, 1), self.ward_b, exudate='High')
+        self.assess(datetime(2026, 3, 9, 2))
+        first.stage = 'Stage 3'
+        first.related_patient = self.ward_b
+        first.save()
+        self.assess(datetime(2026, 3, 9, 3), self.ward_b).delete()
+        self.ward_a.ward = 'C'
+        self.ward_a.save()
+        Assessment.objects.bulk_create([Assessment(clinician=self.user, related_patient=self.ward_b, date=datetime(2026, 3, 10))])
+        rollups.record_created(Assessment.objects.filter(date=datetime(2026, 3, 10)))
+
+        self.assertEqual(self.rows(), +rollups.computed_rollups())
+        self.assertEqual(self.rows()[('week', date(2026, 3, 2), 'C', 'stage', 'Stage 2')], 1)
+        self.assertEqual(self.rows()[('week', date(2026, 3, 2), 'B', 'stage', 'Stage 3')], 1)
+
+        self.ward_b.delete()
+        self.assertEqual(self.rows(), +rollups.computed_rollups())
+
+    def test_rebuild_corrects_drift(self):
+        self.assess(datetime(2026, 3, 4), self.ward_a)
+        Assessment.objects.update(stage='Stage 4')
+        out = io.StringIO()
+        call_command('rebuild_assessment_rollups', stdout=out)
+        self.assertIn('Wrote 6 rollup rows.', out.getvalue())
+        self.assertEqual(self.rows()[('day', date(2026, 3, 4), 'A', 'stage', 'Stage 4')], 1)
+        self.assertEqual(self.rows(), +rollups.computed_rollups())
+
+    def test_distribution_endpoint(self):
+        self.assess(datetime(2026, 3, 4), self.ward_a, stage='Stage 1', pain_level=2)
+        self.assess(datetime(2026, 3, 5), self.ward_b, stage='Stage 1', pain_level=5)
+        self.assess(datetime(2026, 3, 10), self.ward_a, stage='Stage 2')
+        url = '/api/images/assessments/distribution/'
+
+        response = self.client.get(url, {'date_from': '2026-03-04', 'date_to': '2026-03-15'})
+        self.assertEqual([bucket['period_start'] for bucket in response.data['buckets']], [date(2026, 3, 2), date(2026, 3, 9)])
+        self.assertEqual(response.data['buckets'][0]['stage'], {'Stage 1': 2})
+        self.assertEqual(response.data['buckets'][0]['pain_level'], {'2': 1, '5': 1})
+
+        response = self.client.get(url, {'period': 'day', 'ward': 'A', 'dimension': 'stage', 'date_from': '2026-03-01', 'date_to': '2026-03-31'})
+        self.assertEqual(response.data['buckets'], [
+            {'period_start': date(2026, 3, 4), 'stage': {'Stage 1': 1}},
+            {'period_start': date(2026, 3, 10), 'stage': {'Stage 2': 1}},
+        ])
+
+        for params in ({'period': 'month'}, {'dimension': 'notes'}, {'date_from': '2026-13-01'}, {'date_from': '2026-03-05', 'date_to': '2026-03-04'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+        nurse = APIClient()
+        nurse.force_authenticate(make_user('nurse', role='NURSE'))
+        self.assertEqual(nurse.get(url).status_code, 403)
+
+
+class AssessmentReportTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.patient = make_patient(diagnosis='Type 2 diabetes')
+        self.assessment = Assessment.objects.create(
+            patient_id=self.patient.mrn, related_patient=self.patient, clinician=self.user,
+            length='3 cm', width='2 cm', notes='Granulating well. ' * 40,
+        )
+        for index in range(3):
+            image = self.create_image(f'{index}.png', width=400, height=300, color=(index * 80, 0, 0))
+            generate_derivatives(image, sizes=(64, 320))
+            AssessmentImage.objects.create(assessment=self.assessment, uploaded_image=image)
+        self.url = f'/api/images/assessments/{self.assessment.pk}/report/'
+
+    def test_rendered_in_the_background_then_served(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(self.client.get(self.url).status_code, 202)
+        self.assertEqual(ProcessingJob.objects.filter(task='render_assessment_report').count(), 1)
+
+        run_worker(burst=True)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        pdf = b''.join(response.streaming_content)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        # Embedded from the largest rendition, not the original
+        self.assertEqual(pdf.count(b'/Subtype /Image /Width 320 '), 3)
+        self.assertIn('assessment-', response['Content-Disposition'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_changes_render_a_new_version(self):
+        self.client.get(self.url)
+        run_worker(burst=True)
+        previous = AssessmentReport.objects.get().file.name
+
+        self.assessment.notes = 'Edited'
+        self.assessment.save()
+        self.assertEqual(self.client.get(self.url).status_code, 202)
+        run_worker(burst=True)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        report = AssessmentReport.objects.get()
+        self.assertNotEqual(report.file.name, previous)
+        self.assertFalse(report.file.storage.exists(previous))
+
+    def test_failed_render_is_reported_until_retried(self):
+        self.client.get(self.url)
+        ProcessingJob.objects.update(max_attempts=1)
+        with mock.patch('images.tasks.render_report', side_effect=RuntimeError('broken image')):
+            with self.assertLogs('images.jobs', 'WARNING'):
+                run_worker(burst=True)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.data, {'message': 'The report could not be generated', 'status': 'failed'})
+        self.assertEqual(self.client.get(self.url).status_code, 500)
+        self.assertEqual(ProcessingJob.objects.filter(status=ProcessingJob.STATUS_QUEUED).count(), 0)
+
+        self.assertEqual(self.client.get(f'{self.url}?retry=1').status_code, 202)
+        run_worker(burst=True)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_access(self):
+        nurse = APIClient()
+        nurse.force_authenticate(make_user('nurse', role='NURSE'))
+        self.assertEqual(nurse.get(self.url).status_code, 403)
+        self.assertEqual(self.client.get('/api/images/assessments/999999/report/').status_code, 404)
+        self.assertFalse(AssessmentReport.objects.exists())
+
+
+class PatientArchiveTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.patient = make_patient(diagnosis='Venous leg ulcer')
+        self.url = f'/api/patients/{self.patient.pk}/export/'
+        self.images = [self.create_image(f'{index}.png', width=300, height=200, color=(index, 9, 9)) for index in range(2)]
+        for notes in ('First', 'Second'):
+            assessment = Assessment.objects.create(
+                patient_id=self.patient.mrn, related_patient=self.patient, clinician=self.user, notes=notes
+            )
+            for image in self.images:
+                AssessmentImage.objects.create(assessment=assessment, uploaded_image=image)
+        # Linked only through the MRN
+        Assessment.objects.create(patient_id=self.patient.mrn, clinician=self.user, notes='Legacy')
+        Assessment.objects.create(patient_id='MRN-2', clinician=self.user, notes='Someone else')
+
+    def archive(self, client=None):
+        response = (client or self.client).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        chunks = list(response.streaming_content)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        self.assertIsNone(archive.testzip())
+        return archive, chunks
+
+    def test_record_contents(self):
+        archive, _ = self.archive()
+        paths = sorted(archive_path(image) for image in self.images)
+        self.assertEqual(archive.namelist()[:2], ['patient.json', 'assessments.csv'])
+        self.assertEqual(sorted(archive.namelist()[2:]), paths)
+        self.assertEqual(json.loads(archive.read('patient.json'))['diagnosis'], 'Venous leg ulcer')
+
+        rows = list(csv.DictReader(io.StringIO(archive.read('assessments.csv').decode())))
+        self.assertEqual([row['notes'] for row in rows], ['First', 'Second', 'Legacy'])
+        self.assertEqual(sorted(rows[0]['image_urls'].split()), paths)
+        self.assertEqual(rows[2]['image_urls'], '')
+
+        for image in self.images:
+            path = archive_path(image)
+            with image.image.open('rb') as original:
+                self.assertEqual(archive.read(path), original.read())
+            self.assertEqual(archive.getinfo(path).compress_type, zipfile.ZIP_STORED)
+
+    @mock.patch('images.archive.STREAM_CHUNK_SIZE', 256)
+    def test_streamed_in_chunks(self):
+        _, chunks = self.archive()
+        self.assertGreater(len(chunks), 3)
+
+    def test_missing_files_are_skipped(self):
+        self.images[0].image.storage.delete(self.images[0].image.name)
+        archive, _ = self.archive()
+        self.assertEqual(archive.namelist(), ['patient.json', 'assessments.csv', archive_path(self.images[1])])
+
+    def test_files_at_the_zip64_limit_get_zip64_headers(self):
+        storage = type(self.images[0].image.storage)
+        with mock.patch.object(storage, 'size', return_value=zipfile.ZIP64_LIMIT):
+            archive, chunks = self.archive()
+        data = b''.join(chunks)
+        for image in self.images:
+            info = archive.getinfo(archive_path(image))
+            # The local header's extra field starts with the ZIP64 record
+            name_length, extra_length = struct.unpack('<HH', data[info.header_offset + 26:info.header_offset + 30])
+            extra = data[info.header_offset + 30 + name_length:][:extra_length]
+            self.assertEqual(struct.unpack('<H', extra[:2])[0], 0x0001)
+
+    def test_access(self):
+        nurse = make_user('nurse', role='NURSE')
+        client = APIClient()
+        client.force_authenticate(nurse)
+        self.assertEqual(client.get(self.url).status_code, 403)
+        PatientAssignment.objects.create(patient=self.patient, nurse=nurse, assigned_by=self.user)
+        self.archive(client)
+        self.assertEqual(self.client.get('/api/patients/999999/export/').status_code, 404)
+
+
+@override_settings(SIGNED_MEDIA_URL_LIFETIME=3600, SIGNED_MEDIA_URL_GRANULARITY=300)
+class MediaSigningTests(TestCase):
+    def test_expiry_is_rounded_up(self):
+        self.assertEqual(media_expiry(now=1000), 4800)
+        self.assertEqual(media_expiry(now=1200), 4800)
+        self.assertEqual(media_expiry(now=1201), 5100)
+        # URLs signed within the same window are identical
+        self.assertEqual(sign_media('a.png', media_expiry(now=1000)), sign_media('a.png', media_expiry(now=1100)))
+
+    def test_verification(self):
+        params = sign_media('uploads/a.png', 5000)
+        self.assertTrue(verify_media('uploads/a.png', '5000', params['signature'], now=4000))
+        self.assertTrue(verify_media('uploads/a.png', 5000, params['signature'], now=5000))
+        self.assertFalse(verify_media('uploads/a.png', 5000, params['signature'], now=5001))
+        self.assertFalse(verify_media('uploads/b.png', 5000, params['signature'], now=4000))
+        self.assertFalse(verify_media('uploads/a.png', 5300, params['signature'], now=4000))
+        self.assertFalse(verify_media('uploads/a.png', 5000, params['signature'][:-1] + 'x', now=4000))
+        for expires, signature in (('soon', params['signature']), (None, params['signature']), (5000, None)):
+            self.assertFalse(verify_media('uploads/a.png', expires, signature, now=4000))
+        with self.settings(SECRET_KEY='another-secret-key'):
+            self.assertFalse(verify_media('uploads/a.png', 5000, params['signature'], now=4000))
+
+
+class SignedMediaViewTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.image = self.create_image(width=400, height=300)
+        generate_derivatives(self.image, sizes=(64,))
+        self.anonymous = APIClient()
+
+    def fetch(self, url):
+        return self.anonymous.get(url)
+
+    def test_api_responses_only_carry_signed_urls(self):
+        image = self.client.get('/api/images/').data['images'][0]
+        for url in (image['image'], image['image_url'], image['image_full_url'], image['derivatives']['64']):
+            self.assertIn('/api/images/media/', url)
+            self.assertIn('signature=', url)
+        self.assertNotEqual(image['derivatives']['64'], image['image_url'])
+
+        response = self.fetch(image['derivatives']['64'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Image.open(io.BytesIO(b''.join(response.streaming_content))).size, (64, 48))
+
+    def test_served_without_authentication_or_queries(self):
+        url = signed_media_url(self.image.image)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.fetch(url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.status_code, 200)
+        with self.image.image.open('rb') as file:
+            self.assertEqual(b''.join(response.streaming_content), file.read())
+        max_age = int(response['Cache-Control'].split('max-age=')[1].split(',')[0])
+        self.assertLessEqual(max_age, media_expiry() - int(timezone.now().timestamp()) + 1)
+
+    def test_bad_and_expired_links(self):
+        name = self.image.image.name
+        valid = signed_media_url(self.image.image)
+        expired = signed_media_url(self.image.image, expires=int(timezone.now().timestamp()) - 1)
+        other = self.create_image('other.png', color=(1, 2, 3))
+        for url in (
+            valid.replace('signature=', 'signature=0'),
+            valid.replace(name, other.image.name),
+            expired,
+            f'/api/images/media/{name}',
+        ):
+            with self.subTest(url=url):
+                response = self.fetch(url)
+                self.assertEqual(response.status_code, 403)
+                self.assertEqual(response.data['message'], 'Invalid or expired link')
+
+        self.image.image.storage.delete(name)
+        self.assertEqual(self.fetch(valid).status_code, 404)
@@ -3,9 +3,27 @@ from . import views
 
 urlpatterns = [
     path('upload/', views.upload_image, name='upload_image'),
+    path('upload/batch/', views.upload_images_batch, name='upload_images_batch'),
+    path('upload/sessions/', views.create_upload_session, name='create_upload_session'),
+    path('upload/sessions/<uuid:session_id>/', views.upload_session_detail, name='upload_session_detail'),
+    path('upload/sessions/<uuid:session_id>/finalize/', views.finalize_upload_session, name='finalize_upload_session'),
     path('', views.list_images, name='list_images'),
     path('<int:image_id>/', views.delete_image, name='delete_image'),
+    path('<int:image_id>/status/', views.image_status, name='image_status'),
+    path('<int:image_id>/file/', views.serve_image, name='serve_image'),
+    path('<int:image_id>/similar/', views.similar_images, name='similar_images'),
+    path('stats/', views.dashboard_statistics, name='dashboard_statistics'),
+    path('media/<path:name>', views.serve_signed_media, name='serve_signed_media'),
+    path('search/', views.search_records, name='search_records'),
+    path('changes/', views.change_feed, name='change_feed'),
     path('assessments/', views.list_assessments, name='list_assessments'),
+    path('assessments/measurements/', views.assessment_measurements, name='assessment_measurements'),
+    path('assessments/distribution/', views.assessment_distribution, name='assessment_distribution'),
+    path('assessments/healing/', views.healing_analytics, name='healing_analytics'),
+    path('assessments/export/', views.export_assessments, name='export_assessments'),
+    path('assessments/import/', views.import_assessments_view, name='import_assessments'),
     path('assessments/create/', views.create_assessment, name='create_assessment'),
     path('assessments/<int:assessment_id>/delete/', views.delete_assessment, name='delete_assessment'),
+    path('assessments/<int:assessment_id>/report/', views.assessment_report, name='assessment_report'),
+    path('assessments/<int:assessment_id>/duplicates/', views.assessment_duplicates, name='assessment_duplicates'),
 ]
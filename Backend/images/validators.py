@@ -1,14 +1,18 @@
+from collections import namedtuple
 from django.core.exceptions import ValidationError
 import os
+import struct
+
+VALID_EXTENSIONS = ['.png', '.jpg', '.jpeg']
+MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB in bytes
 
 def validate_image_format(value):
     """
     Validate that the uploaded file is PNG or JPG format only.
     """
     ext = os.path.splitext(value.name)[1].lower()
-    valid_extensions = ['.png', '.jpg', '.jpeg']
     
-    if ext not in valid_extensions:
+    if ext not in VALID_EXTENSIONS:
         raise ValidationError(
             f'Unsupported file format. Only PNG and JPG files are allowed. You uploaded: {ext}'
         )
@@ -17,9 +21,110 @@ def validate_image_size(value):
     """
     Validate that the uploaded file is not larger than 10MB.
     """
-    max_size = 10 * 1024 * 1024  # 10MB in bytes
-    
-    if value.size > max_size:
+    if value.size > MAX_IMAGE_SIZE:
         raise ValidationError(
             f'File size exceeds 10MB limit. Your file is {value.size / (1024 * 1024):.2f}MB'
         )
+
+# Largest decoded bitmap we accept (~50 megapixels, well above any tablet or
+# phone camera); anything bigger is treated as a decompression bomb.
+MAX_IMAGE_PIXELS = 50_000_000
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_SIGNATURE = b'\xff\xd8'
+
+PNG_COLOR_MODES = {0: 'L', 2: 'RGB', 3: 'P', 4: 'LA', 6: 'RGBA'}
+JPEG_COLOR_MODES = {1: 'L', 3: 'RGB', 4: 'CMYK'}
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, ...) carry the
+# dimensions. C4 (DHT), C8 (JPG) and CC (DAC) share the range but are not frames.
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_MAX_SEGMENTS = 64
+
+ImageHeader = namedtuple('ImageHeader', ['format', 'width', 'height', 'mode'])
+
+def _read_exact(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise ValidationError('The file is truncated or is not a valid image.')
+    return data
+
+def _parse_png_header(file):
+    # The IHDR chunk is required to come first, right after the signature
+    length, chunk_type = struct.unpack('>I4s', _read_exact(file, 8))
+    if chunk_type != b'IHDR' or length != 13:
+        raise ValidationError('The file is not a valid PNG image.')
+    width, height, _bit_depth, color_type = struct.unpack('>IIBB', _read_exact(file, 10))
+    if color_type not in PNG_COLOR_MODES:
+        raise ValidationError('The file is not a valid PNG image.')
+    return ImageHeader('PNG', width, height, PNG_COLOR_MODES[color_type])
+
+def _parse_jpeg_header(file):
+    # Walk the marker segments, seeking over their payloads (EXIF thumbnails
+    # can be tens of KB) until the first start-of-frame.
+    for _ in range(JPEG_MAX_SEGMENTS):
+        byte = _read_exact(file, 1)
+        if byte != b'\xff':
+            raise ValidationError('The file is not a valid JPEG image.')
+        marker = _read_exact(file, 1)[0]
+        while marker == 0xFF:  # Fill bytes
+            marker = _read_exact(file, 1)[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # Standalone markers
+            continue
+        if marker in (0xD9, 0xDA):  # End of image / start of scan before any frame
+            break
+        (length,) = struct.unpack('>H', _read_exact(file, 2))
+        if length < 2:
+            raise ValidationError('The file is not a valid JPEG image.')
+        if marker in JPEG_SOF_MARKERS:
+            _precision, height, width, components = struct.unpack('>BHHB', _read_exact(file, 6))
+            return ImageHeader('JPEG', width, height, JPEG_COLOR_MODES.get(components, 'RGB'))
+        file.seek(length - 2, os.SEEK_CUR)
+    raise ValidationError('The file is not a valid JPEG image.')
+
+def read_image_header(file):
+    """
+    Identify a PNG/JPEG by its magic bytes and parse only its header.
+    Returns an ImageHeader without decoding any pixel data.
+    """
+    file.seek(0)
+    try:
+        signature = file.read(len(PNG_SIGNATURE))
+        if signature == PNG_SIGNATURE:
+            return _parse_png_header(file)
+        if signature[:2] == JPEG_SIGNATURE:
+            file.seek(2)
+            return _parse_jpeg_header(file)
+        raise ValidationError('The file content is not a PNG or JPG image.')
+    finally:
+        file.seek(0)
+
+def upload_image_header(upload):
+    """
+    Parse the header of an incoming upload once, caching it on the file object.
+    """
+    if getattr(upload, 'image_header', None) is None:
+        upload.image_header = read_image_header(upload)
+    return upload.image_header
+
+def validate_image_content(value):
+    """
+    Validate the actual bytes: the signature must be PNG or JPEG, match the
+    file extension, and the declared dimensions must be sane.
+    """
+    header = upload_image_header(value)
+
+    ext = os.path.splitext(value.name)[1].lower()
+    expected_format = 'PNG' if ext == '.png' else 'JPEG'
+    if ext in VALID_EXTENSIONS and header.format != expected_format:
+        raise ValidationError(
+            f'File content does not match its extension. The file is a {header.format} image named {ext}'
+        )
+
+    if header.width == 0 or header.height == 0:
+        raise ValidationError('The image has no pixels.')
+    if header.width * header.height > MAX_IMAGE_PIXELS:
+        raise ValidationError(
+            f'Image dimensions are too large ({header.width}x{header.height}). '
+            f'The limit is {MAX_IMAGE_PIXELS // 1_000_000} megapixels.'
+        )
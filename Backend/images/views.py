@@ -1,9 +1,75 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.base import File
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from .models import UploadedImage, Assessment
-from .serializers import UploadedImageSerializer, AssessmentSerializer
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from .models import UploadedImage, Assessment, AssessmentReport, UploadSession
+from .serializers import UploadedImageSerializer, AssessmentSerializer, UploadSessionSerializer
+from .analytics import patient_healing, ward_healing
+from .changes import CursorExpired, changes_since
+from .export import EXPORT_FORMATS, export_lines, export_rows
+from .importer import import_assessments, read_upload
+from .jobs import enqueue, enqueue_many
+from .measurements import MEASUREMENT_FILTERS, filter_measurements
+from .media import serve_stored_file
+from .pagination import InvalidCursor, page_size_from, paginate_keyset
+from .reports import request_report
+from .rollups import DEFAULT_SPANS, ROLLUP_DIMENSIONS, distribution
+from .phash import DEFAULT_MAX_DISTANCE, near_duplicate_groups, uploader_tree
+from .search import search
+from .signing import signed_media_url, verify_media
+from .stats import dashboard_stats, local_date
+from .storage import upload_content_hash
+
+# Read request bodies in pieces so a chunk never has to fit in memory
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+MAX_BATCH_UPLOAD_FILES = 20
+
+def _save_upload(request, serializer):
+    """
+    Persist a validated UploadedImageSerializer for the current user and
+    return the response. Shared by the direct and the chunked upload paths.
+    """
+    # Identical bytes (e.g. a retried upload) resolve to the existing record
+    content_hash = upload_content_hash(serializer.validated_data['image'])
+    existing = UploadedImage.objects.filter(uploaded_by=request.user, content_hash=content_hash).first()
+    if existing:
+        return Response(
+            {
+                'message': 'Image already uploaded',
+                'data': UploadedImageSerializer(existing, context={'request': request}).data
+            },
+            status=status.HTTP_200_OK
+        )
+
+    # Save the image with the current user
+    instance = serializer.save(uploaded_by=request.user)
+    
+    # Save the full absolute URL to the database
+    if instance.image:
+        full_url = request.build_absolute_uri(instance.image.url)
+        instance.image_full_url = full_url
+        instance.save(update_fields=['image_full_url'])
+        # Renditions etc. are produced by the job workers, not in the request
+        enqueue('process_upload', image_id=instance.pk)
+
+    return Response(
+        {
+            'message': 'Image uploaded successfully',
+            'data': serializer.data
+        },
+        status=status.HTTP_201_CREATED
+    )
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -14,21 +80,7 @@ def upload_image(request):
     serializer = UploadedImageSerializer(data=request.data, context={'request': request})
     
     if serializer.is_valid():
-        # Save the image with the current user
-        instance = serializer.save(uploaded_by=request.user)
-        
-        # Save the full absolute URL to the database
-        if instance.image:
-             full_url = request.build_absolute_uri(instance.image.url)
-             instance.image_full_url = full_url
-             instance.save(update_fields=['image_full_url'])
-        return Response(
-            {
-                'message': 'Image uploaded successfully',
-                'data': serializer.data
-            },
-            status=status.HTTP_201_CREATED
-        )
+        return _save_upload(request, serializer)
     
     return Response(
         {
@@ -38,19 +90,252 @@ def upload_image(request):
         status=status.HTTP_400_BAD_REQUEST
     )
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_images_batch(request):
+    """
+    Upload several images in one multipart request (repeated `images` fields,
+    optional parallel `descriptions`). Every file is validated on its own and
+    the result of each one is reported by index.
+    """
+    files = request.FILES.getlist('images')
+    descriptions = request.data.getlist('descriptions') if hasattr(request.data, 'getlist') else []
+    if not files:
+        return Response({'message': 'No images provided'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(files) > MAX_BATCH_UPLOAD_FILES:
+        return Response(
+            {'message': f'At most {MAX_BATCH_UPLOAD_FILES} images can be uploaded per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    results = [None] * len(files)
+    pending = []
+    seen_hashes = {}
+    for index, upload in enumerate(files):
+        description = descriptions[index] if index < len(descriptions) else None
+        serializer = UploadedImageSerializer(
+            data={'image': upload, 'description': description}, context={'request': request}
+        )
+        if not serializer.is_valid():
+            results[index] = {'index': index, 'filename': upload.name, 'status': 'error', 'errors': serializer.errors}
+            continue
+
+        content_hash = upload_content_hash(upload)
+        if content_hash in seen_hashes:
+            # Same bytes twice in one request: point at the first copy
+            results[index] = {'index': index, 'filename': upload.name, 'status': 'duplicate', 'duplicate_of': seen_hashes[content_hash]}
+            continue
+        seen_hashes[content_hash] = index
+
+        instance = UploadedImage(
+            uploaded_by=request.user,
+            description=serializer.validated_data.get('description'),
+        )
+        instance.apply_upload_metadata(upload)
+        pending.append((index, instance, serializer.validated_data['image']))
+
+    # One query for every hash that this user already uploaded
+    existing = {
+        image.content_hash: image
+        for image in UploadedImage.objects.filter(uploaded_by=request.user, content_hash__in=seen_hashes)
+    }
+
+    to_create = []
+    for index, instance, upload in pending:
+        if instance.content_hash in existing:
+            results[index] = {
+                'index': index, 'filename': upload.name, 'status': 'duplicate',
+                'data': UploadedImageSerializer(existing[instance.content_hash], context={'request': request}).data
+            }
+            continue
+        # Stream the file to storage now so the rows can be inserted in a
+        # single statement with their final name and URL.
+        instance.image.save(upload.name, upload, save=False)
+        instance.image_full_url = request.build_absolute_uri(instance.image.url)
+        to_create.append((index, upload.name, instance))
+
+    with transaction.atomic():
+        created = UploadedImage.objects.bulk_create([instance for _, _, instance in to_create])
+        enqueue_many('process_upload', [{'image_id': instance.pk} for instance in created])
+
+    for (index, filename, _), instance in zip(to_create, created):
+        results[index] = {
+            'index': index, 'filename': filename, 'status': 'created',
+            'data': UploadedImageSerializer(instance, context={'request': request}).data
+        }
+
+    if created:
+        response_status = status.HTTP_201_CREATED
+    elif any(result['status'] == 'duplicate' for result in results):
+        response_status = status.HTTP_200_OK
+    else:
+        response_status = status.HTTP_400_BAD_REQUEST
+    return Response(
+        {
+            'message': f'{len(created)} of {len(files)} images uploaded',
+            'results': results
+        },
+        status=response_status
+    )
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_upload_session(request):
+    """
+    Start a resumable upload. The client sends `filename` and `total_size`,
+    then PATCHes chunks to the returned session and finalizes it.
+    """
+    serializer = UploadSessionSerializer(data=request.data)
+    if serializer.is_valid():
+        session = serializer.save(user=request.user)
+        os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+        open(session.temp_path, 'wb').close()
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET', 'HEAD', 'PATCH', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def upload_session_detail(request, session_id):
+    """
+    GET/HEAD: report the current offset so an interrupted client can resume.
+    PATCH: append the raw request body at the offset given in `Upload-Offset`.
+    DELETE: abort the upload.
+    """
+    try:
+        session = UploadSession.objects.get(id=session_id, user=request.user)
+    except UploadSession.DoesNotExist:
+        return Response({'message': 'Upload session not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method in ('GET', 'HEAD'):
+        return Response(UploadSessionSerializer(session).data, headers={'Upload-Offset': str(session.received)})
+
+    if request.method == 'DELETE':
+        session.discard()
+        return Response({'message': 'Upload session cancelled'}, status=status.HTTP_200_OK)
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return Response({'message': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        # Lock the session so two PATCHes for the same upload cannot interleave
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if offset != session.received:
+            return Response(
+                {'message': 'Offset mismatch', 'offset': session.received},
+                status=status.HTTP_409_CONFLICT,
+                headers={'Upload-Offset': str(session.received)}
+            )
+
+        remaining = session.total_size - session.received
+        written = 0
+        with open(session.temp_path, 'r+b') as part:
+            # Anything past the recorded offset is a torn write from a dropped request
+            part.seek(session.received)
+            part.truncate()
+            stream = request.stream
+            while stream is not None:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > remaining:
+                    part.truncate(session.received)
+                    return Response(
+                        {'message': 'Chunk exceeds the declared file size'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                part.write(chunk)
+
+        session.received += written
+        session.save(update_fields=['received', 'updated_at'])
+
+    return Response(UploadSessionSerializer(session).data, headers={'Upload-Offset': str(session.received)})
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def finalize_upload_session(request, session_id):
+    """
+    Validate the assembled file and turn it into an UploadedImage.
+    """
+    try:
+        session = UploadSession.objects.get(id=session_id, user=request.user)
+    except UploadSession.DoesNotExist:
+        return Response({'message': 'Upload session not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if not session.is_complete:
+        return Response(
+            {'message': 'Upload is incomplete', 'offset': session.received, 'total_size': session.total_size},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    try:
+        part = open(session.temp_path, 'rb')
+    except FileNotFoundError:
+        # Pruned with the expired sessions, or lost with a temporary directory
+        session.discard()
+        return Response(
+            {'message': 'Upload data is no longer available, start a new upload'}, status=status.HTTP_410_GONE
+        )
+    with part:
+        data = {'image': File(part, name=session.filename), 'description': session.description}
+        serializer = UploadedImageSerializer(data=data, context={'request': request})
+        if not serializer.is_valid():
+            session.discard()
+            return Response(
+                {
+                    'message': 'Image upload failed',
+                    'errors': serializer.errors
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        response = _save_upload(request, serializer)
+
+    session.discard()
+    return response
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_images(request):
     """
-    List all images uploaded by the current user.
+    List images uploaded by the current user, newest first.
+
+    Without `cursor` / `page_size` this returns every image with a `count`
+    as before; with either, one page of `images` plus the `next_cursor` to
+    pass back as `?cursor=` for the next page.
     """
     images = UploadedImage.objects.filter(uploaded_by=request.user)
-    serializer = UploadedImageSerializer(images, many=True, context={'request': request})
-    
+
+    # Optional dimension filters, e.g. ?min_width=4000
+    for param, lookup in (('min_width', 'width__gte'), ('min_height', 'height__gte')):
+        value = request.query_params.get(param)
+        if value is not None:
+            try:
+                images = images.filter(**{lookup: int(value)})
+            except ValueError:
+                return Response({'message': f'{param} must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    images = images.prefetch_related('derivatives')
+    if 'cursor' not in request.query_params and 'page_size' not in request.query_params:
+        serializer = UploadedImageSerializer(images, many=True, context={'request': request})
+        return Response(
+            {
+                'count': len(serializer.data),
+                'images': serializer.data
+            },
+            status=status.HTTP_200_OK
+        )
+
+    try:
+        page, next_cursor = paginate_keyset(images, request, 'uploaded_at')
+    except InvalidCursor as exc:
+        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = UploadedImageSerializer(page, many=True, context={'request': request})
+
     return Response(
         {
-            'count': images.count(),
-            'images': serializer.data
+            'images': serializer.data,
+            'next_cursor': next_cursor,
         },
         status=status.HTTP_200_OK
     )
@@ -74,6 +359,203 @@ def delete_image(request, image_id):
             status=status.HTTP_404_NOT_FOUND
         )
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def image_status(request, image_id):
+    """
+    Report the background processing state of an image, for clients to poll
+    after an upload until its renditions are ready.
+    """
+    try:
+        image = UploadedImage.objects.get(id=image_id, uploaded_by=request.user)
+    except UploadedImage.DoesNotExist:
+        return Response({'message': 'Image not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    serializer = UploadedImageSerializer(image, context={'request': request})
+    return Response(
+        {
+            'id': image.id,
+            'processing_status': image.processing_status,
+            'derivatives': serializer.data['derivatives']
+        },
+        status=status.HTTP_200_OK
+    )
+
+@api_view(['GET', 'HEAD'])
+@permission_classes([IsAuthenticated])
+def serve_image(request, image_id):
+    """
+    Download an image file (or with `?size=320` one of its renditions).
+    Available to the uploader and to clinicians whose assessments use the image.
+    Supports conditional requests and byte ranges.
+    """
+    images = UploadedImage.objects.all()
+    if not request.user.is_superuser:
+        images = images.filter(Q(uploaded_by=request.user) | Q(assessments__clinician=request.user)).distinct()
+    try:
+        image = images.get(id=image_id)
+    except UploadedImage.DoesNotExist:
+        return Response({'message': 'Image not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    field_file = image.image
+    etag = image.content_hash or f'{image.pk}-{image.image.name}'
+    last_modified = image.uploaded_at
+
+    size = request.query_params.get('size')
+    if size is not None:
+        derivative = image.derivatives.filter(size=size).first() if size.isdigit() else None
+        if derivative is None:
+            return Response({'message': 'Rendition not found'}, status=status.HTTP_404_NOT_FOUND)
+        field_file = derivative.image
+        etag = f'{etag}-{derivative.size}'
+        last_modified = derivative.created_at
+
+    if not field_file:
+        return Response({'message': 'Image file missing'}, status=status.HTTP_404_NOT_FOUND)
+    return serve_stored_file(
+        request, field_file.storage, field_file.name, etag, int(last_modified.timestamp())
+    )
+
+@api_view(['GET', 'HEAD'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def serve_signed_media(request, name):
+    """
+    Download a stored image or rendition through a signed URL (see
+    signing.py). The signature is the authorization: no session, token or
+    database query is involved.
+    """
+    params = request.query_params
+    if not verify_media(name, params.get('expires'), params.get('signature')):
+        return Response({'message': 'Invalid or expired link'}, status=status.HTTP_403_FORBIDDEN)
+
+    storage = UploadedImage._meta.get_field('image').storage
+    try:
+        last_modified = storage.get_modified_time(name)
+    except (FileNotFoundError, OSError):
+        return Response({'message': 'Image file missing'}, status=status.HTTP_404_NOT_FOUND)
+    # Cacheable until the link expires
+    max_age = max(int(params['expires']) - int(time.time()), 0)
+    # Names are content hashes, but a regenerated rendition is rewritten in
+    # place, so the modification time is part of the validator
+    modified = int(last_modified.timestamp())
+    return serve_stored_file(request, storage, name, f'{name}:{modified}', modified, max_age=max_age)
+
+def _max_distance(request):
+    try:
+        return max(0, min(int(request.query_params.get('distance', DEFAULT_MAX_DISTANCE)), 32))
+    except ValueError:
+        return None
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def similar_images(request, image_id):
+    """
+    Find the current user's images that look almost identical to this one
+    (perceptual hash within `distance` bits, default 8).
+    """
+    max_distance = _max_distance(request)
+    if max_distance is None:
+        return Response({'message': 'distance must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        image = UploadedImage.objects.get(id=image_id, uploaded_by=request.user)
+    except UploadedImage.DoesNotExist:
+        return Response({'message': 'Image not found'}, status=status.HTTP_404_NOT_FOUND)
+    if image.perceptual_hash is None:
+        return Response({'message': 'Image has not been processed yet'}, status=status.HTTP_409_CONFLICT)
+
+    # The user's BK-tree is cached until their images change
+    matches = uploader_tree(request.user).search(image.perceptual_hash, max_distance)
+
+    distances = {match_id: distance for distance, match_id in matches if match_id != image.id}
+    similar = UploadedImage.objects.filter(id__in=distances).prefetch_related('derivatives')
+    data = UploadedImageSerializer(similar, many=True, context={'request': request}).data
+    for item in data:
+        item['distance'] = distances[item['id']]
+    data.sort(key=lambda item: item['distance'])
+    return Response({'count': len(data), 'images': data}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def assessment_duplicates(request, assessment_id):
+    """
+    Group the images of an assessment that are near-duplicates of each other.
+    """
+    max_distance = _max_distance(request)
+    if max_distance is None:
+        return Response({'message': 'distance must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        assessment = Assessment.objects.get(id=assessment_id, clinician=request.user)
+    except Assessment.DoesNotExist:
+        return Response({'message': 'Assessment not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    hashes = assessment.images.filter(perceptual_hash__isnull=False).values_list('perceptual_hash', 'id')
+    return Response(
+        {'groups': near_duplicate_groups(hashes, max_distance)},
+        status=status.HTTP_200_OK
+    )
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def change_feed(request):
+    """
+    Assessments, images, patients and assignments created, updated or
+    deleted since `?since=<next_cursor>`; without `since`, a full snapshot.
+    Keep calling with the returned `next_cursor` while `has_more` is true.
+    """
+    try:
+        data = changes_since(
+            request.user, request.query_params.get('since'), page_size_from(request), {'request': request}
+        )
+    except InvalidCursor as exc:
+        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    except CursorExpired:
+        return Response(
+            {'message': 'Cursor expired, fetch everything again without since'}, status=status.HTTP_410_GONE
+        )
+    return Response(data, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_records(request):
+    """
+    Full-text search (`?q=`) over the current clinician's assessment notes,
+    wound types and locations and the diagnoses of patients they can see,
+    best matches first.
+    """
+    from patient.models import Patient, PatientAssignment
+    from patient.serializers import PatientSerializer
+    from patient.views import is_doctor, is_nurse
+
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'message': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = page_size_from(request)
+    except InvalidCursor as exc:
+        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    assessments = search(Assessment.objects.filter(clinician=request.user), query).with_details()[:limit]
+    patients = Patient.objects.with_wound_counts()
+    if not is_doctor(request.user):
+        if is_nurse(request.user):
+            assigned = PatientAssignment.objects.filter(nurse=request.user, active=True).values('patient_id')
+            patients = patients.filter(id__in=assigned)
+        else:
+            patients = patients.none()
+    patients = search(patients, query)[:limit]
+
+    return Response(
+        {
+            'assessments': [
+                dict(AssessmentSerializer(assessment, context={'request': request}).data, rank=assessment.rank)
+                for assessment in assessments
+            ],
+            'patients': [dict(PatientSerializer(patient).data, rank=patient.rank) for patient in patients],
+        },
+        status=status.HTTP_200_OK
+    )
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_assessment(request):
@@ -82,58 +564,71 @@ def create_assessment(request):
     """
     serializer = AssessmentSerializer(data=request.data)
     if serializer.is_valid():
-        from .models import AssessmentImage, UploadedImage
+        from .models import AssessmentImage
         
         # Try to link to a Patient record using the provided MRN (patient_id field)
         patient_mrn = serializer.validated_data.get('patient_id')
         related_patient = None
         if patient_mrn:
             from patient.models import Patient
-            try:
-                related_patient = Patient.objects.get(mrn=patient_mrn)
-            except Patient.DoesNotExist:
-                pass
+            related_patient = Patient.objects.filter(mrn=patient_mrn).first()
 
-        # Save assessment first without M2M field
         details = request.data.get('clinical_details', {})
         measurements = details.get('measurements', {})
-        
-        assessment = serializer.save(
-            clinician=request.user, 
-            related_patient=related_patient,
-            stage=request.data.get('stage', details.get('stage', 'Stage 1')),
-            wound_type=details.get('woundType'),
-            exudate=details.get('exudate'),
-            pain_level=details.get('painLevel', 0),
-            length=measurements.get('length'),
-            width=measurements.get('width'),
-            depth=measurements.get('depth'),
-            location=details.get('location'),
-            body_part=details.get('part')
-        )
-        
-        # Manually handle the M2M through model
-        image_ids = request.data.get('images', [])
-        for img_id in image_ids:
+
+        # Keep the requested order, drop repeats and anything that isn't an id
+        requested_ids = []
+        rejected_ids = []
+        for img_id in request.data.get('images', []):
             try:
-                img_obj = UploadedImage.objects.get(id=img_id)
-                # Create the through model instance with the explicit URL
+                img_id = int(img_id)
+            except (TypeError, ValueError):
+                rejected_ids.append(img_id)
+                continue
+            if img_id not in requested_ids:
+                requested_ids.append(img_id)
+
+        with transaction.atomic():
+            # Save assessment first without M2M field
+            assessment = serializer.save(
+                clinician=request.user, 
+                related_patient=related_patient,
+                stage=request.data.get('stage', details.get('stage', 'Stage 1')),
+                wound_type=details.get('woundType'),
+                exudate=details.get('exudate'),
+                pain_level=details.get('painLevel', 0),
+                length=measurements.get('length'),
+                width=measurements.get('width'),
+                depth=measurements.get('depth'),
+                location=details.get('location'),
+                body_part=details.get('part')
+            )
+
+            # One query for all images, limited to the ones this user uploaded
+            images = UploadedImage.objects.filter(id__in=requested_ids, uploaded_by=request.user).only(
+                'id', 'image', 'image_full_url'
+            ).in_bulk()
+
+            # Manually handle the M2M through model, storing the explicit URL
+            links = []
+            for img_id in requested_ids:
+                img_obj = images.get(img_id)
+                if img_obj is None:
+                    rejected_ids.append(img_id)
+                    continue
                 full_url = img_obj.image_full_url
                 if not full_url and img_obj.image:
                      full_url = request.build_absolute_uri(img_obj.image.url)
+                links.append(AssessmentImage(assessment=assessment, uploaded_image=img_obj, image_url=full_url))
+            AssessmentImage.objects.bulk_create(links)
 
-                AssessmentImage.objects.create(
-                    assessment=assessment,
-                    uploaded_image=img_obj,
-                    image_url=full_url
-                )
-            except UploadedImage.DoesNotExist:
-                 continue
-
+        # Re-read with everything the serializer needs in a fixed number of queries
+        assessment = Assessment.objects.with_details().get(pk=assessment.pk)
         return Response(
             {
                 'message': 'Assessment created successfully',
-                'data': serializer.data
+                'data': AssessmentSerializer(assessment, context={'request': request}).data,
+                'rejected_images': rejected_ids
             },
             status=status.HTTP_201_CREATED
         )
@@ -143,11 +638,200 @@ def create_assessment(request):
 @permission_classes([IsAuthenticated])
 def list_assessments(request):
     """
-    List all assessments for the current clinician.
+    List assessments for the current clinician.
+
+    Without `cursor` / `page_size` this returns the full list as before;
+    with either, a page of `results` plus the `next_cursor`. Measurements can
+    be range-filtered with `min_area`, `max_depth` and so on.
+    """
+    try:
+        assessments = filter_measurements(Assessment.objects.filter(clinician=request.user), request.query_params)
+    except ValueError as exc:
+        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    assessments = assessments.with_details()
+    if 'cursor' not in request.query_params and 'page_size' not in request.query_params:
+        serializer = AssessmentSerializer(assessments, many=True, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    try:
+        page, next_cursor = paginate_keyset(assessments, request, 'date')
+    except InvalidCursor as exc:
+        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = AssessmentSerializer(page, many=True, context={'request': request})
+    return Response({'results': serializer.data, 'next_cursor': next_cursor}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def assessment_measurements(request):
+    """
+    Min / max / average of each wound measurement over the current
+    clinician's assessments, computed by the database. Accepts the same
+    range filters as the list plus `patient` (patient id).
     """
     assessments = Assessment.objects.filter(clinician=request.user)
-    serializer = AssessmentSerializer(assessments, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    patient_id = request.query_params.get('patient')
+    if patient_id is not None:
+        try:
+            assessments = assessments.filter(related_patient_id=int(patient_id))
+        except ValueError:
+            return Response({'message': 'patient must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        assessments = filter_measurements(assessments, request.query_params)
+    except ValueError as exc:
+        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    aggregates = {'count': Count('id')}
+    for column in MEASUREMENT_FILTERS.values():
+        aggregates[f'{column}__min'] = Min(column)
+        aggregates[f'{column}__max'] = Max(column)
+        aggregates[f'{column}__avg'] = Avg(column)
+    totals = assessments.aggregate(**aggregates)
+
+    data = {'count': totals['count']}
+    for column in MEASUREMENT_FILTERS.values():
+        average = totals[f'{column}__avg']
+        data[column] = {
+            'min': totals[f'{column}__min'],
+            'max': totals[f'{column}__max'],
+            'avg': round(average, 2) if average is not None else None,
+        }
+    return Response(data, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def healing_analytics(request):
+    """
+    Healing rate, percent area reduction and projected closure for each
+    wound of one patient (`?patient=<id>`) or a whole ward (`?ward=<name>`).
+    """
+    from patient.models import Patient, PatientAssignment
+    from patient.views import can_view_patient, is_doctor, is_nurse
+
+    patient_id = request.query_params.get('patient')
+    ward = request.query_params.get('ward')
+    if patient_id is not None:
+        try:
+            patient = Patient.objects.get(pk=int(patient_id))
+        except (ValueError, Patient.DoesNotExist):
+            return Response({'message': 'Patient not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not can_view_patient(request.user, patient):
+            return Response({'message': 'Access denied.'}, status=status.HTTP_403_FORBIDDEN)
+        wounds = patient_healing(patient)
+    elif ward:
+        if is_doctor(request.user):
+            wounds = ward_healing(ward)
+        elif is_nurse(request.user):
+            # Nurses only see the patients assigned to them
+            assigned = set(PatientAssignment.objects.filter(nurse=request.user, active=True).values_list('patient_id', flat=True))
+            wounds = [wound for wound in ward_healing(ward) if wound['patient'] in assigned]
+        else:
+            return Response({'message': 'Access denied.'}, status=status.HTTP_403_FORBIDDEN)
+    else:
+        return Response({'message': 'Pass patient or ward'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({'wounds': wounds}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_assessments(request):
+    """
+    Stream the current clinician's assessments (all of them for superusers)
+    as CSV or NDJSON, chosen with `?output=csv|ndjson`.
+    """
+    output = request.query_params.get('output', 'csv')
+    if output not in EXPORT_FORMATS:
+        return Response({'message': 'output must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+
+    assessments = Assessment.objects.all()
+    if not request.user.is_superuser:
+        assessments = assessments.filter(clinician=request.user)
+    try:
+        assessments = filter_measurements(assessments, request.query_params)
+    except ValueError as exc:
+        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def image_url(image):
+        return signed_media_url(image.image, request) if image.image else image.image_full_url
+
+    response = StreamingHttpResponse(
+        export_lines(export_rows(assessments, image_url), output), content_type=EXPORT_FORMATS[output]
+    )
+    response['Content-Disposition'] = f'attachment; filename="assessments.{output}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def assessment_distribution(request):
+    """
+    Stage, pain level and exudate distributions per `?period=day|week`
+    (default week) for one `?ward=` or all wards, read from the rollups.
+    `date_from` / `date_to` (YYYY-MM-DD, inclusive) default to the last 12
+    weeks or 30 days; `dimension=stage,exudate` narrows the output.
+    """
+    from patient.views import is_doctor
+
+    if not is_doctor(request.user):
+        return Response({'message': 'Only doctors can view ward statistics.'}, status=status.HTTP_403_FORBIDDEN)
+
+    params = request.query_params
+    period = params.get('period', 'week')
+    if period not in ('day', 'week'):
+        return Response({'message': 'period must be day or week'}, status=status.HTTP_400_BAD_REQUEST)
+    dimensions = tuple(params['dimension'].split(',')) if params.get('dimension') else ROLLUP_DIMENSIONS
+    if not set(dimensions) <= set(ROLLUP_DIMENSIONS):
+        return Response(
+            {'message': f"dimension must be one of {', '.join(ROLLUP_DIMENSIONS)}"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    days = {}
+    for param in ('date_from', 'date_to'):
+        value = params.get(param)
+        if value:
+            try:
+                days[param] = parse_date(value)
+            except ValueError:
+                days[param] = None
+            if days[param] is None:
+                return Response({'message': f'{param} must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    date_to = days.get('date_to') or local_date(timezone.now())
+    date_from = days.get('date_from') or date_to - DEFAULT_SPANS[period]
+    if date_from > date_to:
+        return Response({'message': 'date_from must not be after date_to'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(
+        {
+            'period': period,
+            'ward': params.get('ward'),
+            'buckets': distribution(period, date_from, date_to, params.get('ward'), dimensions),
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_assessments_view(request):
+    """
+    Bulk import assessments from an uploaded CSV / NDJSON `file`, recorded
+    under the current clinician (doctors only, like the patient import).
+    Bad rows are reported, not fatal.
+    """
+    from patient.views import is_doctor
+
+    if not is_doctor(request.user):
+        return Response({'message': 'Access denied. Only Doctors can import assessments.'}, status=status.HTTP_403_FORBIDDEN)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'message': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        rows = read_upload(upload, request.data.get('input'))
+    except ValueError as exc:
+        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    report = import_assessments(rows, request.user)
+    return Response(report.as_dict(), status=status.HTTP_200_OK)
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
@@ -167,3 +851,55 @@ def delete_assessment(request, assessment_id):
             {'message': 'Assessment not found or you do not have permission to delete it'},
             status=status.HTTP_404_NOT_FOUND
         )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def assessment_report(request, assessment_id):
+    """
+    Download the PDF report of an assessment. The first request after any
+    change queues the rendering and answers 202 (poll again after
+    Retry-After seconds); later ones get the stored file. A failed render
+    answers 500 with `status: failed` until requested with `?retry=1`.
+    """
+    from patient.views import can_view_patient
+
+    try:
+        assessment = Assessment.objects.with_details().get(id=assessment_id)
+    except Assessment.DoesNotExist:
+        return Response({'message': 'Assessment not found'}, status=status.HTTP_404_NOT_FOUND)
+    allowed = request.user.is_superuser or assessment.clinician_id == request.user.id or (
+        assessment.related_patient is not None and can_view_patient(request.user, assessment.related_patient)
+    )
+    if not allowed:
+        return Response({'message': 'Access denied.'}, status=status.HTTP_403_FORBIDDEN)
+
+    report, ready = request_report(assessment, retry=request.query_params.get('retry') in ('1', 'true'))
+    if report.status == AssessmentReport.STATUS_FAILED:
+        return Response(
+            {'message': 'The report could not be generated', 'status': report.status},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    if not ready:
+        response = Response(
+            {'message': 'The report is being generated', 'status': report.status}, status=status.HTTP_202_ACCEPTED
+        )
+        response['Retry-After'] = '2'
+        return response
+
+    response = serve_stored_file(
+        request, report.file.storage, report.file.name, report.version, int(report.generated_at.timestamp())
+    )
+    response['Content-Disposition'] = f'attachment; filename="assessment-{assessment.pk}-report.pdf"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_statistics(request):
+    """
+    Dashboard counts (patients and critical cases per ward, assessments
+    today, the current user's assigned patients) from the maintained
+    counters, in one query.
+    """
+    return Response(dashboard_stats(request.user), status=status.HTTP_200_OK)
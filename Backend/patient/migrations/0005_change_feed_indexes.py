@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 14:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient', '0004_patient_address_patient_contact_number_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientassignment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['updated_at', 'id'], name='patient_pat_updated_4856e9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientassignment',
+            index=models.Index(fields=['updated_at', 'id'], name='patient_pat_updated_a5dbd6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientassignment',
+            index=models.Index(fields=['nurse', 'updated_at', 'id'], name='patient_pat_nurse_i_0ff2a2_idx'),
+        ),
+    ]
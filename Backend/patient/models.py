@@ -1,6 +1,15 @@
 from django.db import models
+from django.db.models import Count
 from django.contrib.auth.models import User
 
+class PatientQuerySet(models.QuerySet):
+    def with_wound_counts(self):
+        """
+        Annotate `active_wound_count` so PatientSerializer doesn't run a
+        COUNT per patient.
+        """
+        return self.annotate(active_wound_count=Count('assessments'))
+
 class Patient(models.Model):
     name = models.CharField(max_length=100)
     mrn = models.CharField(max_length=50, unique=True, verbose_name="Medical Record Number")
@@ -30,6 +39,14 @@ class Patient(models.Model):
     )
     risk_level = models.CharField(max_length=10, choices=RISK_LEVEL_CHOICES, default='Low')
 
+    objects = PatientQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Change feed (images/changes.py)
+            models.Index(fields=['updated_at', 'id']),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.mrn})"
 
@@ -38,7 +55,15 @@ class PatientAssignment(models.Model):
     nurse = models.ForeignKey(User, on_delete=models.CASCADE, related_name='assigned_patients')
     assigned_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='assignments_made')
     assigned_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Change feed (images/changes.py)
+            models.Index(fields=['updated_at', 'id']),
+            models.Index(fields=['nurse', 'updated_at', 'id']),
+        ]
+
     def __str__(self):
         return f"{self.patient} assigned to {self.nurse} by {self.assigned_by}"
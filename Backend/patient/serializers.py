@@ -13,7 +13,11 @@ class PatientSerializer(serializers.ModelSerializer):
                   'assigning_physician', 'contact_number', 'address', 'emergency_contact_name', 'emergency_contact_number']
 
     def get_active_wounds(self, obj):
-        return obj.assessments.count()
+        # Prefer the count annotated by Patient.objects.with_wound_counts()
+        count = getattr(obj, 'active_wound_count', None)
+        if count is None:
+            count = obj.assessments.count()
+        return count
 
 class PatientAssignmentSerializer(serializers.ModelSerializer):
     nurse_details = UserSerializer(source='nurse', read_only=True)
@@ -3,8 +3,11 @@ from . import views
 
 urlpatterns = [
     path('add/', views.add_patient, name='add_patient'),
+    path('import/', views.import_patients_view, name='import_patients'),
     path('assign/', views.assign_patient, name='assign_patient'),
     path('list/', views.get_patients, name='get_patients'),
     path('nurses/', views.get_nurses, name='get_nurses'),
     path('<int:pk>/', views.get_patient_profile, name='get_patient_profile'),
+    path('<int:pk>/assessments/', views.get_patient_assessments, name='get_patient_assessments'),
+    path('<int:pk>/export/', views.export_patient_record, name='export_patient_record'),
 ]
@@ -1,3 +1,8 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from rest_framework import status, viewsets
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -7,6 +12,12 @@ from .models import Patient, PatientAssignment
 from .serializers import PatientSerializer, PatientAssignmentSerializer, AssignPatientSerializer
 from authentication.serializers import UserSerializer
 from authentication.models import UserProfile
+from images.measurements import filter_measurements
+from images.archive import patient_archive
+from images.importer import import_patients, read_upload
+from images.models import Assessment
+from images.pagination import InvalidCursor, paginate_keyset
+from images.serializers import AssessmentSerializer
 
 def is_doctor(user):
     return user.is_superuser or (hasattr(user, 'profile') and user.profile.role == 'DOCTOR')
@@ -14,6 +25,14 @@ def is_doctor(user):
 def is_nurse(user):
     return hasattr(user, 'profile') and user.profile.role == 'NURSE'
 
+def can_view_patient(user, patient):
+    """
+    Doctors see every patient's record, nurses only their assigned patients.
+    """
+    if is_doctor(user):
+        return True
+    return is_nurse(user) and PatientAssignment.objects.filter(patient=patient, nurse=user, active=True).exists()
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def add_patient(request):
@@ -29,6 +48,26 @@ def add_patient(request):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_patients_view(request):
+    """
+    Endpoint for Doctors to bulk import patients from an uploaded CSV / NDJSON `file`.
+    """
+    if not is_doctor(request.user):
+        return Response({'message': 'Access denied. Only Doctors can add patients.'}, status=status.HTTP_403_FORBIDDEN)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'message': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        rows = read_upload(upload, request.data.get('input'))
+    except ValueError as exc:
+        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    report = import_patients(rows)
+    return Response(report.as_dict(), status=status.HTTP_200_OK)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def assign_patient(request):
@@ -74,14 +113,14 @@ def get_patients(request):
     user = request.user
     
     if is_doctor(user) or user.is_superuser:
-        patients = Patient.objects.all().order_by('-created_at')
+        patients = Patient.objects.with_wound_counts().order_by('-created_at')
         serializer = PatientSerializer(patients, many=True)
         return Response(serializer.data)
     
     elif is_nurse(user):
         # Get assignments for this nurse
         assignments = PatientAssignment.objects.filter(nurse=user, active=True).values_list('patient_id', flat=True)
-        patients = Patient.objects.filter(id__in=assignments).order_by('-created_at')
+        patients = Patient.objects.with_wound_counts().filter(id__in=assignments).order_by('-created_at')
         serializer = PatientSerializer(patients, many=True)
         return Response(serializer.data)
         
@@ -124,3 +163,80 @@ def get_patient_profile(request, pk):
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_patient_assessments(request, pk):
+    """
+    Assessments recorded for one patient, filtered and paginated in SQL.
+
+    Query parameters: `date_from` / `date_to` (YYYY-MM-DD, inclusive),
+    `stage`, `wound_type`, measurement ranges (`min_area`, `max_depth`, ...),
+    `ordering` (`-date` or `date`), `page_size`, `cursor`.
+    """
+    try:
+        patient = Patient.objects.get(pk=pk)
+    except Patient.DoesNotExist:
+        return Response({'message': 'Patient not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    # Older assessments are only linked through the MRN typed into patient_id
+    assessments = Assessment.objects.filter(Q(related_patient=patient) | Q(patient_id=patient.mrn))
+    if not can_view_patient(request.user, patient):
+        assessments = assessments.filter(clinician=request.user)
+
+    params = request.query_params
+    for param, lookup, offset in (('date_from', 'date__gte', 0), ('date_to', 'date__lt', 1)):
+        value = params.get(param)
+        if value:
+            try:
+                day = parse_date(value)
+            except ValueError:
+                day = None
+            if day is None:
+                return Response({'message': f'{param} must be a date (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+            # Compare against midnight so the (patient, date) index can be used
+            assessments = assessments.filter(**{lookup: datetime.combine(day + timedelta(days=offset), time.min)})
+    for param in ('stage', 'wound_type'):
+        value = params.get(param)
+        if value:
+            assessments = assessments.filter(**{param: value})
+    try:
+        assessments = filter_measurements(assessments, params)
+    except ValueError as exc:
+        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    ordering = params.get('ordering', '-date')
+    if ordering not in ('date', '-date'):
+        return Response({'message': 'ordering must be "date" or "-date"'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        page, next_cursor = paginate_keyset(
+            assessments.with_details(), request, 'date', descending=ordering == '-date'
+        )
+    except InvalidCursor as exc:
+        return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = AssessmentSerializer(page, many=True, context={'request': request})
+    return Response({'results': serializer.data, 'next_cursor': next_cursor})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_patient_record(request, pk):
+    """
+    Stream a patient's full record as a ZIP: patient.json, assessments.csv
+    and the original files of every image the assessments reference.
+    """
+    try:
+        patient = Patient.objects.with_wound_counts().get(pk=pk)
+    except Patient.DoesNotExist:
+        return Response({'message': 'Patient not found'}, status=status.HTTP_404_NOT_FOUND)
+    if not can_view_patient(request.user, patient):
+        return Response({'message': 'Access denied.'}, status=status.HTTP_403_FORBIDDEN)
+
+    # Older assessments are only linked through the MRN typed into patient_id
+    assessments = Assessment.objects.filter(Q(related_patient=patient) | Q(patient_id=patient.mrn))
+    response = StreamingHttpResponse(
+        patient_archive(PatientSerializer(patient).data, assessments), content_type='application/zip'
+    )
+    response['Content-Disposition'] = f'attachment; filename="patient-{patient.pk}-record.zip"'
+    return response
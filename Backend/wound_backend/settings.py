@@ -138,6 +138,56 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Authenticated media downloads (/api/images/<id>/file/) can hand the byte
+# transfer to the front web server. Set to 'X-Accel-Redirect' (nginx, serving
+# MEDIA_ROOT from an `internal` location at MEDIA_ACCEL_REDIRECT_PREFIX) or
+# 'X-Sendfile' (Apache/lighttpd). None streams the file from Django.
+MEDIA_ACCEL_REDIRECT = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# The API hands out signed image URLs (/api/images/media/...) valid for at
+# least SIGNED_MEDIA_URL_LIFETIME seconds, rounded up to the granularity so
+# a file keeps the same (cacheable) URL across responses. MEDIA_URL itself
+# should not be publicly served outside development.
+SIGNED_MEDIA_URL_LIFETIME = 3600
+SIGNED_MEDIA_URL_GRANULARITY = 300
+
+# Resumable (chunked) uploads: partial files live outside MEDIA_ROOT and
+# sessions idle for longer than the expiry are removed by
+# `python manage.py cleanup_upload_sessions`.
+CHUNKED_UPLOAD_DIR = BASE_DIR / 'upload_sessions'
+CHUNKED_UPLOAD_EXPIRY = timedelta(hours=24)
+
+# Process pool used for bulk image work (backfills, admin actions).
+# None = one worker per CPU core; in-flight tasks default to 2 per worker.
+IMAGE_PROCESSING_WORKERS = None
+IMAGE_PROCESSING_MAX_IN_FLIGHT = None
+
+# Cursor-paginated list endpoints: default and largest allowed ?page_size=.
+CURSOR_PAGE_SIZE = 50
+CURSOR_MAX_PAGE_SIZE = 200
+
+# Shared by every web and worker process, so invalidating a cached result
+# (e.g. the healing-analytics generation token) is seen by all of them. The
+# table is created with `python manage.py createcachetable`.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    }
+}
+
+# Seconds a healing-analytics result stays cached. Saving or deleting an
+# assessment or patient invalidates all cached results straight away.
+HEALING_ANALYTICS_CACHE_TIMEOUT = 60 * 60
+
+# Change feed (/api/images/changes/): rows changed in the last few seconds wait
+# for the next sync so in-flight transactions can commit first. Tombstones of
+# deleted records are kept this many days (`python manage.py
+# prune_deleted_records`); older cursors must resync from scratch.
+CHANGE_FEED_SETTLE_SECONDS = 5
+CHANGE_FEED_TOMBSTONE_DAYS = 90
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -1,8 +1,36 @@
-import React from 'react';
-import { Users, AlertCircle, Activity, Clock, Calendar, ArrowUp, ArrowDown, FileText } from 'lucide-react';
+import React, { useState, useEffect } from 'react';
+import { Users, AlertCircle, Activity, Clock, Calendar, FileText } from 'lucide-react';
 import './Dashboard.css';
+import { API_BASE_URL } from './config';
 
 function Dashboard() {
+    const [stats, setStats] = useState(null);
+    const [statsError, setStatsError] = useState(false);
+
+    useEffect(() => {
+        const fetchStats = async () => {
+            const token = localStorage.getItem('accessToken');
+            try {
+                // Maintained counters on the server; one cheap query
+                const response = await fetch(`${API_BASE_URL}/api/images/stats/`, {
+                    headers: { 'Authorization': `Bearer ${token}` }
+                });
+                if (response.ok) {
+                    setStats(await response.json());
+                } else {
+                    setStatsError(true);
+                }
+            } catch (error) {
+                console.error("Failed to fetch dashboard stats", error);
+                setStatsError(true);
+            }
+        };
+        fetchStats();
+    }, []);
+
+    // Never show a made-up figure: a dash until the real number arrives
+    const stat = (key) => (stats ? stats[key] : '–');
+
     return (
         <div className="dashboard-container">
             {/* Header */}
@@ -12,7 +40,9 @@ function Dashboard() {
                     <h1 className="welcome-text">Good Morning, Dr. Bennett</h1>
                     <div className="status-text">
                         <span className="status-icon">✓</span>
-                        You have 5 scheduled assessments and 3 pending reviews today.
+                        {stats
+                            ? `${stats.my_assessments_today} of ${stats.assessments_today} assessments today are yours; ${stats.my_assigned_patients} patients assigned to you.`
+                            : statsError ? 'Statistics are unavailable right now.' : 'Loading statistics…'}
                     </div>
                 </div>
                 <div className="header-actions">
@@ -34,14 +64,10 @@ function Dashboard() {
                         <div className="stat-icon-wrapper icon-blue">
                             <Users size={20} />
                         </div>
-                        <div className="stat-trend trend-up">
-                            <ArrowUp size={14} />
-                            <span>+12%</span>
-                        </div>
                     </div>
-                    <div className="stat-value">3</div>
+                    <div className="stat-value">{stat('active_patients')}</div>
                     <div className="stat-label">Active Patients</div>
-                    <div className="stat-subtext">Total across all units</div>
+                    <div className="stat-subtext">Total across {stats ? stats.wards.length : 'all'} units</div>
                 </div>
 
                 <div className="stat-card">
@@ -49,12 +75,8 @@ function Dashboard() {
                         <div className="stat-icon-wrapper icon-red">
                             <AlertCircle size={20} />
                         </div>
-                        <div className="stat-trend trend-down">
-                            <ArrowDown size={14} />
-                            <span>-2</span>
-                        </div>
                     </div>
-                    <div className="stat-value">1</div>
+                    <div className="stat-value">{stat('critical_cases')}</div>
                     <div className="stat-label">Critical Cases</div>
                     <div className="stat-subtext">Requires daily monitoring</div>
                 </div>
@@ -64,14 +86,10 @@ function Dashboard() {
                         <div className="stat-icon-wrapper icon-green">
                             <Activity size={20} />
                         </div>
-                        <div className="stat-trend trend-up">
-                            <ArrowUp size={14} />
-                            <span>+5%</span>
-                        </div>
                     </div>
-                    <div className="stat-value">84%</div>
-                    <div className="stat-label">Wound Healing Rate</div>
-                    <div className="stat-subtext">Patients improving this week</div>
+                    <div className="stat-value">{stat('assessments_today')}</div>
+                    <div className="stat-label">Assessments Today</div>
+                    <div className="stat-subtext">{stat('my_assessments_today')} by you</div>
                 </div>
 
                 <div className="stat-card">
@@ -79,14 +97,10 @@ function Dashboard() {
                         <div className="stat-icon-wrapper icon-purple">
                             <Clock size={20} />
                         </div>
-                        <div className="stat-trend trend-up">
-                            <ArrowUp size={14} />
-                            <span>-30s</span>
-                        </div>
                     </div>
-                    <div className="stat-value">4.2m</div>
-                    <div className="stat-label">Avg. Assessment Time</div>
-                    <div className="stat-subtext">AI-assisted speed</div>
+                    <div className="stat-value">{stat('my_assigned_patients')}</div>
+                    <div className="stat-label">Assigned to You</div>
+                    <div className="stat-subtext">Patients in your care</div>
                 </div>
             </div>
 
@@ -165,7 +179,7 @@ function Dashboard() {
                                 <AlertCircle size={20} className="text-red" />
                                 <h3 className="card-title text-red">Priority Attention</h3>
                             </div>
-                            <span className="badge badge-red-soft">3 Active</span>
+                            <span className="badge badge-red-soft">{stat('critical_cases')} Active</span>
                         </div>
                         <div className="priority-item">
                             <div className="priority-header">
@@ -52,21 +52,21 @@ const PatientProfile = ({ patient, onBack, onNewAssessment, onEditPatient }) =>
         setLoadingAssessment(true);
         const token = localStorage.getItem('accessToken');
         try {
-            const response = await fetch(`${API_BASE_URL}/api/images/assessments/`, {
-                headers: { 'Authorization': `Bearer ${token}` }
-            });
-            if (response.ok) {
+            // Filtered (by MRN or related_patient) and sorted newest first on the server;
+            // follow next_cursor until the last page so long histories aren't cut off
+            const assessments = [];
+            let cursor = null;
+            do {
+                const query = cursor ? `page_size=200&cursor=${encodeURIComponent(cursor)}` : 'page_size=200';
+                const response = await fetch(`${API_BASE_URL}/api/patients/${patient.id}/assessments/?${query}`, {
+                    headers: { 'Authorization': `Bearer ${token}` }
+                });
+                if (!response.ok) break;
                 const data = await response.json();
-                // Filter assessments for this patient (match by MRN or related_patient ID)
-                const filtered = data.filter(a =>
-                    (a.patient_id === patient.mrn) ||
-                    (a.related_patient === patient.id)
-                );
-
-                // Sort by date descending
-                filtered.sort((a, b) => new Date(b.date) - new Date(a.date));
-                setPatientAssessments(filtered);
-            }
+                assessments.push(...data.results);
+                cursor = data.next_cursor;
+            } while (cursor);
+            setPatientAssessments(assessments);
         } catch (error) {
             console.error("Failed to fetch patient assessments", error);
         } finally {
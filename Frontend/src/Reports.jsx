@@ -1,8 +1,58 @@
-import React from 'react';
+import React, { useState } from 'react';
 import { Search, ZoomIn, ZoomOut, ChevronLeft, ChevronRight, Edit, Download, BriefcaseMedical } from 'lucide-react';
 import './Reports.css';
+import { API_BASE_URL } from './config';
+
+// Polling a report that is being generated: attempts and longest wait between them
+const MAX_REPORT_POLLS = 10;
+const MAX_REPORT_POLL_SECONDS = 15;
+
+const Reports = ({ assessmentId }) => {
+    const [exporting, setExporting] = useState(false);
+
+    const exportPdf = async () => {
+        setExporting(true);
+        const token = localStorage.getItem('accessToken');
+        const headers = { 'Authorization': `Bearer ${token}` };
+        try {
+            let id = assessmentId;
+            if (!id) {
+                // No assessment selected: report on the most recent one
+                const latest = await fetch(`${API_BASE_URL}/api/images/assessments/?page_size=1`, { headers });
+                const data = await latest.json();
+                id = data.results[0]?.id;
+                if (!id) return;
+            }
+            // Rendered on the server; 202 means it's still being generated. Clicking
+            // Export retries a failed render, polling backs off and gives up eventually.
+            const reportUrl = `${API_BASE_URL}/api/images/assessments/${id}/report/`;
+            let response = await fetch(`${reportUrl}?retry=1`, { headers });
+            for (let attempt = 0; response.status === 202 && attempt < MAX_REPORT_POLLS; attempt++) {
+                const retryAfter = Number(response.headers.get('Retry-After') || 2);
+                const wait = Math.min(retryAfter * 1.5 ** attempt, MAX_REPORT_POLL_SECONDS) * 1000;
+                await new Promise(resolve => setTimeout(resolve, wait));
+                response = await fetch(reportUrl, { headers });
+            }
+            if (response.status === 202) {
+                alert('The report is taking longer than expected. Please try again in a few minutes.');
+            } else if (!response.ok) {
+                const data = await response.json().catch(() => ({}));
+                alert(data.message || 'The report could not be generated.');
+            } else {
+                const url = URL.createObjectURL(await response.blob());
+                const link = document.createElement('a');
+                link.href = url;
+                link.download = `assessment-${id}-report.pdf`;
+                link.click();
+                URL.revokeObjectURL(url);
+            }
+        } catch (error) {
+            console.error("Failed to export report", error);
+        } finally {
+            setExporting(false);
+        }
+    };
 
-const Reports = () => {
     return (
         <div className="reports-container">
             {/* Toolbar */}
@@ -31,9 +81,9 @@ const Reports = () => {
                         <Edit size={16} />
                         Edit
                     </button>
-                    <button className="btn-blue">
+                    <button className="btn-blue" onClick={exportPdf} disabled={exporting}>
                         <Download size={16} />
-                        Export PDF
+                        {exporting ? 'Generating...' : 'Export PDF'}
                     </button>
                 </div>
             </div>